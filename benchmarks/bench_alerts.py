@@ -0,0 +1,93 @@
+"""Time alert checks with many rules over a full price update
+
+Run from the repository root: python -m benchmarks.bench_alerts
+
+Rules are spread over the items, metrics and directions at random. One
+update moves every item's price by up to 5% and checks its rules, as
+PriceTracker.apply_price_result does; the same check against every rule
+in turn is timed on a sample of items for comparison.
+"""
+import argparse
+import random
+import time
+
+from osrs_alerts import ALERT_DIRECTIONS, ALERT_METRICS, AlertEngine, metric_values
+
+from benchmarks.synthetic import make_items
+
+
+def make_rules(items, count, seed=0):
+    rng = random.Random(seed)
+    rules = []
+    for _ in range(count):
+        item = rng.choice(items)
+        metric = rng.choice(ALERT_METRICS)
+        if metric == 'price':
+            threshold = int(item['current_price'] * rng.uniform(0.9, 1.1))
+        else:
+            threshold = round(rng.uniform(-20, 20), 1)
+        rules.append({'item_name': item['name'], 'metric': metric,
+                      'direction': rng.choice(ALERT_DIRECTIONS), 'threshold': threshold})
+    return rules
+
+
+def check_every_rule(rules, item_name, old_values, new_values):
+    """Crossed rules found by testing each one, without the index"""
+    fired = []
+    for rule in rules:
+        if rule['item_name'] != item_name:
+            continue
+        old = old_values[rule['metric']]
+        new = new_values[rule['metric']]
+        if new is None:
+            continue
+        threshold = rule['threshold']
+        if rule['direction'] == 'above':
+            crossed = new >= threshold and (old is None or old < threshold)
+        else:
+            crossed = new <= threshold and (old is None or old > threshold)
+        if crossed:
+            fired.append((rule, new))
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--rules', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=100, help="items checked against every rule")
+    args = parser.parse_args()
+
+    items = make_items(args.items, priced=1.0)
+    rules = make_rules(items, args.rules)
+    start = time.perf_counter()
+    engine = AlertEngine(dict(rule) for rule in rules)
+    print(f"{args.rules:,} rules over {args.items:,} items")
+    print(f"{'build the index':<40} {(time.perf_counter() - start) * 1000:9.2f} ms")
+
+    rng = random.Random(1)
+    updates = []
+    for item in items:
+        old_values = metric_values(item)
+        item['current_price'] = max(1, int(item['current_price'] * rng.uniform(0.95, 1.05)))
+        updates.append((item['name'], old_values, metric_values(item)))
+
+    start = time.perf_counter()
+    fired = sum(len(engine.check(*update)) for update in updates)
+    elapsed = time.perf_counter() - start
+    print(f"{'check every item, indexed':<40} {elapsed * 1000:9.2f} ms "
+          f"({elapsed / len(updates) * 1e6:.1f} us per item, {fired:,} fired)")
+
+    sample = updates[:args.sample]
+    start = time.perf_counter()
+    for update in sample:
+        found = check_every_rule(rules, *update)
+        assert sorted(rule['threshold'] for rule, value in found) == \
+            sorted(rule['threshold'] for rule, value in engine.check(*update))
+    elapsed = time.perf_counter() - start
+    print(f"{'check every rule in turn':<40} {elapsed / len(sample) * len(updates) * 1000:9.2f} ms "
+          f"(estimated from {len(sample)} items, {elapsed / len(sample) * 1e6:.1f} us per item)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Time the portfolio analytics over synthetic items and price history
+
+Run from the repository root: python -m benchmarks.bench_analytics
+
+Every item is held and has one recorded price per day. The cold build
+reads every key's history; later calls reuse the cached daily closes and
+only read the keys written since. When the day rolls over the closes are
+shifted by a day instead of read again.
+"""
+import argparse
+import tempfile
+import time
+
+import osrs_analytics
+from osrs_analytics import PortfolioAnalytics
+from osrs_core import price_key
+from osrs_history import DAY, PriceHistoryStore
+from osrs_items import ItemTable
+
+from benchmarks.synthetic import fill_history, make_items
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:9.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365, help="days of history per item")
+    parser.add_argument('--no-numpy', action='store_true', help="time the pure Python fallbacks")
+    args = parser.parse_args()
+    if args.no_numpy:
+        osrs_analytics.np = None
+
+    now = time.time()
+    items = ItemTable(make_items(args.items, priced=1.0, held=1.0))
+    with tempfile.TemporaryDirectory() as directory:
+        history = PriceHistoryStore(directory)
+        keys = [price_key(url) for url in items.columns['url']]
+        fill_history(history, keys, args.days, now=now)
+        print(f"{args.items:,} held items, {args.days} days of history each, "
+              f"NumPy {'off' if osrs_analytics.np is None else 'on'}")
+
+        analytics = PortfolioAnalytics(history, price_key)
+        timed("cold build", lambda: analytics.compute(items, now))
+        timed("nothing changed", lambda: analytics.compute(items, now))
+        items[0]['quantity'] += 1
+        timed("one quantity changed", lambda: analytics.compute(items, now))
+        history.append(keys[1], 1234, now)
+        timed("one new price point", lambda: analytics.compute(items, now))
+        timed("day rolled over", lambda: analytics.compute(items, now + DAY))
+
+
+if __name__ == '__main__':
+    main()
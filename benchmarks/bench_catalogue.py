@@ -0,0 +1,84 @@
+"""Time item catalogue searches and a bulk import
+
+Run from the repository root: python -m benchmarks.bench_catalogue
+
+Searches run as you type, so each query is timed on its own and compared
+with scanning every name. The import reads a CSV naming --import-items
+catalogue items (a few of them with bad quantities) and adds them to a
+tracker in a temporary directory.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from osrs_catalogue import ItemCatalogue, read_import_rows, save_catalogue
+from osrs_core import PriceTracker
+
+from benchmarks.synthetic import item_names
+
+QUERIES = ('d', 'dra', 'dragon', 'pick', 'dragon pick', 'r pl', 'cursed ring 1', 'zzz')
+
+
+def scan_every_name(names, query, limit=10):
+    """Prefix matches, then word matches, found by testing every name"""
+    key = query.strip().lower()
+    query_words = key.split()
+    prefixed = [name for name in names if name.lower().startswith(key)]
+    words = [name for name in names if not name.lower().startswith(key) and
+             all(any(word.startswith(query_word) for word in name.lower().split()) for query_word in query_words)]
+    return (sorted(prefixed, key=str.lower) + sorted(words, key=str.lower))[:limit]
+
+
+def per_query(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=50000, help="items in the catalogue")
+    parser.add_argument('--import-items', type=int, default=10000)
+    args = parser.parse_args()
+
+    names = item_names(args.names)
+    start = time.perf_counter()
+    catalogue = ItemCatalogue((name, item_id) for item_id, name in enumerate(names, 1))
+    print(f"{'build, ' + format(args.names, ',') + ' names':<40} {(time.perf_counter() - start) * 1000:9.2f} ms")
+
+    for query in QUERIES:
+        found = [name for name, item_id in catalogue.search(query)]
+        assert found == scan_every_name(names, query), query
+        indexed = per_query(lambda: catalogue.search(query), 200)
+        scanned = per_query(lambda: scan_every_name(names, query), 3)
+        print(f"search {query!r:<33} {indexed * 1e6:9.1f} us  (scan {scanned * 1000:.1f} ms)")
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        save_catalogue('osrs_item_catalogue.json', catalogue)
+        with open('items.csv', 'w', encoding='utf-8') as f:
+            f.write('name,quantity,reference price\n')
+            for name in rng.sample(names, args.import_items):
+                quantity = 'many' if rng.random() < 0.01 else rng.randint(1, 1000)
+                f.write(f'"{name}",{quantity},{rng.randint(1, 10 ** 6)}\n')
+
+        start = time.perf_counter()
+        with open('items.csv', newline='', encoding='utf-8') as f:
+            entries, invalid = read_import_rows(f)
+        print(f"{'read ' + format(args.import_items, ',') + ' import rows':<40} "
+              f"{(time.perf_counter() - start) * 1000:9.2f} ms ({len(invalid)} invalid)")
+
+        tracker = PriceTracker()
+        start = time.perf_counter()
+        added, skipped, unknown = tracker.import_items(entries)
+        print(f"{'import ' + format(len(entries), ',') + ' items':<40} "
+              f"{(time.perf_counter() - start) * 1000:9.2f} ms ({len(added):,} added)")
+        tracker.close()
+
+
+if __name__ == '__main__':
+    main()
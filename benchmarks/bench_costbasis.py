@@ -0,0 +1,53 @@
+"""Time rebuilding every position from a large ledger with each cost-basis method
+
+Run from the repository root: python -m benchmarks.bench_costbasis
+
+The ledger is --trades synthetic BUY/SELL transactions over --items items.
+Every method is replayed lot by lot in Python; FIFO is also recomputed with
+NumPy (when installed), split into reading the transaction dicts into
+arrays and the array work itself. Both FIFO paths must agree.
+"""
+import argparse
+import time
+
+from osrs_costbasis import COST_BASIS_METHODS, np, recompute, replay
+
+from benchmarks.synthetic import item_names, make_transactions
+
+POSITION_FIELDS = ('quantity', 'cost_basis', 'cost_of_sold', 'proceeds')
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=1000000)
+    parser.add_argument('--items', type=int, default=1000)
+    args = parser.parse_args()
+
+    transactions = make_transactions(item_names(args.items), args.trades)
+    print(f"{args.trades:,} trades over {args.items:,} items")
+    replayed = {}
+    for method in COST_BASIS_METHODS:
+        replayed[method] = timed(f"replay, {method}", lambda: replay(transactions, method))
+
+    if np is None:
+        print("NumPy is not installed; recompute() replays FIFO as above")
+        return
+    positions = timed("recompute, fifo (NumPy)", lambda: recompute(transactions, 'fifo'))
+    timed("  of which reading the dicts", lambda: (
+        [trans.get('item_name', '') for trans in transactions], [trans.get('type', '') for trans in transactions],
+        np.array([trans.get('quantity', 0) for trans in transactions]),
+        np.array([trans.get('price_per_unit', 0) for trans in transactions])))
+    for name, position in replayed['fifo'].items():
+        assert all(positions[name][field] == position[field] for field in POSITION_FIELDS), name
+        assert list(map(list, positions[name]['lots'])) == list(map(list, position['lots'])), name
+
+
+if __name__ == '__main__':
+    main()
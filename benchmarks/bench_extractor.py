@@ -0,0 +1,77 @@
+"""Time parsing an item page with ItemPageExtractor and the old regex cascade
+
+Run from the repository root: python -m benchmarks.bench_extractor
+
+Each page in tests/fixtures/pages is parsed as it is and padded with
+--padding KB of navigation and script markup on both sides of the price
+block, which is about the size of a live itemdb page. The single-pass
+extractor is timed on the whole page and fed in 8 KB chunks as
+PriceSession.stream does; the cascade is the one tests/test_extractor.py
+checks the extractor against.
+"""
+import argparse
+import os
+import sys
+import time
+
+from osrs_extractor import ItemPageExtractor, extract_item_page
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests')
+sys.path.insert(0, TESTS_DIR)
+from conftest import FIXTURES_DIR, read_fixture  # noqa: E402
+from test_extractor import cascade_scrape  # noqa: E402
+
+CHUNK_SIZE = 8192
+
+FILLER = ('<li class="nav__item"><a href="/m=itemdb_oldschool/browse" class="nav__link">'
+          '<span class="nav__label" title="Grand Exchange">Grand Exchange</span></a></li>\n'
+          '<script>window.dataLayer = window.dataLayer || []; dataLayer.push({"event": "page"});</script>\n')
+
+
+def pad(html, size):
+    """html with about size characters of filler before and after the item block"""
+    filler = FILLER * (size // len(FILLER) // 2)
+    html = html.replace('<div class="item-description">', filler + '<div class="item-description">', 1)
+    return html.replace('<footer>', filler + '<footer>', 1)
+
+
+def stream_extract(html):
+    extractor = ItemPageExtractor()
+    for start in range(0, len(html), CHUNK_SIZE):
+        if extractor.feed(html[start:start + CHUNK_SIZE]):
+            break
+    return extractor.result()
+
+
+def per_page(func, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--padding', type=int, default=80, help="KB of filler markup in the padded pages")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    pages = sorted(name for name in os.listdir(os.path.join(FIXTURES_DIR, 'pages')) if name.endswith('.html'))
+    print(f"{'page':<26} {'size':>8} {'extractor':>11} {'8 KB chunks':>12} {'cascade':>11}")
+    for padding in (0, args.padding * 1024):
+        totals = [0.0, 0.0, 0.0]
+        for name in pages:
+            html = read_fixture('pages', name)
+            if padding:
+                html = pad(html, padding)
+            assert extract_item_page(html) == stream_extract(html) == cascade_scrape(html), name
+            timings = [per_page(func, html, args.repeat)
+                       for func in (extract_item_page, stream_extract, cascade_scrape)]
+            totals = [total + timing for total, timing in zip(totals, timings)]
+            print(f"{name:<26} {len(html):>8,} " + ' '.join(f"{timing * 1e6:9.1f}us" for timing in timings))
+        print(f"{'mean':<26} {'':>8} " + ' '.join(f"{total / len(pages) * 1e6:9.1f}us" for total in totals))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Time the transaction history view and TransactionIndex lookups
+
+Run from the repository root: python -m benchmarks.bench_history_view
+
+Needs tkinter importable (no display is opened). The history and gain/loss
+trees are the counting stub from bench_prices_view, so the numbers are the
+view code's own cost plus the widget calls it makes. Up to
+--baseline-max transactions, the history rows are also refreshed the way
+they were before the index: sort by date, map every sorted row back to its
+list position by identity (quadratic) and configure a tag per row.
+"""
+import argparse
+import os
+import random
+import time
+
+from osrs_core import DEFAULT_SETTINGS, JsonStorage, no_timer
+from osrs_items import ItemTable
+from osrs_price_tracker import ALL_ITEMS, OSRSPriceTracker
+
+from benchmarks.bench_prices_view import CountingTree
+from benchmarks.synthetic import make_items, make_transactions
+
+
+class Widget:
+    """Label / Combobox stand-in"""
+
+    def config(self, **options):
+        pass
+
+
+class Var:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def make_view(count, items):
+    """A history view over count synthetic transactions, without a Tk window"""
+    rows = make_items(items, held=1.0)
+    view = OSRSPriceTracker.__new__(OSRSPriceTracker)
+    view.data = {'items': ItemTable(rows),
+                 'transactions': make_transactions([item['name'] for item in rows], count),
+                 'settings': dict(DEFAULT_SETTINGS)}
+    view.storage = JsonStorage(os.devnull, no_timer)
+    view.storage.load()
+    view.ledger = None
+    view.transaction_index = None
+    view.items_by_name = None
+    view.history_tree = CountingTree()
+    view.pnl_tree = CountingTree()
+    view.summary_label = Widget()
+    view.history_item_box = Widget()
+    view.history_item_var = Var(ALL_ITEMS)
+    return view
+
+
+def old_refresh_history_rows(view):
+    """The history rows as refreshed before TransactionIndex"""
+    tree = view.history_tree
+    tree.delete(*tree.get_children())
+    transactions = view.get_transactions()
+    sorted_transactions = sorted(transactions, key=lambda x: x.get('date', ''), reverse=True)
+    trans_index_map = {}
+    for idx, trans in enumerate(transactions):
+        for sort_idx, sorted_trans in enumerate(sorted_transactions):
+            if trans is sorted_trans:
+                trans_index_map[sort_idx] = idx
+                break
+    for sort_idx, trans in enumerate(sorted_transactions):
+        values = (trans.get('date', ''), trans.get('item_name', ''), trans.get('type', ''),
+                  trans.get('quantity', 0), f"{trans.get('price_per_unit', 0):,}", f"{trans.get('total_cost', 0):,}")
+        original_index = trans_index_map.get(sort_idx, sort_idx)
+        item_id = tree.insert('', 'end', values=values, tags=(f'data_index_{original_index}',))
+        kind = trans.get('type', '').lower()
+        if kind in ('buy', 'sell'):
+            tree.tag_configure(f'{kind}_{item_id}', foreground='#00FF00' if kind == 'buy' else '#FFD700')
+            tree.item(item_id, tags=(f'{kind}_{item_id}', f'data_index_{original_index}'))
+
+
+def timed(label, view, func, repeat=1):
+    view.history_tree.calls.clear()
+    view.pnl_tree.calls.clear()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    calls = (sum(view.history_tree.calls.values()) + sum(view.pnl_tree.calls.values())) // repeat
+    if elapsed < 0.001:
+        print(f"  {label:<38} {elapsed * 1e6:9.2f} us {calls:9,} widget calls")
+    else:
+        print(f"  {label:<38} {elapsed * 1000:9.2f} ms {calls:9,} widget calls")
+
+
+def run(count, args):
+    print(f"{count:,} transactions over {args.items:,} items")
+    view = make_view(count, args.items)
+    rng = random.Random(1)
+    ids = [rng.randint(1, count) for _ in range(1000)]
+
+    timed("build the index", view, view.get_transaction_index)
+    index = view.transaction_index
+    timed(f"get by id, {len(ids):,} lookups", view, lambda: [index.get(trans_id) for trans_id in ids], 10)
+    one_item = view.data['items'][0]['name']
+    timed("newest first, one item", view, lambda: list(index.newest_first(one_item)), 10)
+    timed("refresh rows, all items", view, view.refresh_history_rows)
+    view.history_item_var.set(one_item)
+    timed("refresh rows, one item", view, view.refresh_history_rows)
+    view.history_item_var.set(ALL_ITEMS)
+    view.refresh_history_rows()
+    timed("refresh summary, building the ledger", view, view.refresh_history_summary)
+    timed("refresh summary again", view, view.refresh_history_summary)
+
+    def delete_one():
+        trans_id = ids.pop()
+        if view.delete_transaction(trans_id) is not None:
+            view.history_tree.delete(str(trans_id))
+            view.refresh_history_summary()
+    timed("delete one transaction", view, delete_one, 10)
+
+    if count <= args.baseline_max:
+        timed("old refresh rows, all items", view, lambda: old_refresh_history_rows(view))
+    else:
+        print(f"  {'old refresh rows, all items':<38} skipped above --baseline-max (quadratic)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--baseline-max', type=int, default=10000,
+                        help="largest size to also run the old quadratic refresh on")
+    args = parser.parse_args()
+    for count in args.sizes:
+        run(count, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare the column-wise ItemTable with the list of dicts it replaced
+
+Run from the repository root: python -m benchmarks.bench_items
+
+Reports the memory each representation holds, and the time to sort by
+portfolio value and to total the portfolio. The table numbers use NumPy
+when it is installed; --no-numpy times the pure Python fallbacks.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import osrs_items
+from osrs_items import ItemTable
+
+from benchmarks.synthetic import make_items
+
+
+def measure_memory(build):
+    """Bytes still allocated once build() has returned its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(label, func, repeat=5):
+    """Print the best of repeat runs of func"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<40} {best * 1000:9.2f} ms")
+
+
+def dict_portfolio_values(items):
+    return [item['current_price'] * item['quantity'] if item['current_price'] > 0 else 0
+            for item in items]
+
+
+def dict_sort_order(items):
+    """Positions by portfolio value, as the view sorted the list of dicts"""
+    keys = [value if item['quantity'] != 0 and value else None
+            for item, value in zip(items, dict_portfolio_values(items))]
+    present = [position for position, key in enumerate(keys) if key is not None]
+    present.sort(key=keys.__getitem__)
+    return present, [position for position, key in enumerate(keys) if key is None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--no-numpy', action='store_true', help="time the table without NumPy")
+    args = parser.parse_args()
+    if args.no_numpy:
+        osrs_items.np = None
+
+    # Each representation is built from its own copy of the source data, as
+    # loading from the data file would
+    items, dict_bytes = measure_memory(lambda: make_items(args.items))
+    table, table_bytes = measure_memory(lambda: ItemTable(make_items(args.items)))
+    print(f"{args.items:,} items, NumPy {'off' if osrs_items.np is None else 'on'}")
+    print(f"{'list of dicts':<40} {dict_bytes / 2 ** 20:9.2f} MiB")
+    print(f"{'ItemTable':<40} {table_bytes / 2 ** 20:9.2f} MiB")
+
+    assert dict_sort_order(items) == table.sort_order('portfolio_value')
+    timed("sort by portfolio value, dicts", lambda: dict_sort_order(items))
+    timed("sort by portfolio value, table", lambda: table.sort_order('portfolio_value'))
+
+    assert sum(dict_portfolio_values(items)) == table.total_value()
+    timed("portfolio total, dicts", lambda: sum(dict_portfolio_values(items)))
+    timed("portfolio total, table", table.total_value)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Measure what each kind of change costs to persist, for both storage backends
+
+Run from the repository root: python -m benchmarks.bench_persistence
+
+Each backend gets a fresh tracker in a temporary directory holding the
+same synthetic items and transactions. Bytes are what the process passed
+to write() (from /proc/self/io, so Linux only; n/a elsewhere), including
+price history appends. The JSON file is also written the way it was
+before saves were debounced, as the baseline: save_data() rewrote the
+whole file in place, and a quantity edit called it twice (once from
+log_transaction, once from edit_item).
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from osrs_core import DEFAULT_SETTINGS, PriceTracker
+from osrs_items import to_json
+
+from benchmarks.synthetic import make_items, make_transactions
+
+
+def bytes_written():
+    """Bytes this process has passed to write(), or None off Linux"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+class OldSaveData:
+    """save_data() before debouncing: dump the whole document over the file"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.write_count = 0
+
+    def __call__(self):
+        with open(self.tracker.storage.path, 'w') as f:
+            json.dump(self.tracker.data, f, indent=2, default=to_json)
+        self.write_count += 1
+
+
+def measure(label, tracker, action, writer=None):
+    """Run action, flush as the debounce timer would, and report the cost"""
+    writer = writer or getattr(tracker.storage, 'writer', None)
+    writes_before = writer and writer.write_count
+    before = bytes_written()
+    start = time.perf_counter()
+    action()
+    tracker.storage.flush()
+    elapsed = time.perf_counter() - start
+    after = bytes_written()
+    written = f"{(after - before) / 1024:10,.1f} KB" if before is not None else "       n/a"
+    files = ''
+    if writes_before is not None:
+        files = f" {writer.write_count - writes_before} file write(s)"
+    print(f"  {label:<38} {elapsed * 1000:9.2f} ms {written}{files}")
+
+
+def edit_quantity(tracker, item):
+    """What the Edit Item dialog does when the quantity changes"""
+    old_quantity = item['quantity']
+    item['quantity'] = old_quantity + 10
+    tracker.log_transaction(item['name'], item['quantity'], 100, 0, old_quantity, 0, 0)
+    tracker.storage.save_item(item)
+
+
+def old_edit_quantity(tracker, save_data, item):
+    """The same edit as it was saved before debouncing"""
+    old_quantity = item['quantity']
+    item['quantity'] = old_quantity + 10
+    tracker.get_transactions().append({
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"), 'item_name': item['name'], 'type': 'BUY', 'quantity': 10,
+        'price_per_unit': 100, 'total_cost': 1000, 'old_quantity': old_quantity, 'new_quantity': item['quantity']})
+    save_data()
+    save_data()
+
+
+def run(storage, args):
+    directory = tempfile.mkdtemp(prefix='osrs_bench_')
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        items = make_items(args.items)
+        transactions = make_transactions([item['name'] for item in items], args.transactions)
+        with open('osrs_tracker_data.json', 'w') as f:
+            json.dump({'items': items, 'transactions': transactions,
+                       'settings': dict(DEFAULT_SETTINGS, storage=storage)}, f)
+        tracker = PriceTracker()
+        tracker.get_transactions()
+        print(f"{storage}: {args.items:,} items, {args.transactions:,} transactions")
+
+        rows = tracker.data['items']
+        if storage == 'json':
+            save_data = OldSaveData(tracker)
+            measure("old save_data, one edit", tracker, lambda: old_edit_quantity(tracker, save_data, rows[0]),
+                    save_data)
+            measure("old save_data, ten edits", tracker,
+                    lambda: [old_edit_quantity(tracker, save_data, rows[index]) for index in range(10)], save_data)
+        measure("edit one item's quantity", tracker, lambda: edit_quantity(tracker, rows[0]))
+        measure("ten edits before one flush", tracker,
+                lambda: [edit_quantity(tracker, rows[index]) for index in range(10)])
+        measure(f"price update of {args.prices:,} items", tracker,
+                lambda: [tracker.apply_price_result(rows[index], (rows[index]['current_price'] + 1, 1.0, 2.0, 3.0))
+                         for index in range(args.prices)])
+        tracker.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--prices', type=int, default=100)
+    args = parser.parse_args()
+    for storage in ('json', 'sqlite'):
+        run(storage, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Time the prices view refresh against a widget stub that counts calls
+
+Run from the repository root: python -m benchmarks.bench_prices_view
+
+Needs tkinter importable (no display is opened). The treeview is a stub,
+so the numbers are the view code's own cost plus the number of widget
+calls it makes; a real Treeview adds per call. Each case is also run
+with the refresh_tree this view replaced, which deleted and reinserted
+every row and configured a colour tag per row.
+"""
+import argparse
+import time
+from collections import Counter
+
+from osrs_core import DEFAULT_SETTINGS
+from osrs_items import ItemTable
+from osrs_price_tracker import ROW_FIELDS, OSRSPriceTracker
+
+from benchmarks.synthetic import make_items
+
+
+class CountingTree:
+    """Treeview stand-in keeping row order and counting every call"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.children = []
+        self.tags = set()
+        self.next_iid = 0
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.calls['insert'] += 1
+        if iid is None:
+            self.next_iid += 1
+            iid = f'I{self.next_iid:03X}'
+        self.children.insert(len(self.children) if index == 'end' else index, iid)
+        return iid
+
+    def item(self, iid, **options):
+        self.calls['item'] += 1
+
+    def delete(self, *iids):
+        self.calls['delete'] += 1
+        removed = set(iids)
+        self.children = [iid for iid in self.children if iid not in removed]
+
+    def move(self, iid, parent, index):
+        self.calls['move'] += 1
+        self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def index(self, iid):
+        return self.children.index(iid)
+
+    def get_children(self, item=''):
+        return tuple(self.children)
+
+    def tag_configure(self, tag, **options):
+        self.calls['tag_configure'] += 1
+        self.tags.add(tag)
+
+    def configure(self, **options):
+        pass
+
+    def heading(self, column, **options):
+        pass
+
+    def __getitem__(self, option):
+        return ()
+
+
+class Scrollbar:
+    def set(self, first, last):
+        pass
+
+    def config(self, **options):
+        pass
+
+
+def make_view(count):
+    """A prices view over count synthetic items, without a Tk window"""
+    view = OSRSPriceTracker.__new__(OSRSPriceTracker)
+    view.data = {'items': ItemTable(make_items(count)), 'settings': dict(DEFAULT_SETTINGS)}
+    view.tree = CountingTree()
+    view.prices_scrollbar = Scrollbar()
+    view.sort_column = None
+    view.sort_reverse = False
+    view.sort_orders = {}
+    view.virtual_mode = False
+    view.view_order = []
+    view.view_order_dirty = True
+    view.view_offset = 0
+    view.page_size = 30
+    view.rendered_rows = {}
+    return view
+
+
+def rebuild_every_row(view):
+    """The old refresh_tree: delete every row, then insert and colour each again"""
+    view.tree.delete(*view.tree.get_children())
+    for idx, item_data in enumerate(view.data['items']):
+        # The old inline formatting read the same fields with get()
+        values, tag = view.format_item_row(tuple(item_data.get(field, 0) for field in ROW_FIELDS))
+        item_id = view.tree.insert('', 'end', values=values, tags=(f'data_index_{idx}',))
+        if tag:
+            view.tree.tag_configure(f'{tag}_{item_id}', foreground='#00FF00' if tag == 'green' else '#FF0000')
+            view.tree.item(item_id, tags=(f'{tag}_{item_id}', f'data_index_{idx}'))
+
+
+def timed(label, view, func):
+    view.tree.calls.clear()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    calls = sum(view.tree.calls.values())
+    print(f"{label:<40} {elapsed * 1000:9.2f} ms {calls:9,} widget calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--virtual-items', type=int, default=50000)
+    args = parser.parse_args()
+
+    for label, old in (('diffed rows', False), ('old full rebuild', True)):
+        print(f"{args.items:,} rows, {label}")
+        view = make_view(args.items)
+        view.data['settings']['virtual_grid_threshold'] = args.items
+        refresh = (lambda: rebuild_every_row(view)) if old else view.refresh_tree
+        timed("  first refresh", view, refresh)
+        timed("  refresh, nothing changed", view, refresh)
+        view.data['items'][args.items // 2]['current_price'] += 1
+        timed("  refresh, one price changed", view, refresh)
+        print(f"  {len(view.tree.tags):,} colour tags configured")
+
+    # Above virtual_grid_threshold only the visible window has rows
+    print(f"{args.virtual_items:,} items, virtual grid")
+    view = make_view(args.virtual_items)
+    timed("  old full rebuild", view, lambda: rebuild_every_row(view))
+    view = make_view(args.virtual_items)
+    timed("  first virtual render", view, view.refresh_tree)
+    timed("  scroll one page", view, lambda: view.on_virtual_scroll('scroll', 1, 'pages'))
+    timed("  scroll to the middle", view, lambda: view.on_virtual_scroll('moveto', '0.5'))
+    timed("  sort by Portfolio Value", view, lambda: view.sort_treeview('Portfolio Value'))
+    timed("  reverse the sort", view, lambda: view.sort_treeview('Portfolio Value'))
+
+
+if __name__ == '__main__':
+    main()
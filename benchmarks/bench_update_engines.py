@@ -0,0 +1,114 @@
+"""Compare the thread and asyncio update engines against a local stub server
+
+Run from the repository root: python -m benchmarks.bench_update_engines
+
+Every item is a distinct page on the StubServer from tests/conftest.py,
+served from a child process so its connection threads are not counted.
+Each run is one PriceTracker.fetch_prices() over all items with the HTML
+source, no rate limit and no cache. Reported are the wall-clock time and
+the most threads this process had running at once, sampled every
+millisecond. The async engine needs aiohttp.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from osrs_core import DEFAULT_SETTINGS, AsyncUpdateEngine, PriceTracker
+
+
+def item_path(index):
+    return f"/Item+{index}/viewitem?obj={index + 1}"
+
+
+def serve(count, ports, stop):
+    """Child process: serve count item pages until stop is set"""
+    from tests.conftest import StubServer, read_fixture
+    page = read_fixture('pages', 'abyssal_whip.html').encode('utf-8')
+    server = StubServer()
+    for index in range(count):
+        server.routes[item_path(index)] = (200, {'Content-Type': 'text/html; charset=utf-8'}, page)
+    ports.put(server.server.server_port)
+    stop.wait()
+    server.close()
+
+
+class ThreadPeak:
+    """Sample threading.active_count() on a background thread"""
+
+    def __init__(self):
+        self.peak = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.baseline = threading.active_count() + 1  # this sampler included
+        self.thread.start()
+
+    def sample(self):
+        while self.running:
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.001)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        return self.peak - self.baseline
+
+
+def run(engine, port, count, concurrency):
+    directory = tempfile.mkdtemp(prefix='osrs_bench_')
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        items = [{'name': f"Item {index}", 'url': f"http://127.0.0.1:{port}{item_path(index)}",
+                  'reference_price': 0, 'buy_price': 0, 'sell_price': 0, 'quantity': 1,
+                  'current_price': 0, 'change_1m': 0, 'change_3m': 0, 'change_6m': 0,
+                  'last_updated': ''} for index in range(count)]
+        settings = dict(DEFAULT_SETTINGS, price_source='html', update_engine=engine, cache_ttl_minutes=0,
+                        rate_limit_per_second=0, async_concurrency=concurrency)
+        with open('osrs_tracker_data.json', 'w') as f:
+            json.dump({'items': items, 'transactions': [], 'settings': settings}, f)
+        tracker = PriceTracker()
+        results = []
+        peak = ThreadPeak()
+        start = time.perf_counter()
+        tracker.fetch_prices(list(tracker.data['items']), lambda item, result: results.append(result))
+        elapsed = time.perf_counter() - start
+        threads = peak.stop()
+        tracker.close()
+        assert len(results) == count, f"{engine}: {len(results)} of {count} prices"
+        print(f"  {engine:<8} {elapsed * 1000:10.1f} ms {elapsed / count * 1e6:9.0f} us/item "
+              f"{threads:5} extra threads at peak")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_SETTINGS['async_concurrency'],
+                        help="requests the async engine keeps in flight")
+    args = parser.parse_args()
+
+    engines = ['thread'] + (['async'] if AsyncUpdateEngine.available() else [])
+    ports = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(max(args.sizes), ports, stop), daemon=True)
+    server.start()
+    try:
+        port = ports.get(timeout=30)
+        for count in args.sizes:
+            print(f"{count:,} items")
+            for engine in engines:
+                run(engine, port, count, args.concurrency)
+    finally:
+        stop.set()
+        server.join(5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic portfolios for the benchmarks
+
+Every generator takes a seed, so runs with the same arguments see the
+same data.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from osrs_core import item_url
+
+ADJECTIVES = ('Bronze', 'Iron', 'Steel', 'Black', 'Mithril', 'Adamant', 'Rune', 'Dragon',
+              'Ancient', 'Blessed', 'Cursed', 'Crystal', 'Elder', 'Gilded', 'Infernal', 'Twisted')
+NOUNS = ('sword', 'pickaxe', 'platebody', 'arrow', 'bones', 'shield', 'helm', 'boots',
+         'gloves', 'axe', 'dagger', 'staff', 'ring', 'amulet', 'seed', 'potion', 'logs', 'ore')
+
+
+def item_names(count, seed=0):
+    """count distinct item names such as 'Rune pickaxe 17'"""
+    rng = random.Random(seed)
+    return [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index}" for index in range(count)]
+
+
+def make_items(count, seed=0, priced=0.9, held=0.5):
+    """Item dicts as the tracker stores them; about priced of them have a current price"""
+    rng = random.Random(seed)
+    items = []
+    for index, name in enumerate(item_names(count, seed)):
+        reference = rng.randint(1, 2000000)
+        current = int(reference * rng.uniform(0.7, 1.3)) if rng.random() < priced else 0
+        items.append({
+            'name': name,
+            'url': item_url(name, index + 1),
+            'reference_price': reference,
+            'buy_price': 0,
+            'sell_price': 0,
+            'quantity': rng.randint(1, 5000) if rng.random() < held else 0,
+            'current_price': current,
+            'change_1m': round(rng.uniform(-20, 20), 1),
+            'change_3m': round(rng.uniform(-30, 30), 1),
+            'change_6m': round(rng.uniform(-50, 50), 1),
+            'last_updated': '2026-01-01 00:00:00' if current else ''
+        })
+    return items
+
+
+def make_transactions(names, count, seed=0, start=datetime(2020, 1, 1)):
+    """count BUY/SELL transactions over names, one minute apart, with ids from 1
+
+    Sells never exceed the quantity held, so every ledger stays valid.
+    """
+    rng = random.Random(seed)
+    held = dict.fromkeys(names, 0)
+    transactions = []
+    for index in range(count):
+        name = rng.choice(names)
+        price = rng.randint(1, 100000)
+        if held[name] and rng.random() < 0.4:
+            quantity = rng.randint(1, held[name])
+            kind = 'SELL'
+            new_quantity = held[name] - quantity
+        else:
+            quantity = rng.randint(1, 1000)
+            kind = 'BUY'
+            new_quantity = held[name] + quantity
+        transactions.append({
+            'id': index + 1,
+            'date': (start + timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S"),
+            'item_name': name,
+            'type': kind,
+            'quantity': quantity,
+            'price_per_unit': price,
+            'total_cost': quantity * price,
+            'old_quantity': held[name],
+            'new_quantity': new_quantity
+        })
+        held[name] = new_quantity
+    return transactions
+
+
+def fill_history(store, keys, days, seed=0, now=None):
+    """Append one random-walk price per day for the last days days to every key"""
+    rng = random.Random(seed)
+    now = time.time() if now is None else now
+    for key in keys:
+        price = rng.randint(100, 1000000)
+        points = []
+        for day in range(days, 0, -1):
+            price = max(1, int(price * rng.uniform(0.95, 1.05)))
+            points.append((now - day * 86400, price))
+        store.extend(key, points)
@@ -0,0 +1,163 @@
+from bisect import bisect_left, bisect_right
+
+# What a rule watches: the price itself, the % change of the price against
+# the item's reference_price, or the item's 1 month change
+ALERT_METRICS = ('price', 'change_percent', 'change_1m')
+
+# 'above' fires when the value rises to or past the threshold, 'below'
+# when it falls to or past it
+ALERT_DIRECTIONS = ('above', 'below')
+
+
+def metric_values(item):
+    """The value of every alert metric for an item, None where there is no price"""
+    current_price = item.get('current_price', 0)
+    reference_price = item.get('reference_price', 0)
+    if current_price <= 0:
+        return {'price': None, 'change_percent': None, 'change_1m': None}
+    change_percent = None
+    if reference_price > 0:
+        change_percent = (current_price - reference_price) / reference_price * 100
+    return {'price': current_price, 'change_percent': change_percent,
+            'change_1m': item.get('change_1m', 0)}
+
+
+def describe_rule(rule):
+    """Human-readable text of a rule, e.g. 'Abyssal whip price above 2,500,000'"""
+    threshold = rule['threshold']
+    if rule['metric'] == 'price':
+        target = f"price {rule['direction']} {threshold:,}"
+    elif rule['metric'] == 'change_percent':
+        target = f"change vs reference {rule['direction']} {threshold:+g}%"
+    else:
+        target = f"1M change {rule['direction']} {threshold:+g}%"
+    return f"{rule['item_name']} {target}"
+
+
+def format_value(metric, value):
+    """A metric value as shown in alert messages"""
+    if metric == 'price':
+        return f"{value:,} gp"
+    return f"{value:+.2f}%"
+
+
+class ThresholdIndex:
+    """Thresholds of one item, metric and direction kept in sorted order
+
+    thresholds and rule_ids are parallel lists, so a price move selects
+    every crossed threshold with two bisections.
+    """
+
+    __slots__ = ('thresholds', 'rule_ids')
+
+    def __init__(self):
+        self.thresholds = []
+        self.rule_ids = []
+
+    def add(self, threshold, rule_id):
+        position = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(position, threshold)
+        self.rule_ids.insert(position, rule_id)
+
+    def remove(self, threshold, rule_id):
+        position = bisect_left(self.thresholds, threshold)
+        while self.rule_ids[position] != rule_id:
+            position += 1
+        del self.thresholds[position]
+        del self.rule_ids[position]
+
+    def between(self, low, high, include_low, include_high):
+        """Rule ids with low < threshold < high, either end optionally included"""
+        start = (bisect_left if include_low else bisect_right)(self.thresholds, low)
+        end = (bisect_right if include_high else bisect_left)(self.thresholds, high)
+        return self.rule_ids[start:end]
+
+
+class AlertEngine:
+    """User-defined alert rules, checked as each price arrives
+
+    A rule is a dict with item_name, metric (one of ALERT_METRICS),
+    direction ('above' or 'below') and threshold. Rules fire when a value
+    crosses their threshold: 'above' when it moves from below the threshold
+    to at or above it, 'below' the other way round. An item seen for the
+    first time (no earlier value) fires every rule its value already
+    satisfies.
+
+    Rules are indexed per item, metric and direction in ThresholdIndex, so
+    checking one update costs a few bisections plus the rules that fire,
+    however many rules there are.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = {}
+        self.indexes = {}
+        self.next_rule_id = 1
+        for rule in rules:
+            self.add(rule)
+
+    def _index(self, rule):
+        key = (rule['item_name'], rule['metric'], rule['direction'])
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = ThresholdIndex()
+        return index
+
+    def add(self, rule):
+        """Add a rule, numbering it under 'id' if it has none; returns the rule"""
+        if rule['metric'] not in ALERT_METRICS:
+            raise ValueError(f"Unknown alert metric: {rule['metric']}")
+        if rule['direction'] not in ALERT_DIRECTIONS:
+            raise ValueError(f"Unknown alert direction: {rule['direction']}")
+        if not rule.get('id'):
+            rule['id'] = self.next_rule_id
+        self.next_rule_id = max(self.next_rule_id, rule['id'] + 1)
+        self.rules[rule['id']] = rule
+        self._index(rule).add(rule['threshold'], rule['id'])
+        return rule
+
+    def remove(self, rule_id):
+        """Remove a rule by id; returns it, or None if there was no such rule"""
+        rule = self.rules.pop(rule_id, None)
+        if rule is not None:
+            self._index(rule).remove(rule['threshold'], rule_id)
+        return rule
+
+    def rules_for(self, item_name):
+        """The rules of one item, in the order they were added"""
+        return [rule for rule in self.rules.values() if rule['item_name'] == item_name]
+
+    def check(self, item_name, old_values, new_values):
+        """Return [(rule, value), ...] for the rules crossed by an update
+
+        old_values and new_values map each metric to its value before and
+        after the update (see metric_values); None means unknown.
+        """
+        fired = []
+        for metric in ALERT_METRICS:
+            new = new_values.get(metric)
+            if new is None:
+                continue
+            old = old_values.get(metric)
+            above = self.indexes.get((item_name, metric, 'above'))
+            if above is not None:
+                if old is None:
+                    rule_ids = above.between(float('-inf'), new, True, True)
+                elif new > old:
+                    rule_ids = above.between(old, new, False, True)
+                else:
+                    rule_ids = []
+                fired.extend((self.rules[rule_id], new) for rule_id in rule_ids)
+            below = self.indexes.get((item_name, metric, 'below'))
+            if below is not None:
+                if old is None:
+                    rule_ids = below.between(new, float('inf'), True, True)
+                elif new < old:
+                    rule_ids = below.between(new, old, True, False)
+                else:
+                    rule_ids = []
+                fired.extend((self.rules[rule_id], new) for rule_id in rule_ids)
+        return fired
+
+    def to_list(self):
+        """The rules as plain dicts, for saving"""
+        return list(self.rules.values())
@@ -0,0 +1,318 @@
+import math
+import time
+from array import array
+from bisect import bisect_left
+
+from osrs_history import DAY
+
+try:
+    import numpy as np
+except ImportError:  # optional: the portfolio series is summed in Python instead
+    np = None
+
+# Days of recorded history the value series covers
+SERIES_DAYS = 365
+
+# Daily returns in each rolling volatility window
+VOLATILITY_WINDOW = 30
+
+
+class PortfolioAnalytics:
+    """Portfolio-wide figures from the item table and the price history
+
+    Totals, allocation and value-weighted changes come from the item
+    columns. Volatility and drawdown come from a daily portfolio value
+    series: each held price key's daily closing prices over the last
+    SERIES_DAYS days, multiplied by the quantity held and summed.
+
+    compute() returns the cached result until the items change, the
+    history gets new points or the day rolls over. The daily closes are
+    kept as rows of one matrix, and only the rows of keys written since the
+    last call are read again. When the day rolls over the matrix shifts
+    left and each row's last close carries into the new days, so only a
+    cold build (or a gap of SERIES_DAYS or more) reads every key.
+    """
+
+    def __init__(self, history, key_func):
+        self.history = history
+        self.key_func = key_func
+        self.keys_by_url = {}
+        self.rows = {}      # price key -> row of the closes matrix, or None without history
+        self.stale = set()  # keys whose row must be read again
+        self.matrix = None  # daily closes, SERIES_DAYS per row
+        self.row_count = 0
+        self.last_days = {}  # price key -> day of its latest point, None without any
+        self.first_day = None
+        self.history_version = 0
+        self.stamp = None
+        self.result = None
+
+    def price_key(self, url):
+        key = self.keys_by_url.get(url)
+        if key is None:
+            key = self.keys_by_url[url] = self.key_func(url)
+        return key
+
+    def compute(self, items, now=None):
+        """Return the analytics for an ItemTable as a dict
+
+        total_value, held_items, allocation (name, value, weight) largest
+        first, change_1m/3m/6m weighted by value, series (day start, value)
+        pairs, volatility (standard deviation of daily returns over the last
+        VOLATILITY_WINDOW days, in %), volatility_series and max_drawdown
+        (largest fall from a peak, in %, 0 or negative).
+        """
+        if now is None:
+            now = time.time()
+        first_day = int(now // DAY) - SERIES_DAYS + 1
+        stamp = (items.version, self.history.version, first_day)
+        if stamp == self.stamp:
+            return self.result
+
+        if first_day != self.first_day:
+            days = first_day - self.first_day if self.first_day is not None else 0
+            if 0 < days < SERIES_DAYS:
+                self.shift(days)
+            else:
+                self.first_day = first_day
+                self.rows = {}
+                self.stale = set()
+                self.matrix = None
+                self.row_count = 0
+                self.last_days = {}
+        self.stale.update(self.history.changed_since(self.history_version))
+        self.history_version = self.history.version
+
+        values = items.portfolio_values()
+        held = [position for position, value in enumerate(values) if value > 0]
+        total_value = sum(values[position] for position in held)
+
+        names = items.columns['name']
+        changes = {}
+        if np is not None and held:
+            value_array = np.array(values, dtype=np.float64)
+            weights = value_array / total_value
+            order = np.argsort(-value_array[held], kind='stable')
+            largest = np.array(held)[order].tolist()
+            allocation = [(names[position], values[position], weight)
+                          for position, weight in zip(largest, weights[largest].tolist())]
+            for field in ('change_1m', 'change_3m', 'change_6m'):
+                changes[field] = float(np.frombuffer(items.columns[field], dtype=np.float64) @ weights)
+        else:
+            allocation = sorted(((names[position], values[position], values[position] / total_value)
+                                 for position in held), key=lambda entry: entry[1], reverse=True)
+            for field in ('change_1m', 'change_3m', 'change_6m'):
+                column = items.columns[field]
+                changes[field] = sum(column[position] * values[position] for position in held) / total_value \
+                    if total_value else 0.0
+
+        series = self.value_series(items, held)
+        volatility_series = rolling_volatility(series)
+        result = {
+            'total_value': total_value,
+            'held_items': len(held),
+            'allocation': allocation,
+            'change_1m': changes['change_1m'],
+            'change_3m': changes['change_3m'],
+            'change_6m': changes['change_6m'],
+            'series': [((first_day + day) * DAY, value) for day, value in enumerate(series)],
+            'volatility': volatility_series[-1] if volatility_series else 0.0,
+            'volatility_series': volatility_series,
+            'max_drawdown': max_drawdown(series)
+        }
+        self.stamp = stamp
+        self.result = result
+        return result
+
+    def shift(self, days):
+        """Move the window `days` later without reading the history again
+
+        Every row drops its first `days` closes and repeats its last one for
+        the new days, which is what a fresh read gives unless the key has
+        points in those days. Keys written since the last call are marked
+        stale by compute(); this marks the others a fresh read would differ
+        for: keys whose points all fell out of the window, and keys with
+        points timestamped after the old window that now fall inside it.
+        """
+        if self.matrix is not None:
+            if np is not None:
+                used = self.matrix[:self.row_count]
+                used[:, :-days] = used[:, days:]
+                used[:, -days:] = used[:, -days - 1:-days]
+            else:
+                for closes in self.matrix:
+                    del closes[:days]
+                    closes.extend([closes[-1]] * days)
+        old_last_day = self.first_day + SERIES_DAYS - 1
+        self.first_day += days
+        for key, last_day in self.last_days.items():
+            if last_day is not None and (last_day > old_last_day or
+                                         (last_day < self.first_day and self.rows.get(key) is not None)):
+                self.stale.add(key)
+
+    def load_rows(self, keys):
+        """Read the daily closes of keys into their matrix rows"""
+        start = self.first_day * DAY
+        end = start + SERIES_DAYS * DAY
+        columns = []
+        carried = []
+        rows = []
+        for key in keys:
+            timestamps, prices = self.history.range_columns(key)
+            self.last_days[key] = timestamps[-1] // DAY if timestamps else None
+            lo = bisect_left(timestamps, start)
+            hi = bisect_left(timestamps, end, lo)
+            row = self.rows.get(key)
+            if lo == hi:
+                # A row already assigned keeps its slot; it is just no longer used
+                self.rows[key] = None
+                continue
+            if row is None:
+                row = self.rows[key] = self.row_count
+                self.row_count += 1
+            columns.append((timestamps[lo:hi], prices[lo:hi]))
+            # The last price before the window opens it, as if the key had been read a day earlier
+            carried.append(prices[lo - 1] if lo else None)
+            rows.append(row)
+        if not rows:
+            return
+        if np is not None:
+            if self.matrix is None or self.row_count > len(self.matrix):
+                grown = np.zeros((max(64, 2 * self.row_count), SERIES_DAYS))
+                if self.matrix is not None:
+                    grown[:len(self.matrix)] = self.matrix
+                self.matrix = grown
+            self.matrix[rows] = daily_close_matrix(columns, start, carried)
+            return
+        if self.matrix is None:
+            self.matrix = []
+        for row, (timestamps, prices), before in zip(rows, columns, carried):
+            closes = daily_closes(timestamps, prices, start, before)
+            if row == len(self.matrix):
+                self.matrix.append(closes)
+            else:
+                self.matrix[row] = closes
+
+    def value_series(self, items, held):
+        """Daily portfolio value over the window for the held positions"""
+        urls = items.columns['url']
+        keys = [self.price_key(urls[position]) for position in held]
+        self.load_rows([key for key in dict.fromkeys(keys) if key not in self.rows or key in self.stale])
+        self.stale.difference_update(keys)
+
+        quantity_by_row = {}
+        constant = 0
+        quantities = items.columns['quantity']
+        prices = items.columns['current_price']
+        for position, key in zip(held, keys):
+            row = self.rows[key]
+            if row is None:
+                # No recorded history: the current price stands for the whole window
+                constant += prices[position] * quantities[position]
+            else:
+                quantity_by_row[row] = quantity_by_row.get(row, 0) + quantities[position]
+
+        if not quantity_by_row:
+            return [float(constant)] * SERIES_DAYS if constant else []
+        if np is not None:
+            weights = np.zeros(len(self.matrix))
+            weights[list(quantity_by_row)] = list(quantity_by_row.values())
+            return (weights @ self.matrix + constant).tolist()
+        series = [float(constant)] * SERIES_DAYS
+        for row, quantity in quantity_by_row.items():
+            for day, price in enumerate(self.matrix[row]):
+                series[day] += quantity * price
+        return series
+
+
+def daily_closes(timestamps, prices, start, carried=None):
+    """Last price of each of the SERIES_DAYS days from start, carried over days without one
+
+    timestamps and prices are a key's points in the window, at least one.
+    Days before the first point take carried, the last price before the
+    window, or the first price if there is none, so a key that starts
+    being tracked mid-window does not look like a jump in value.
+    """
+    closes = array('d', bytes(8 * SERIES_DAYS))
+    filled = -1
+    price = prices[0] if carried is None else carried
+    for timestamp, point_price in zip(timestamps, prices):
+        day = (timestamp - start) // DAY
+        if day > filled:
+            # Carry the previous close across the days in between
+            for gap_day in range(filled + 1, day):
+                closes[gap_day] = price
+            filled = day
+        price = point_price
+        closes[day] = price
+    for gap_day in range(filled + 1, SERIES_DAYS):
+        closes[gap_day] = price
+    return closes
+
+
+def daily_close_matrix(columns, start, carried=None):
+    """daily_closes() of many keys at once, one row per (timestamps, prices)
+
+    carried, if given, holds each row's price before the window or None.
+
+    All points go into one array, so the work is a few NumPy calls however
+    many keys there are.
+    """
+    counts = np.array([len(timestamps) for timestamps, prices in columns])
+    timestamps = np.frombuffer(b''.join(timestamps for timestamps, prices in columns), dtype=np.int64)
+    prices = np.frombuffer(b''.join(prices for timestamps, prices in columns), dtype=np.int64)
+    # Cell of each point in a keys x days matrix, ascending as every key's points are
+    cells = np.repeat(np.arange(len(columns)) * SERIES_DAYS, counts) + (timestamps - start) // DAY
+    # The last point in a cell is that day's close
+    last = np.flatnonzero(np.append(cells[1:] != cells[:-1], True))
+    shape = (len(columns), SERIES_DAYS)
+    closes = np.zeros(shape)
+    closes.reshape(-1)[cells[last]] = prices[last]
+    recorded = np.zeros(shape, dtype=bool)
+    recorded.reshape(-1)[cells[last]] = True
+    # Each day takes the close of the latest recorded day up to it...
+    latest = np.maximum.accumulate(np.where(recorded, np.arange(SERIES_DAYS), -1), axis=1)
+    matrix = np.take_along_axis(closes, np.maximum(latest, 0), axis=1)
+    # ...and days before the first point the carried or else the first price
+    first_prices = prices[np.cumsum(counts) - counts].astype(np.float64)
+    if carried is not None:
+        first_prices = np.array([first if before is None else before
+                                 for first, before in zip(first_prices.tolist(), carried)], dtype=np.float64)
+    return np.where(latest >= 0, matrix, first_prices[:, None])
+
+
+def daily_returns(series):
+    """Day-over-day returns of a value series, skipping days valued at 0"""
+    return [value / previous - 1 for previous, value in zip(series, series[1:]) if previous > 0]
+
+
+def rolling_volatility(series, window=VOLATILITY_WINDOW):
+    """Population standard deviation of daily returns per trailing window, in %"""
+    returns = daily_returns(series)
+    if len(returns) < window:
+        return []
+    if np is not None:
+        windows = np.lib.stride_tricks.sliding_window_view(np.array(returns), window)
+        return (windows.std(axis=1) * 100).tolist()
+    volatility = []
+    for end in range(window, len(returns) + 1):
+        chunk = returns[end - window:end]
+        mean = sum(chunk) / window
+        volatility.append(math.sqrt(sum((r - mean) ** 2 for r in chunk) / window) * 100)
+    return volatility
+
+
+def max_drawdown(series):
+    """Largest fall from a running peak, in % (0 when the series never falls)"""
+    if np is not None and len(series):
+        values = np.array(series)
+        peaks = np.maximum.accumulate(values)
+        drawdowns = np.divide(values - peaks, peaks, out=np.zeros_like(values), where=peaks > 0)
+        return float(drawdowns.min()) * 100
+    worst = 0.0
+    peak = 0
+    for value in series:
+        peak = max(peak, value)
+        if peak > 0:
+            worst = min(worst, (value - peak) / peak)
+    return worst * 100
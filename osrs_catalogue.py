@@ -0,0 +1,178 @@
+import csv
+import heapq
+import json
+import os
+import re
+from bisect import bisect_left
+
+# Names and ids of every tradeable item, from the OSRS Wiki prices API
+MAPPING_URL = 'https://prices.runescape.wiki/api/v1/osrs/mapping'
+
+# A cached catalogue older than this is fetched again (seconds)
+CATALOGUE_MAX_AGE = 7 * 86400
+
+# Bulk import header names -> item fields
+IMPORT_COLUMNS = {
+    'name': 'name',
+    'item': 'name',
+    'item name': 'name',
+    'quantity': 'quantity',
+    'qty': 'quantity',
+    'reference price': 'reference_price',
+    'reference_price': 'reference_price',
+    'buy price': 'buy_price',
+    'buy_price': 'buy_price',
+    'sell price': 'sell_price',
+    'sell_price': 'sell_price'
+}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+class ItemCatalogue:
+    """Item names and itemdb ids, searchable by prefix as you type
+
+    Names are kept in a sorted array of lowercased keys, so a prefix search
+    is one bisection plus a short forward scan. A second sorted array holds
+    every word of every name, so 'pick' also finds 'Dragon pickaxe' and
+    'dra pick' finds it by the starts of two of its words.
+    """
+
+    def __init__(self, entries=()):
+        by_key = {}
+        for name, item_id in entries:
+            by_key.setdefault(name.lower(), (name, item_id))
+        self.keys = sorted(by_key)
+        self.names = [by_key[key][0] for key in self.keys]
+        self.ids = [by_key[key][1] for key in self.keys]
+        
+        # Distinct words, each with the ascending positions of the names using it
+        self.key_words = [tuple(set(_WORD.findall(key))) for key in self.keys]
+        postings = {}
+        for position, key_words in enumerate(self.key_words):
+            for word in key_words:
+                postings.setdefault(word, []).append(position)
+        self.words = sorted(postings)
+        self.postings = [postings[word] for word in self.words]
+        # posting_offsets[i] is the number of postings before word i
+        self.posting_offsets = [0]
+        for positions in self.postings:
+            self.posting_offsets.append(self.posting_offsets[-1] + len(positions))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, name):
+        """(name as catalogued, item id) for an exact name in any case, or None"""
+        key = name.strip().lower()
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.names[position], self.ids[position]
+        return None
+
+    @staticmethod
+    def _prefixed(keys, prefix, limit=None):
+        """Range of positions in a sorted list whose entries start with prefix"""
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\uffff', start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return range(start, end)
+
+    def search(self, query, limit=10):
+        """Return up to limit (name, id) pairs matching a partial name
+
+        Names starting with the query come first, in alphabetical order,
+        then names whose words start with every word of the query.
+        """
+        key = query.strip().lower()
+        if not key:
+            return []
+        positions = list(self._prefixed(self.keys, key, limit))
+        query_words = _WORD.findall(key)
+        if len(positions) < limit and query_words:
+            # Walk the names containing the rarest query word in name order,
+            # so the scan stops at the first limit matches
+            word_ranges = [self._prefixed(self.words, word) for word in query_words]
+            rarest = min(word_ranges, key=lambda words: self.posting_offsets[words.stop] -
+                         self.posting_offsets[words.start])
+            seen = set(positions)
+            previous = None
+            for position in heapq.merge(*(self.postings[word] for word in rarest)):
+                if position == previous or position in seen:
+                    continue
+                previous = position
+                name_words = self.key_words[position]
+                if all(any(word.startswith(query_word) for word in name_words)
+                       for query_word in query_words):
+                    positions.append(position)
+                    if len(positions) >= limit:
+                        break
+        return [(self.names[position], self.ids[position]) for position in positions]
+
+    def to_list(self):
+        return [{'name': name, 'id': item_id} for name, item_id in zip(self.names, self.ids)]
+
+
+def load_catalogue(path):
+    """Return the catalogue from a cache file, or None if there is none"""
+    try:
+        with open(path, 'r') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return ItemCatalogue((entry['name'], entry['id']) for entry in entries)
+
+
+def save_catalogue(path, catalogue):
+    """Write the catalogue cache atomically"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(catalogue.to_list(), f)
+    os.replace(temp_path, path)
+
+
+def fetch_catalogue(http):
+    """Download every item name and id through a PriceSession"""
+    response = http.get(MAPPING_URL)
+    response.raise_for_status()
+    return ItemCatalogue((entry['name'], entry['id']) for entry in response.json()
+                         if 'name' in entry and 'id' in entry)
+
+
+def read_import_rows(lines):
+    """Parse a bulk import list into dicts with name and any of quantity,
+    reference_price, buy_price and sell_price
+
+    Accepts a plain list with one name per line, CSV rows of
+    name[,quantity[,reference_price]], or CSV with a header row naming the
+    columns. Blank lines and lines starting with # are skipped. Returns
+    (entries, invalid): rows with a value that is not a number are left
+    out and listed in invalid as (line number, reason).
+    """
+    reader = csv.reader(lines)
+    # line_num is read once the row has been, so it is the row's (last) line
+    rows = [(reader.line_num, row) for row in reader
+            if row and row[0].strip() and not row[0].lstrip().startswith('#')]
+    if rows and rows[0][1][0].strip().lower() in ('name', 'item', 'item name'):
+        header = [IMPORT_COLUMNS.get(column.strip().lower()) for column in rows[0][1]]
+        rows = rows[1:]
+    else:
+        header = ['name', 'quantity', 'reference_price']
+    entries = []
+    invalid = []
+    for line_number, row in rows:
+        entry = {}
+        for column, value in zip(header, row):
+            value = value.strip()
+            if column == 'name':
+                entry['name'] = value
+            elif column is not None and value:
+                try:
+                    entry[column] = int(float(value.replace(',', '')))
+                except ValueError:
+                    invalid.append((line_number, f"{column} '{value}' is not a number"))
+                    break
+        else:
+            entries.append(entry)
+    return entries, invalid
@@ -0,0 +1,205 @@
+import argparse
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+
+from osrs_alerts import ALERT_DIRECTIONS, ALERT_METRICS, describe_rule
+from osrs_analytics import VOLATILITY_WINDOW
+from osrs_core import PriceTracker
+from osrs_export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, parse_export_date
+
+# export argument -> PriceTracker.export() dataset
+EXPORT_DATASETS = {
+    'prices': 'prices',
+    'history': 'transactions',
+    'transactions': 'transactions',
+    'price-history': 'price_history'
+}
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def log_compaction(removed):
+    if removed is not None:
+        log(f"Compacted price history: {removed:,} points removed")
+
+
+def run_update(tracker, args):
+    """Refresh every price once and save"""
+    log(tracker.update_all_prices())
+    log_compaction(tracker.compact_history())
+
+
+def run_compact(tracker, args):
+    """Thin out and drop old price history points now"""
+    log_compaction(tracker.compact_history(force=True))
+
+
+def end_date(text):
+    """--to value: a bare date includes that whole day"""
+    return parse_export_date(text, end_of_day=True)
+
+
+def run_export(tracker, args):
+    """Stream prices, transactions or price history to a CSV, JSON Lines, Parquet or Arrow file"""
+    dataset = EXPORT_DATASETS[args.what]
+    file_path = args.output or \
+        f"osrs_{dataset}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{args.format or 'csv'}"
+
+    def progress(rows):
+        if rows % (10 * EXPORT_CHUNK_ROWS) == 0:
+            log(f"Exported {rows:,} rows...")
+
+    rows = tracker.export(dataset, file_path, args.format, args.start, args.end, args.item, progress)
+    log(f"Exported {rows:,} {args.what} rows to {file_path}")
+
+
+def run_analytics(tracker, args):
+    """Print portfolio totals, allocation, volatility and drawdown"""
+    analytics = tracker.get_analytics()
+    print(f"Total value: {analytics['total_value']:,} gp across {analytics['held_items']} held items")
+    print(f"Value-weighted change: 1M {analytics['change_1m']:+.2f}% | "
+          f"3M {analytics['change_3m']:+.2f}% | 6M {analytics['change_6m']:+.2f}%")
+    print(f"Volatility ({VOLATILITY_WINDOW}d, daily): {analytics['volatility']:.2f}% | "
+          f"Max drawdown: {analytics['max_drawdown']:.2f}%")
+    for name, value, weight in analytics['allocation'][:args.top]:
+        print(f"  {name:<30} {value:>15,} gp {weight * 100:6.2f}%")
+
+
+def run_alerts(tracker, args):
+    """List, add or remove price alert rules"""
+    if args.action == 'add':
+        threshold = int(args.threshold) if args.metric == 'price' else args.threshold
+        rule = tracker.add_alert(args.item, args.metric, args.direction, threshold)
+        log(f"Added alert {rule['id']}: {describe_rule(rule)}")
+    elif args.action == 'remove':
+        rule = tracker.remove_alert(args.id)
+        if rule is None:
+            log(f"No alert with id {args.id}")
+        else:
+            log(f"Removed alert {args.id}: {describe_rule(rule)}")
+    else:
+        for rule in tracker.alerts.to_list():
+            print(f"{rule['id']:>6}  {describe_rule(rule)}")
+
+
+def run_catalogue(tracker, args):
+    """Download the item catalogue or search it"""
+    if args.action == 'refresh':
+        catalogue = tracker.refresh_catalogue()
+        log(f"Catalogue updated: {len(catalogue)} items")
+    else:
+        for name, item_id in tracker.get_catalogue().search(' '.join(args.query), args.limit):
+            print(f"{item_id:>8}  {name}")
+
+
+def run_import(tracker, args):
+    """Add the items named in a CSV or text file"""
+    if not os.path.exists(tracker.catalogue_file):
+        log("No item catalogue yet; run 'catalogue refresh' first to import by name")
+    added, skipped, unknown, invalid = tracker.import_items_file(args.file)
+    log(f"Imported {len(added)} items ({len(skipped)} already tracked, {len(unknown)} unknown, "
+        f"{len(invalid)} invalid)")
+    for name in unknown:
+        log(f"Unknown item: {name}")
+    for line_number, reason in invalid:
+        log(f"Skipped line {line_number}: {reason}")
+
+
+def run_daemon(tracker, args):
+    """Refresh prices every --interval minutes until interrupted"""
+    def stop(signum, frame):
+        tracker.stop_updating = True
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    interval = args.interval * 60
+    log(f"Refreshing prices every {args.interval:g} minutes")
+    while not tracker.stop_updating:
+        started = time.monotonic()
+        try:
+            message = tracker.update_all_prices()
+            if message is not None:
+                log(message)
+            log_compaction(tracker.compact_history())
+        except Exception as e:
+            # Keep the service alive; the next cycle retries
+            log(f"Update failed: {e}")
+
+        # Sleep in short steps so a signal ends the wait promptly
+        while not tracker.stop_updating and time.monotonic() - started < interval:
+            time.sleep(min(1.0, interval - (time.monotonic() - started)))
+    log("Stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OSRS price tracker without the GUI")
+    parser.add_argument('--data-dir', help="directory holding the tracker's data files (default: current directory)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('update', help="refresh all prices once")
+
+    export_parser = commands.add_parser('export', help="export prices, transactions or price history")
+    export_parser.add_argument('what', choices=list(EXPORT_DATASETS))
+    export_parser.add_argument('-o', '--output', help="output file (default: timestamped name)")
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS,
+                               help="file format (default: from the output extension, else csv)")
+    export_parser.add_argument('--from', dest='start', type=parse_export_date, metavar='DATE',
+                               help="first date to include, YYYY-MM-DD[ HH:MM:SS]")
+    export_parser.add_argument('--to', dest='end', type=end_date, metavar='DATE',
+                               help="last date to include, YYYY-MM-DD[ HH:MM:SS]")
+    export_parser.add_argument('--item', action='append', metavar='NAME',
+                               help="only this item; repeat for several (default: all items)")
+
+    analytics_parser = commands.add_parser('analytics', help="show portfolio totals, allocation and risk")
+    analytics_parser.add_argument('--top', type=int, default=10, help="largest holdings to list (default: 10)")
+
+    alerts_parser = commands.add_parser('alerts', help="manage price alert rules")
+    alert_actions = alerts_parser.add_subparsers(dest='action', required=True)
+    alert_actions.add_parser('list', help="show all rules")
+    add_parser = alert_actions.add_parser('add', help="add a rule")
+    add_parser.add_argument('item', help="item name, as shown in the tracker")
+    add_parser.add_argument('metric', choices=ALERT_METRICS)
+    add_parser.add_argument('direction', choices=ALERT_DIRECTIONS)
+    add_parser.add_argument('threshold', type=float, help="gp for 'price', percent otherwise")
+    remove_parser = alert_actions.add_parser('remove', help="remove a rule")
+    remove_parser.add_argument('id', type=int)
+
+    catalogue_parser = commands.add_parser('catalogue', help="download or search the item catalogue")
+    catalogue_actions = catalogue_parser.add_subparsers(dest='action', required=True)
+    catalogue_actions.add_parser('refresh', help="download every item name and id")
+    search_parser = catalogue_actions.add_parser('search', help="find items by partial name")
+    search_parser.add_argument('query', nargs='+')
+    search_parser.add_argument('--limit', type=int, default=10, help="matches to show (default: 10)")
+
+    import_parser = commands.add_parser('import', help="add items by name from a CSV or text file")
+    import_parser.add_argument('file', help="one name per line, or CSV: name[,quantity[,reference_price]] "
+                                            "or with a header row")
+
+    commands.add_parser('compact', help="thin out and drop old price history now "
+                                        "(otherwise done once a day after updates)")
+
+    daemon_parser = commands.add_parser('daemon', help="refresh prices on a fixed interval")
+    daemon_parser.add_argument('--interval', type=float, default=60, help="minutes between refreshes (default: 60)")
+
+    args = parser.parse_args(argv)
+    if args.data_dir:
+        os.chdir(args.data_dir)
+
+    commands = {'update': run_update, 'export': run_export, 'analytics': run_analytics,
+                'alerts': run_alerts, 'catalogue': run_catalogue, 'import': run_import,
+                'compact': run_compact, 'daemon': run_daemon}
+    tracker = PriceTracker(on_alert=log)
+    try:
+        commands[args.command](tracker, args)
+    finally:
+        tracker.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
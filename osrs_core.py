@@ -0,0 +1,2323 @@
+import requests
+from requests.adapters import HTTPAdapter
+import json
+import threading
+import time
+from datetime import datetime
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from collections import deque
+from bisect import bisect_left, insort
+from urllib.parse import urlparse, parse_qs, quote_plus
+from email.utils import parsedate_to_datetime
+import asyncio
+import codecs
+import sqlite3
+
+from osrs_alerts import AlertEngine, describe_rule, format_value, metric_values
+from osrs_analytics import PortfolioAnalytics
+from osrs_catalogue import (CATALOGUE_MAX_AGE, ItemCatalogue, fetch_catalogue, load_catalogue,
+                            read_import_rows, save_catalogue)
+from osrs_export import EXPORT_COLUMNS, EXPORT_DATE_FORMAT, TimestampFormatter, write_export
+from osrs_extractor import ItemPageExtractor, extract_item_page
+from osrs_history import PriceHistoryStore
+from osrs_items import ItemTable, to_json
+from osrs_scheduler import RefreshScheduler
+from osrs_costbasis import apply_transaction, new_position, position_pnl, recompute, replay
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from plyer import notification as desktop_notification
+except ImportError:
+    desktop_notification = None
+
+# Number of concurrent fetch workers; the HTTP connection pool is sized to match
+MAX_WORKERS = 5
+
+# Engines available for "Update All Prices"; 'async' needs aiohttp installed
+UPDATE_ENGINES = ('thread', 'async')
+
+# Where prices come from: 'api' uses the itemdb JSON endpoints and falls back
+# to scraping the HTML page; 'html' only scrapes
+PRICE_SOURCES = ('api', 'html')
+
+DEFAULT_SETTINGS = {
+    'storage': 'json',
+    'price_source': 'api',
+    'update_engine': 'thread',
+    'stream_pages': True,
+    'async_concurrency': 20,
+    'rate_limit_per_second': 10.0,
+    'rate_limit_burst': 10,
+    'breaker_failures': 5,
+    'breaker_reset_seconds': 30,
+    'cache_ttl_minutes': 60,
+    'virtual_grid_threshold': 2000,
+    'history_retention_days': 0,
+    'history_daily_after_days': 30,
+    'cost_basis_method': 'average',
+    'adaptive_refresh': False,
+    'refresh_base_minutes': 60,
+    'refresh_max_minutes': 7 * 24 * 60,
+    'refresh_budget': 0,
+    'alerts': [],
+    'alert_desktop': False,
+    'alert_webhook_url': ''
+}
+
+# Delay between the first unsaved change and writing the data file (milliseconds)
+SAVE_DEBOUNCE_MS = 1000
+
+# Seconds between automatic price history compactions
+HISTORY_COMPACT_INTERVAL = 24 * 60 * 60
+
+# Bytes read per streamed chunk
+STREAM_CHUNK_SIZE = 8192
+
+# Once a streamed page is parsed, an unread tail up to this size is read
+# out to keep the connection; a longer one costs more than the couple of
+# round trips a new TLS connection takes, so the connection is closed
+STREAM_DRAIN_LIMIT = 32 * 1024
+
+ITEMDB_BASE_URL = 'https://secure.runescape.com/m=itemdb_oldschool'
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Server errors PriceSession retries (through the HostGuard)
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def item_id_from_url(url):
+    """Return the obj id from an itemdb viewitem URL, or None if it has none"""
+    try:
+        return int(parse_qs(urlparse(url).query)['obj'][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def price_key(url):
+    """Key identifying the item a URL points at, used to fetch each item once"""
+    item_id = item_id_from_url(url)
+    return item_id if item_id is not None else url
+
+
+def item_url(name, item_id):
+    """The itemdb viewitem URL of an item"""
+    return f"{ITEMDB_BASE_URL}/{quote_plus(name)}/viewitem?obj={item_id}"
+
+
+def parse_guide_price(value):
+    """Parse an itemdb price such as 5912, '5,912', '12.5k' or '1.2m'"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().lower().replace(',', '')
+    multiplier = 1
+    for suffix, factor in (('k', 1000), ('m', 1000000), ('b', 1000000000)):
+        if text.endswith(suffix):
+            multiplier = factor
+            text = text[:-1]
+            break
+    return int(round(float(text) * multiplier))
+
+
+def parse_percent(value):
+    """Parse an itemdb change such as '-5.0%' or '+12%'; 0 if missing"""
+    if value is None:
+        return 0
+    try:
+        return float(str(value).replace('%', '').replace('+', '').strip())
+    except ValueError:
+        return 0
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request while a host's circuit is open"""
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(tz=retry_at.tzinfo)).total_seconds(), 0)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, up to burst saved up
+
+    reserve() never blocks; it takes a token (going into debt if none are
+    left) and returns how long the caller must wait before using it, so
+    threads sleep and coroutines await the same bucket.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def reserve(self):
+        if self.rate <= 0:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(-self.tokens / self.rate, 0)
+    
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds`, e.g. after a 429"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, 0)
+            # Refill restarts once the pause is over; callers queue behind it
+            self.updated = max(self.updated, now + seconds)
+
+
+class CircuitBreaker:
+    """Stops calls to a failing host, then lets one probe through to test it
+
+    closed: calls go through; failure_threshold failures in a row open it.
+    open: calls fail fast for reset_seconds, then one probe is allowed.
+    half-open: a probe is out; it closes the circuit or opens it again. A
+    probe with no outcome after probe_timeout seconds is given up on and
+    another one is allowed.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30, probe_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.probe_timeout = probe_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_started = 0
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """Return True if a call may go out now"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if (self.state == 'open' and now - self.opened_at >= self.reset_seconds) or \
+                    (self.state == 'half-open' and now - self.probe_started >= self.probe_timeout):
+                self.state = 'half-open'
+                self.probe_started = now
+                return True
+            return False
+    
+    def release(self):
+        """Give back a call that ended without an outcome, e.g. when cancelled
+
+        A released probe lets the next call probe straight away.
+        """
+        with self.lock:
+            if self.state == 'half-open':
+                self.state = 'open'
+    
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class HostGuard:
+    """Per-host rate limiting and circuit breaking shared by every fetch path
+
+    Callers reserve() before each request (sleeping or awaiting the
+    returned delay) and record() its outcome. 429 and 5xx responses and
+    connection errors count as failures; a Retry-After on them pauses the
+    host's bucket for that long.
+    """
+
+    def __init__(self, rate=10.0, burst=10, failure_threshold=5, reset_seconds=30, probe_timeout=60):
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.probe_timeout = probe_timeout
+        self.buckets = {}
+        self.breakers = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        with self.lock:
+            self.throttled = 0
+            self.failed_fast = 0
+            self.waited = 0.0
+    
+    def get_stats(self):
+        """Return throttling counters and the hosts whose circuit is not closed"""
+        with self.lock:
+            return {
+                'throttled': self.throttled,
+                'failed_fast': self.failed_fast,
+                'waited': self.waited,
+                'open_hosts': sorted(host for host, breaker in self.breakers.items()
+                                     if breaker.state != 'closed')
+            }
+    
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_seconds,
+                                                     self.probe_timeout)
+            return self.buckets[host], self.breakers[host]
+    
+    def reserve(self, url):
+        """Return seconds to wait before requesting url; raise CircuitOpenError to fail fast"""
+        bucket, breaker = self._host(url)
+        if not breaker.allow():
+            with self.lock:
+                self.failed_fast += 1
+            raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}; not sending request")
+        wait = bucket.reserve()
+        with self.lock:
+            self.waited += wait
+        return wait
+    
+    def record(self, url, status=None, retry_after=None, error=False):
+        """Record a request's outcome: its HTTP status, or error=True if it never got one"""
+        bucket, breaker = self._host(url)
+        if error or status == 429 or (status is not None and status >= 500):
+            breaker.record_failure()
+            if status == 429:
+                with self.lock:
+                    self.throttled += 1
+            delay = parse_retry_after(retry_after)
+            if delay:
+                bucket.pause(delay)
+        else:
+            breaker.record_success()
+    
+    def release(self, url):
+        """Record that a request reserved for url ended without an outcome"""
+        bucket, breaker = self._host(url)
+        breaker.release()
+
+
+class PriceSession:
+    """Shared keep-alive HTTP session used by every price fetch.
+
+    Wraps a single requests.Session whose connection pool holds one socket
+    per worker, so a full update pays one TCP/TLS handshake per worker
+    instead of one per item. Counters are kept so reuse can be verified.
+    
+    5xx answers, timeouts and connection errors are retried up to retries
+    times with exponential backoff. The retries are made here rather than
+    inside urllib3 so each one waits for the HostGuard like any other
+    request, and stops once the host's circuit opens.
+    """
+
+    def __init__(self, pool_size=MAX_WORKERS, retries=3, backoff_factor=0.5, timeout=10, guard=None,
+                 drain_limit=STREAM_DRAIN_LIMIT):
+        self.timeout = timeout
+        self.guard = guard
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.drain_limit = drain_limit
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        
+        # pool_block keeps the number of open sockets at pool_size even if
+        # more threads than expected share the session; urllib3 itself
+        # makes no retries (see _send)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        
+        self.lock = threading.Lock()
+        # Connections closed mid-body and put back in the pool; the next
+        # request to take one reconnects it
+        self.closed_in_pool = 0
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """Clear request, byte and latency counters"""
+        with self.lock:
+            self.request_count = 0
+            self.error_count = 0
+            self.bytes_received = 0
+            self.bytes_not_downloaded = 0
+            self.bytes_not_downloaded_by_url = {}
+            self.connections_dropped = 0
+            self.reconnects = 0
+            self.latencies = deque(maxlen=1000)
+            self.connection_baseline = self._pool_counts()
+    
+    def _pool_counts(self):
+        """Return (connections opened, requests sent) summed over all urllib3 pools"""
+        opened = 0
+        sent = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return opened, sent
+    
+    def _wait_for_slot(self, url):
+        """Block until the guard lets a request to url go out (or raise to fail fast)"""
+        if self.guard is not None:
+            wait = self.guard.reserve(url)
+            if wait > 0:
+                time.sleep(wait)
+    
+    def _record_error(self, url):
+        with self.lock:
+            self.error_count += 1
+        if self.guard is not None:
+            self.guard.record(url, error=True)
+    
+    def _record_response(self, url, response):
+        if self.guard is not None:
+            self.guard.record(url, response.status_code, response.headers.get('Retry-After'))
+    
+    def _send(self, url, **kwargs):
+        """GET url through the guard, retrying failures; return (response, start time)
+
+        The start time is that of the attempt whose response is returned.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            self._wait_for_slot(url)
+            with self.lock:
+                # The pool hands out the connection returned last, so a
+                # dropped one is taken (and reconnected) first
+                if self.closed_in_pool:
+                    self.closed_in_pool -= 1
+                    self.reconnects += 1
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record_error(url)
+                if attempt < self.retries:
+                    continue
+                raise
+            except Exception:
+                self._record_error(url)
+                raise
+            except BaseException:
+                # Interrupted before any outcome: the host is not to blame
+                if self.guard is not None:
+                    self.guard.release(url)
+                raise
+            self._record_response(url, response)
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response, start
+            # Read the error body so the connection goes back to the pool
+            response.content
+            response.close()
+            with self.lock:
+                self.request_count += 1
+    
+    def get(self, url, **kwargs):
+        """GET a URL through the shared pool and record its latency and size"""
+        kwargs.setdefault('timeout', self.timeout)
+        response, start = self._send(url, **kwargs)
+        elapsed = time.perf_counter() - start
+        
+        with self.lock:
+            self.request_count += 1
+            self.latencies.append(elapsed)
+            if not kwargs.get('stream'):
+                self.bytes_received += len(response.content)
+        return response
+    
+    def stream(self, url, extractor, chunk_size=STREAM_CHUNK_SIZE, headers=None):
+        """GET a page in chunks, feeding the extractor until it has every field
+
+        Once the extractor is done, a tail of up to drain_limit bytes is
+        read without being decoded or parsed, so the connection goes back
+        to the pool. A longer tail, or one of unknown length, is not worth
+        downloading: the connection is closed instead and the bytes left
+        on the wire are recorded per URL. Returns the (closed) response so
+        callers can inspect its status and headers.
+        """
+        response, start = self._send(url, stream=True, timeout=self.timeout, headers=headers)
+        
+        kept = False
+        bytes_not_downloaded = 0
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            feeding = response.ok
+            for chunk in response.iter_content(chunk_size):
+                if feeding and extractor.feed(decoder.decode(chunk)):
+                    feeding = False
+                    remaining = self._unread(response)
+                    if remaining is None or remaining > self.drain_limit:
+                        bytes_not_downloaded = remaining or 0
+                        break
+            else:
+                if feeding:
+                    extractor.feed(decoder.decode(b'', final=True))
+                kept = True
+            # raw.tell() counts bytes on the wire
+            bytes_read = response.raw.tell()
+            response.raise_for_status()
+        finally:
+            if not kept:
+                # Closing mid-body drops the socket; the pool reconnects the
+                # same connection object without counting a new one
+                with self.lock:
+                    self.connections_dropped += 1
+                    self.closed_in_pool += 1
+            response.close()
+        elapsed = time.perf_counter() - start
+        
+        with self.lock:
+            self.request_count += 1
+            self.latencies.append(elapsed)
+            self.bytes_received += bytes_read
+            self.bytes_not_downloaded += bytes_not_downloaded
+            self.bytes_not_downloaded_by_url[url] = bytes_not_downloaded
+        return response
+    
+    def _unread(self, response):
+        """Bytes of a streamed body still on the wire, or None if its length is unknown"""
+        try:
+            length = int(response.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return None
+        return max(length - response.raw.tell(), 0)
+    
+    def get_stats(self):
+        """Return a snapshot of the connection and request counters"""
+        with self.lock:
+            opened, sent = self._pool_counts()
+            base_opened, base_sent = self.connection_baseline
+            opened += self.reconnects - base_opened
+            sent -= base_sent
+            latencies = list(self.latencies)
+            stats = {
+                'requests': self.request_count,
+                'errors': self.error_count,
+                'connections_opened': opened,
+                'connections_reused': max(sent - opened, 0),
+                'bytes_received': self.bytes_received,
+                'bytes_not_downloaded': self.bytes_not_downloaded,
+                'bytes_not_downloaded_by_url': dict(self.bytes_not_downloaded_by_url),
+                'connections_dropped': self.connections_dropped,
+                'latency_avg': sum(latencies) / len(latencies) if latencies else 0,
+                'latency_max': max(latencies) if latencies else 0,
+                'latencies': latencies
+            }
+        return stats
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+class FetchedResponse:
+    """Status, headers and body of a finished asyncio request
+
+    Offers the parts of requests.Response the price sources use, so they
+    handle responses from PriceSession and AsyncPriceSession alike.
+    """
+
+    def __init__(self, url, status_code, headers, content=b'', encoding=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+    
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+    
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncPriceSession:
+    """asyncio counterpart of PriceSession for the async update engine
+
+    Wraps an aiohttp.ClientSession opened inside the running event loop and
+    offers the same get() and stream() as coroutines, so every price
+    source can run on either engine. Requests go through the HostGuard
+    shared with the threaded path.
+    """
+
+    def __init__(self, session, guard=None, drain_limit=STREAM_DRAIN_LIMIT):
+        self.session = session
+        self.guard = guard
+        self.drain_limit = drain_limit
+        self.request_count = 0
+        self.error_count = 0
+    
+    async def _wait_for_slot(self, url):
+        if self.guard is not None:
+            wait = self.guard.reserve(url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+    
+    async def _send(self, url, headers, read_body):
+        """GET url and return a FetchedResponse holding read_body(response)"""
+        await self._wait_for_slot(url)
+        recorded = False
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if self.guard is not None:
+                    self.guard.record(url, response.status, response.headers.get('Retry-After'))
+                recorded = True
+                content = await read_body(response)
+        except asyncio.CancelledError:
+            # Cancelled before any outcome (e.g. the update was stopped):
+            # the host is not to blame, but a probe must not stay out
+            if not recorded and self.guard is not None:
+                self.guard.release(url)
+            raise
+        except Exception:
+            if not recorded:
+                self.error_count += 1
+                if self.guard is not None:
+                    self.guard.record(url, error=True)
+            raise
+        self.request_count += 1
+        return FetchedResponse(url, response.status, response.headers, content, response.charset)
+    
+    async def get(self, url, headers=None):
+        """GET a URL and read the whole body"""
+        async def read_body(response):
+            return await response.read()
+        return await self._send(url, headers, read_body)
+    
+    async def stream(self, url, extractor, chunk_size=STREAM_CHUNK_SIZE, headers=None):
+        """GET a page in chunks, feeding the extractor until it has every field
+
+        As in PriceSession.stream, a short tail is read out to keep the
+        connection; a longer one is left unread and the connection closed.
+        """
+        async def read_body(response):
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+            feeding = True
+            received = 0
+            async for chunk in response.content.iter_chunked(chunk_size):
+                received += len(chunk)
+                if feeding and extractor.feed(decoder.decode(chunk)):
+                    feeding = False
+                    # Chunks arrive decoded, so the remainder is only known
+                    # for bodies sent without a content encoding
+                    length = None if response.headers.get('Content-Encoding') else response.content_length
+                    if length is None or length - received > self.drain_limit:
+                        response.close()
+                        break
+            if feeding:
+                extractor.feed(decoder.decode(b'', final=True))
+            return b''
+        return await self._send(url, headers, read_body)
+
+
+class ResponseCache:
+    """On-disk cache of HTTP validators and parsed payloads keyed by request URL
+
+    Sources send If-None-Match/If-Modified-Since from the stored validators
+    and reuse the stored payload when the server answers 304 Not Modified,
+    on the threaded and async engines alike.
+    Hits (fetches skipped entirely because the item was fresh), misses and
+    revalidations are counted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        self.load()
+        self.reset_stats()
+    
+    def load(self):
+        """Load cached entries, starting empty if the file is missing or corrupt"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except Exception:
+            self.entries = {}
+    
+    def save(self):
+        """Write the cache to disk if anything changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = dict(self.entries)
+            self.dirty = False
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving response cache: {e}")
+    
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.revalidated = 0
+    
+    def get_stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated}
+    
+    def record_hit(self, count=1):
+        """Count fetches skipped because the data was still fresh"""
+        with self.lock:
+            self.hits += count
+    
+    def conditional_headers(self, url):
+        """Return validator headers for a URL we have a cached payload for"""
+        with self.lock:
+            entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def revalidated_payload(self, url):
+        """Return the stored payload after a 304 Not Modified"""
+        with self.lock:
+            self.revalidated += 1
+            return self.entries[url]['payload']
+    
+    def store(self, url, response, payload):
+        """Record a full response; only kept if the server sent validators"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self.lock:
+            self.misses += 1
+            if etag or last_modified:
+                self.entries[url] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'payload': payload
+                }
+                self.dirty = True
+
+
+class HtmlPriceSource:
+    """Price source that scrapes the item's viewitem HTML page"""
+
+    name = 'html'
+
+    def __init__(self, http, stream=True, cache=None):
+        self.http = http
+        self.stream = stream
+        self.cache = cache
+    
+    def _result(self, url, response, result):
+        """Return the parsed result, or the cached one after a 304 Not Modified"""
+        if response.status_code == 304:
+            return tuple(self.cache.revalidated_payload(url))
+        if self.cache and result[0] is not None:
+            self.cache.store(url, response, list(result))
+        return result
+    
+    def fetch(self, url):
+        """Return (price, change_1m, change_3m, change_6m); price is None on failure"""
+        try:
+            headers = self.cache.conditional_headers(url) if self.cache else {}
+            if self.stream:
+                extractor = ItemPageExtractor()
+                response = self.http.stream(url, extractor, headers=headers)
+                result = extractor.result()
+            else:
+                response = self.http.get(url, headers=headers)
+                response.raise_for_status()
+                result = extract_item_page(response.text)
+            return self._result(url, response, result)
+            
+        except Exception as e:
+            print(f"Error scraping price: {e}")
+            return None, 0, 0, 0
+    
+    async def fetch_async(self, http, url):
+        """fetch() for the async engine, over an AsyncPriceSession"""
+        try:
+            headers = self.cache.conditional_headers(url) if self.cache else {}
+            if self.stream:
+                extractor = ItemPageExtractor()
+                response = await http.stream(url, extractor, headers=headers)
+                result = extractor.result()
+            else:
+                response = await http.get(url, headers=headers)
+                response.raise_for_status()
+                result = extract_item_page(response.text)
+            return self._result(url, response, result)
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error scraping price: {e}")
+            return None, 0, 0, 0
+
+
+class ItemDbApiSource:
+    """Price source backed by the itemdb JSON detail and graph endpoints
+
+    The exact guide price is the latest point of the daily graph (the
+    detail endpoint abbreviates large prices, e.g. '14.3m'). The 1m/3m/6m
+    changes come from the detail endpoint's day30/day90/day180 fields.
+    """
+
+    name = 'api'
+
+    def __init__(self, http, base_url=ITEMDB_BASE_URL, cache=None):
+        self.http = http
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+    
+    def _payload(self, url, response):
+        """Return a response's JSON, or the cached payload after a 304 Not Modified"""
+        response.raise_for_status()
+        if response.status_code == 304:
+            return self.cache.revalidated_payload(url)
+        payload = response.json()
+        if self.cache:
+            self.cache.store(url, response, payload)
+        return payload
+    
+    def get_json(self, path):
+        url = f"{self.base_url}{path}"
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+        return self._payload(url, self.http.get(url, headers=headers))
+    
+    async def get_json_async(self, http, path):
+        url = f"{self.base_url}{path}"
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+        return self._payload(url, await http.get(url, headers=headers))
+    
+    @staticmethod
+    def _result(detail, daily):
+        """Build (price, change_1m, change_3m, change_6m) from the detail item and graph points"""
+        changes = [parse_percent(detail.get(period, {}).get('change'))
+                   for period in ('day30', 'day90', 'day180')]
+        if daily:
+            price = int(daily[max(daily, key=int)])
+        else:
+            price = parse_guide_price(detail['current']['price'])
+        return price, changes[0], changes[1], changes[2]
+    
+    def fetch(self, url):
+        """Return (price, change_1m, change_3m, change_6m); price is None on failure"""
+        item_id = item_id_from_url(url)
+        if item_id is None:
+            return None, 0, 0, 0
+        
+        try:
+            detail = self.get_json(f"/api/catalogue/detail.json?item={item_id}")['item']
+            daily = None
+            try:
+                daily = self.get_json(f"/api/graph/{item_id}.json").get('daily')
+            except Exception as e:
+                print(f"Error fetching price graph: {e}")
+            return self._result(detail, daily)
+            
+        except Exception as e:
+            print(f"Error fetching price: {e}")
+            return None, 0, 0, 0
+    
+    async def fetch_async(self, http, url):
+        """fetch() for the async engine, over an AsyncPriceSession"""
+        item_id = item_id_from_url(url)
+        if item_id is None:
+            return None, 0, 0, 0
+        
+        try:
+            detail = (await self.get_json_async(http, f"/api/catalogue/detail.json?item={item_id}"))['item']
+            daily = None
+            try:
+                daily = (await self.get_json_async(http, f"/api/graph/{item_id}.json")).get('daily')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error fetching price graph: {e}")
+            return self._result(detail, daily)
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error fetching price: {e}")
+            return None, 0, 0, 0
+
+
+class InFlightRequests:
+    """Registry of price fetches in progress, keyed by price_key
+
+    A caller asking for an item that is already being fetched waits on the
+    running fetch's future instead of starting another, so "Update
+    Selected" during a full update, or two rows tracking the same obj id,
+    cost one request.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.reset_stats()
+    
+    def reset_stats(self):
+        with self.lock:
+            self.started = 0
+            self.coalesced = 0
+    
+    def get_stats(self):
+        """Return fetches started and requests coalesced into another fetch"""
+        with self.lock:
+            return {'started': self.started, 'coalesced': self.coalesced}
+    
+    def record_coalesced(self, count=1):
+        """Count duplicates merged before reaching the registry (same obj id in one update)"""
+        with self.lock:
+            self.coalesced += count
+    
+    def claim(self, key):
+        """Return (future, owner); the owner must resolve() the key when done"""
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self.pending[key] = Future()
+            self.started += 1
+            return future, True
+    
+    def resolve(self, key, result=None, error=None):
+        """Complete an owned fetch and wake everyone waiting on it"""
+        with self.lock:
+            future = self.pending.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def fetch(self, key, func):
+        """Return func()'s result, sharing it with concurrent callers for the same key"""
+        future, owner = self.claim(key)
+        if not owner:
+            return future.result()
+        try:
+            result = func()
+        except Exception as e:
+            self.resolve(key, error=e)
+            raise
+        self.resolve(key, result)
+        return result
+
+
+class FallbackPriceSource:
+    """Try each price source in turn until one returns a price"""
+
+    def __init__(self, *sources):
+        self.sources = sources
+        self.name = '+'.join(source.name for source in sources)
+    
+    def fetch(self, url):
+        for source in self.sources:
+            result = source.fetch(url)
+            if result[0] is not None:
+                return result
+        return None, 0, 0, 0
+    
+    async def fetch_async(self, http, url):
+        for source in self.sources:
+            result = await source.fetch_async(http, url)
+            if result[0] is not None:
+                return result
+        return None, 0, 0, 0
+
+
+def create_price_source(http, settings, cache=None):
+    """Build the price source selected by settings['price_source']"""
+    html = HtmlPriceSource(http, stream=settings['stream_pages'], cache=cache)
+    if settings['price_source'] == 'html':
+        return html
+    return FallbackPriceSource(ItemDbApiSource(http, cache=cache), html)
+
+
+class AsyncUpdateEngine:
+    """Fetch many items' prices from a single asyncio event loop.
+
+    Prices come from the same price source as the threaded path (its
+    fetch_async), so the JSON endpoints, HTML fallback and response cache
+    all apply. Concurrency is bounded by a semaphore and every request goes
+    through the HostGuard shared with the threaded path, so rate limits
+    and open circuits apply to both. The engine runs on one background
+    thread no matter how many items are in flight.
+    """
+
+    def __init__(self, source, concurrency=20, guard=None, timeout=10):
+        self.source = source
+        self.concurrency = concurrency
+        self.guard = guard if guard is not None else HostGuard()
+        self.timeout = timeout
+        self.results = {}
+        self.on_done = None
+    
+    @staticmethod
+    def available():
+        """Return True if the async engine's dependencies are installed"""
+        return aiohttp is not None
+    
+    def run(self, urls, should_stop=lambda: False, on_done=None):
+        """Fetch all URLs and return {index: (price, change_1m, change_3m, change_6m)}
+
+        Only items whose price was found are included. should_stop is
+        polled while the fetch runs and cancels every pending request when
+        it returns True. on_done(index, result), if given, is called from
+        the event loop as each URL finishes, with (None, 0, 0, 0) for failed
+        or cancelled ones.
+        """
+        self.results = {}
+        self.on_done = on_done
+        asyncio.run(self._fetch_all(urls, should_stop))
+        return self.results
+    
+    async def _fetch_all(self, urls, should_stop):
+        # Created inside the running loop so they bind to it
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(headers={'User-Agent': USER_AGENT},
+                                         timeout=timeout, connector=connector) as session:
+            http = AsyncPriceSession(session, self.guard)
+            tasks = [asyncio.ensure_future(self._fetch(http, index, url))
+                     for index, url in enumerate(urls)]
+            pending = set(tasks)
+            while pending:
+                if should_stop():
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    break
+                _, pending = await asyncio.wait(pending, timeout=0.1)
+    
+    async def _fetch(self, http, index, url):
+        result = (None, 0, 0, 0)
+        try:
+            async with self.semaphore:
+                result = await self.source.fetch_async(http, url)
+            if result[0] is not None:
+                self.results[index] = result
+        finally:
+            if self.on_done is not None:
+                self.on_done(index, result)
+
+
+class PortfolioLedger:
+    """Running holdings, cost basis and realized gain per item
+
+    Transactions are applied in the order they were logged, using one of
+    COST_BASIS_METHODS. Adding one only updates its item's position;
+    removing one replays that item's transactions alone, so the full
+    history is only walked once (in bulk, see osrs_costbasis.recompute).
+    """
+    
+    def __init__(self, transactions=(), method='average'):
+        self.method = method
+        self.transactions_by_item = {}
+        for transaction in transactions:
+            self.transactions_by_item.setdefault(transaction.get('item_name', ''), []).append(transaction)
+        self.positions = recompute(transactions, method)
+    
+    def add(self, transaction):
+        """Apply a newly logged transaction"""
+        item_name = transaction.get('item_name', '')
+        self.transactions_by_item.setdefault(item_name, []).append(transaction)
+        position = self.positions.get(item_name)
+        if position is None:
+            position = self.positions[item_name] = new_position()
+        apply_transaction(position, transaction, self.method)
+    
+    def remove(self, transaction):
+        """Forget a transaction and replay the rest of its item's history"""
+        item_name = transaction.get('item_name', '')
+        item_transactions = self.transactions_by_item.get(item_name)
+        if item_transactions is None:
+            return
+        
+        remaining = [trans for trans in item_transactions if trans is not transaction]
+        if remaining:
+            self.transactions_by_item[item_name] = remaining
+            self.positions[item_name] = replay(remaining, self.method).get(item_name, new_position())
+        else:
+            del self.transactions_by_item[item_name]
+            self.positions.pop(item_name, None)
+    
+    def clear(self):
+        self.transactions_by_item = {}
+        self.positions = {}
+    
+    @staticmethod
+    def market_price(item):
+        """Price open holdings are valued at: current price, else sell price"""
+        if item is None:
+            return None
+        current_price = item.get('current_price', 0)
+        return current_price if current_price > 0 else item.get('sell_price', 0)
+    
+    def item_pnl(self, items_by_name):
+        """Return item_name -> realized / unrealized figures (see position_pnl)"""
+        return {item_name: position_pnl(position, self.market_price(items_by_name.get(item_name)))
+                for item_name, position in self.positions.items()}
+    
+    def summary(self, items_by_name):
+        """Portfolio totals; open holdings are valued at each item's market price
+
+        Holdings whose item is no longer tracked are left out of the
+        unrealized figures. A tracked item without any price still counts
+        towards the cost basis.
+        """
+        cost_of_sold = 0
+        proceeds = 0
+        current_value = 0
+        cost_basis = 0
+        for item_name, position in self.positions.items():
+            cost_of_sold += position['cost_of_sold']
+            proceeds += position['proceeds']
+            if position['quantity'] <= 0 or item_name not in items_by_name:
+                continue
+            price_to_use = self.market_price(items_by_name[item_name])
+            if price_to_use > 0:
+                current_value += position['quantity'] * price_to_use
+            cost_basis += position['cost_basis']
+        
+        return {
+            'cost_of_sold': cost_of_sold,
+            'proceeds': proceeds,
+            'realized_gain': proceeds - cost_of_sold,
+            'current_value': current_value,
+            'cost_basis': cost_basis,
+            'unrealized_gain': current_value - cost_basis
+        }
+
+
+class TransactionIndex:
+    """Transactions by stable id, kept in date order as they are added
+
+    Each order list holds (date, -id) keys, so walking it backwards yields
+    newest first with same-date transactions in the order they were
+    logged. New transactions are usually the newest, so adding one is an
+    append; nothing is ever re-sorted.
+    """
+    
+    def __init__(self, transactions=()):
+        self.by_id = {}
+        self.order = []
+        self.order_by_item = {}  # item_name -> order list for that item
+        for transaction in transactions:
+            key = self.sort_key(transaction)
+            self.by_id[transaction['id']] = transaction
+            self.order.append(key)
+            self.order_by_item.setdefault(transaction.get('item_name', ''), []).append(key)
+        # Loaded history is sorted once; later additions keep it sorted
+        self.order.sort()
+        for order in self.order_by_item.values():
+            order.sort()
+    
+    @staticmethod
+    def sort_key(transaction):
+        return (transaction.get('date', ''), -transaction['id'])
+    
+    def add(self, transaction):
+        key = self.sort_key(transaction)
+        self.by_id[transaction['id']] = transaction
+        insort(self.order, key)
+        insort(self.order_by_item.setdefault(transaction.get('item_name', ''), []), key)
+    
+    def get(self, transaction_id):
+        return self.by_id.get(transaction_id)
+    
+    def remove(self, transaction_id):
+        """Drop a transaction by id and return it (None if unknown)"""
+        transaction = self.by_id.pop(transaction_id, None)
+        if transaction is None:
+            return None
+        key = self.sort_key(transaction)
+        item_order = self.order_by_item.get(transaction.get('item_name', ''), [])
+        for order in (self.order, item_order):
+            position = bisect_left(order, key)
+            if position < len(order) and order[position] == key:
+                del order[position]
+        return transaction
+    
+    def item_names(self):
+        """Sorted names of the items that have transactions"""
+        return sorted(name for name, order in self.order_by_item.items() if order)
+    
+    def newest_first(self, item_name=None):
+        """Yield transactions newest first, optionally only for one item"""
+        order = self.order if item_name is None else self.order_by_item.get(item_name, [])
+        for date, negative_id in reversed(order):
+            yield self.by_id[-negative_id]
+
+
+class DebouncedJsonWriter:
+    """Batches saves of a JSON document and writes them atomically
+
+    mark_dirty() only schedules a write; every change marked before the
+    debounce delay expires goes out in a single write. Writes go to a
+    temporary file that is fsynced and renamed over the target, so a crash
+    leaves either the old or the new file, never a truncated one.
+
+    schedule(delay_ms, callback) runs the timer, e.g. Tk's root.after, so
+    the flush happens on the same thread that mutates the data.
+    """
+
+    def __init__(self, path, get_data, schedule, delay_ms=SAVE_DEBOUNCE_MS, on_error=None):
+        self.path = path
+        self.get_data = get_data
+        self.schedule = schedule
+        self.delay_ms = delay_ms
+        self.on_error = on_error
+        self.dirty = False
+        self.scheduled = False
+        self.write_count = 0
+        self.bytes_written = 0
+    
+    def mark_dirty(self):
+        """Note that the data changed and make sure a flush is scheduled"""
+        self.dirty = True
+        if not self.scheduled:
+            self.scheduled = True
+            self.schedule(self.delay_ms, self._on_timer)
+    
+    def _on_timer(self):
+        self.scheduled = False
+        self.flush()
+    
+    def flush(self):
+        """Write the data now if anything changed since the last write"""
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            self.write(self.get_data())
+        except Exception as e:
+            self.dirty = True
+            if self.on_error is None:
+                raise
+            self.on_error(e)
+    
+    def write(self, data):
+        text = json.dumps(data, indent=2, default=to_json)
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.write_count += 1
+        self.bytes_written += len(text.encode('utf-8'))
+
+
+def default_data():
+    """Data for a first run: a few example items and no history"""
+    return {
+        "items": [
+            {
+                "name": "Torstol Seed",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Torstol+seed/viewitem?obj=5304",
+                "reference_price": 13333,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 1,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Dragon Pickaxe",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Dragon+pickaxe/viewitem?obj=11920",
+                "reference_price": 900000,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 1,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Anglerfish",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Anglerfish/viewitem?obj=13441",
+                "reference_price": 1440,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 100,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Blighted Ice Sack",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Blighted+ancient+ice+sack/viewitem?obj=24607",
+                "reference_price": 272,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 100,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Dragon Arrow",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Dragon+arrow/viewitem?obj=11212",
+                "reference_price": 1400,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 100,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Bond",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Old+school+bond/viewitem?obj=13190",
+                "reference_price": 12000000,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 1,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Spirit Shield",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Spirit+shield/viewitem?obj=12829",
+                "reference_price": 55000,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 1,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            },
+            {
+                "name": "Black Chinchompa",
+                "url": "https://secure.runescape.com/m=itemdb_oldschool/Black+chinchompa/viewitem?obj=11959",
+                "reference_price": 2500,
+                "buy_price": 0,
+                "sell_price": 0,
+                "quantity": 100,
+                "current_price": 0,
+                "change_1m": 0,
+                "change_3m": 0,
+                "change_6m": 0,
+                "last_updated": ""
+            }
+        ],
+        "transactions": [],
+        "settings": dict(DEFAULT_SETTINGS)
+    }
+
+
+def normalize_data(data):
+    """Fill in keys added since a data file was written"""
+    # Ensure transactions key exists
+    if 'transactions' not in data:
+        data['transactions'] = []
+    # Give transactions stable ids, increasing in the order they were logged
+    if any('id' not in trans for trans in data['transactions']):
+        for trans_id, trans in enumerate(data['transactions'], 1):
+            trans['id'] = trans_id
+    # Fill in any settings added since the file was written
+    settings = data.setdefault('settings', {})
+    for key, value in DEFAULT_SETTINGS.items():
+        settings.setdefault(key, value)
+    # Migrate items to new schema with buy_price and sell_price
+    for item in data.get('items', []):
+        if 'buy_price' not in item:
+            item['buy_price'] = 0
+        if 'sell_price' not in item:
+            item['sell_price'] = 0
+        if 'change_1m' not in item:
+            item['change_1m'] = 0
+        if 'change_3m' not in item:
+            item['change_3m'] = 0
+        if 'change_6m' not in item:
+            item['change_6m'] = 0
+    return data
+
+
+def filter_transactions(transactions, start=None, end=None, item_names=None):
+    """Yield the transactions dated from start to end (date strings, both
+    included) and, if item_names is given, for those items only"""
+    for trans in transactions:
+        date = trans.get('date', '')
+        if start is not None and date < start:
+            continue
+        if end is not None and date > end:
+            continue
+        if item_names is not None and trans.get('item_name', '') not in item_names:
+            continue
+        yield trans
+
+
+class JsonStorage:
+    """Storage backend keeping everything in one JSON file
+
+    Every change marks the whole document dirty; DebouncedJsonWriter
+    batches them into one atomic write. Transactions are numbered under
+    'id' as they are added.
+    """
+
+    name = 'json'
+
+    def __init__(self, path, schedule, on_error=None):
+        self.path = path
+        self.data = None
+        self.writer = DebouncedJsonWriter(path, lambda: self.data, schedule, on_error=on_error)
+    
+    def load(self):
+        """Load data from the JSON file or initialize with defaults"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.data = normalize_data(json.load(f))
+            except:
+                self.data = normalize_data(default_data())
+        else:
+            self.data = normalize_data(default_data())
+        self.next_transaction_id = max((trans['id'] for trans in self.data['transactions']), default=0) + 1
+        return self.data
+    
+    def load_transactions(self):
+        return self.data['transactions']
+    
+    def iter_transactions(self, start=None, end=None, item_names=None):
+        return filter_transactions(self.data['transactions'], start, end, item_names)
+    
+    def save_item(self, item):
+        self.writer.mark_dirty()
+    
+    def save_items(self, items):
+        self.writer.mark_dirty()
+    
+    def delete_item(self, item):
+        self.writer.mark_dirty()
+    
+    def add_transaction(self, transaction):
+        transaction['id'] = self.next_transaction_id
+        self.next_transaction_id += 1
+        self.writer.mark_dirty()
+    
+    def delete_transaction(self, transaction):
+        self.writer.mark_dirty()
+    
+    def clear_transactions(self):
+        self.writer.mark_dirty()
+    
+    def save_settings(self, settings):
+        self.writer.mark_dirty()
+    
+    def flush(self):
+        self.writer.flush()
+    
+    def close(self):
+        self.writer.flush()
+
+
+ITEM_FIELDS = ('name', 'url', 'reference_price', 'buy_price', 'sell_price', 'quantity',
+               'current_price', 'change_1m', 'change_3m', 'change_6m', 'last_updated')
+
+TRANSACTION_FIELDS = ('date', 'item_name', 'type', 'quantity', 'price_per_unit',
+                      'total_cost', 'old_quantity', 'new_quantity')
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    reference_price INTEGER NOT NULL DEFAULT 0,
+    buy_price INTEGER NOT NULL DEFAULT 0,
+    sell_price INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    current_price INTEGER NOT NULL DEFAULT 0,
+    change_1m REAL NOT NULL DEFAULT 0,
+    change_3m REAL NOT NULL DEFAULT 0,
+    change_6m REAL NOT NULL DEFAULT 0,
+    last_updated TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_items_position ON items(position);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    price_per_unit INTEGER NOT NULL DEFAULT 0,
+    total_cost INTEGER NOT NULL DEFAULT 0,
+    old_quantity INTEGER NOT NULL DEFAULT 0,
+    new_quantity INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS idx_transactions_item ON transactions(item_name, date);
+
+-- Price history lives in PriceHistoryStore; this table held a copy of it
+DROP TABLE IF EXISTS price_snapshots;
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SqliteStorage:
+    """Storage backend using an SQLite database in WAL mode
+
+    Items, transactions and settings live in indexed tables and every
+    change is a single-row statement. Statements accumulate in one
+    open transaction that is committed on a debounce timer, so a burst of
+    price updates costs one commit. Items and transactions carry their
+    row id under 'id'.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, schedule, on_error=None):
+        self.path = path
+        self.schedule = schedule
+        self.on_error = on_error
+        self.commit_scheduled = False
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.conn.commit()
+    
+    def is_empty(self):
+        return self.conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0 and \
+            self.conn.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 0
+    
+    def migrate_from(self, data):
+        """One-time import of a loaded (and normalized) JSON document"""
+        for position, item in enumerate(data.get('items', [])):
+            self._insert_item(item, position)
+        self.conn.executemany(
+            f"INSERT INTO transactions ({', '.join(TRANSACTION_FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in TRANSACTION_FIELDS)})",
+            ([trans.get(field, 0 if field not in ('date', 'item_name', 'type') else '')
+              for field in TRANSACTION_FIELDS] for trans in data.get('transactions', [])))
+        self.conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                              ((key, json.dumps(value)) for key, value in data.get('settings', {}).items()))
+        self.conn.commit()
+    
+    def load(self):
+        """Load items and settings; transactions stay on disk until asked for"""
+        items = []
+        for row in self.conn.execute(f"SELECT id, {', '.join(ITEM_FIELDS)} FROM items ORDER BY position"):
+            items.append(dict(row))
+        settings = {row['key']: json.loads(row['value'])
+                    for row in self.conn.execute("SELECT key, value FROM settings")}
+        for key, value in DEFAULT_SETTINGS.items():
+            settings.setdefault(key, value)
+        return {'items': items, 'transactions': None, 'settings': settings}
+    
+    def load_transactions(self):
+        return [dict(row) for row in self.conn.execute(
+            f"SELECT id, {', '.join(TRANSACTION_FIELDS)} FROM transactions ORDER BY id")]
+    
+    def iter_transactions(self, start=None, end=None, item_names=None):
+        """Yield committed transactions in order, optionally from start to end
+        (date strings, both included) and for a set of item names only
+
+        Rows are streamed from a cursor on a separate read connection, so
+        the generator can be consumed on another thread and never holds
+        more than one row.
+        """
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+        if item_names is not None:
+            item_names = list(item_names)
+            conditions.append(f"item_name IN ({', '.join('?' for _ in item_names)})")
+            params.extend(item_names)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(f"SELECT id, {', '.join(TRANSACTION_FIELDS)} FROM transactions"
+                                    f"{where} ORDER BY id", params):
+                yield dict(row)
+        finally:
+            conn.close()
+    
+    def _insert_item(self, item, position=None):
+        if position is None:
+            position = self.conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM items").fetchone()[0]
+        cursor = self.conn.execute(
+            f"INSERT INTO items (position, {', '.join(ITEM_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' for _ in ITEM_FIELDS)})",
+            [position] + [item.get(field, '' if field in ('name', 'url', 'last_updated') else 0)
+                          for field in ITEM_FIELDS])
+        item['id'] = cursor.lastrowid
+    
+    def save_item(self, item):
+        """Insert a new item or update an existing one in place"""
+        if item.get('id') is None:
+            self._insert_item(item)
+        else:
+            self.conn.execute(
+                f"UPDATE items SET {', '.join(field + ' = ?' for field in ITEM_FIELDS)} WHERE id = ?",
+                [item.get(field) for field in ITEM_FIELDS] + [item['id']])
+        self._schedule_commit()
+    
+    def save_items(self, items):
+        """Insert or update many items in one transaction"""
+        for item in items:
+            if item.get('id') is None:
+                self._insert_item(item)
+            else:
+                self.save_item(item)
+        self.conn.commit()
+    
+    def delete_item(self, item):
+        if item.get('id') is not None:
+            self.conn.execute("DELETE FROM items WHERE id = ?", (item['id'],))
+            self._schedule_commit()
+    
+    def add_transaction(self, transaction):
+        cursor = self.conn.execute(
+            f"INSERT INTO transactions ({', '.join(TRANSACTION_FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in TRANSACTION_FIELDS)})",
+            [transaction.get(field) for field in TRANSACTION_FIELDS])
+        transaction['id'] = cursor.lastrowid
+        self._schedule_commit()
+    
+    def delete_transaction(self, transaction):
+        if transaction.get('id') is not None:
+            self.conn.execute("DELETE FROM transactions WHERE id = ?", (transaction['id'],))
+            self._schedule_commit()
+    
+    def clear_transactions(self):
+        self.conn.execute("DELETE FROM transactions")
+        self._schedule_commit()
+    
+    def save_settings(self, settings):
+        self.conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                              ((key, json.dumps(value)) for key, value in settings.items()))
+        self._schedule_commit()
+    
+    def _schedule_commit(self):
+        if not self.commit_scheduled:
+            self.commit_scheduled = True
+            self.schedule(SAVE_DEBOUNCE_MS, self._on_timer)
+    
+    def _on_timer(self):
+        self.commit_scheduled = False
+        self.flush()
+    
+    def flush(self):
+        """Commit pending changes"""
+        try:
+            self.conn.commit()
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(e)
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def open_storage(json_path, db_path, schedule, on_error=None):
+    """Open the configured storage backend
+
+    An existing database is always used. Otherwise the JSON file is loaded
+    and, if its settings ask for 'sqlite', migrated into a new database
+    once; the JSON file is left in place as a backup.
+    """
+    if os.path.exists(db_path):
+        return SqliteStorage(db_path, schedule, on_error)
+    
+    storage = JsonStorage(json_path, schedule, on_error)
+    data = storage.load()
+    if data['settings'].get('storage') != 'sqlite':
+        return storage
+    
+    sqlite_storage = SqliteStorage(db_path, schedule, on_error)
+    if sqlite_storage.is_empty():
+        sqlite_storage.migrate_from(data)
+    return sqlite_storage
+
+
+def no_timer(delay_ms, callback):
+    """schedule() for running without a main loop: timers never fire, so
+    debounced saves wait for an explicit flush()"""
+
+
+class PriceTracker:
+    """The tracker without a window: data, price fetching and persistence
+
+    schedule(delay_ms, callback) drives the debounced saves; the Tk app
+    passes root.after. Headless callers leave it out and call flush() or
+    close() once their changes are made.
+    """
+
+    def __init__(self, schedule=no_timer, on_save_error=None, on_alert=None):
+        self.schedule = schedule
+        self.save_error_handler = on_save_error
+        self.alert_handler = on_alert
+        
+        # Data file for persistence; the database is used instead once
+        # settings.storage is 'sqlite'
+        self.data_file = "osrs_tracker_data.json"
+        self.db_file = "osrs_tracker.db"
+        
+        # Item names and ids for search and bulk import, loaded on first use
+        self.catalogue_file = "osrs_item_catalogue.json"
+        self.catalogue = None
+        
+        # HTTP validators and parsed payloads for conditional requests
+        self.cache = ResponseCache("osrs_http_cache.json")
+        
+        # Load saved data or initialize with default items
+        self.load_data()
+        settings = self.data['settings']
+        
+        # Rate limits and circuit breakers per host, shared by every fetch path
+        self.guard = HostGuard(settings['rate_limit_per_second'], settings['rate_limit_burst'],
+                               settings['breaker_failures'], settings['breaker_reset_seconds'])
+        
+        # Shared HTTP session, pooled to match the update worker count
+        self.http = PriceSession(pool_size=MAX_WORKERS, guard=self.guard)
+        
+        # Fetches in progress, shared by every update path
+        self.in_flight = InFlightRequests()
+        
+        self.price_source = create_price_source(self.http, self.data['settings'], self.cache)
+        
+        # Append-only price time series, thinned out by compact_history()
+        self.history = PriceHistoryStore("price_history")
+        
+        # Totals, allocation, volatility and drawdown, cached between calls
+        self.analytics = PortfolioAnalytics(self.history, price_key)
+        
+        # Price alert rules, checked as each price is applied
+        self.alerts = AlertEngine(dict(rule) for rule in self.data['settings']['alerts'])
+        
+        # Built on first use: the transaction ledger and a name -> item index
+        self.ledger = None
+        self.transaction_index = None
+        self.items_by_name = None
+        
+        # Set to abandon a running update
+        self.stop_updating = False
+    
+    def load_data(self):
+        """Open the storage backend and load what the prices view needs
+
+        Transactions are loaded separately, the first time they are used.
+        """
+        self.storage = open_storage(self.data_file, self.db_file,
+                                    self.schedule, self.save_error_handler)
+        self.data = self.storage.load()
+        self.data['items'] = ItemTable(self.data['items'])
+    
+    def get_transactions(self):
+        """Return the transaction list, loading it from storage on first use"""
+        if self.data.get('transactions') is None:
+            self.data['transactions'] = self.storage.load_transactions()
+        return self.data['transactions']
+    
+    def get_ledger(self):
+        """Return the portfolio ledger, replaying the transactions on first use"""
+        if self.ledger is None:
+            self.ledger = PortfolioLedger(self.get_transactions(),
+                                          self.data['settings']['cost_basis_method'])
+        return self.ledger
+    
+    def get_transaction_index(self):
+        """Return the id / date index over the transactions, building it on first use"""
+        if self.transaction_index is None:
+            self.transaction_index = TransactionIndex(self.get_transactions())
+        return self.transaction_index
+    
+    def get_items_by_name(self):
+        """Return a name -> item index; the first item wins on duplicate names"""
+        if self.items_by_name is None:
+            self.items_by_name = {}
+            for item in self.data['items']:
+                self.items_by_name.setdefault(item['name'], item)
+        return self.items_by_name
+    
+    def get_analytics(self, now=None):
+        """Return the portfolio analytics (see PortfolioAnalytics.compute)"""
+        return self.analytics.compute(self.data['items'], now)
+    
+    def get_catalogue(self):
+        """Return the item catalogue from its cache file
+
+        Without a cache file, the tracked items are the catalogue until
+        refresh_catalogue() succeeds.
+        """
+        if self.catalogue is None:
+            self.catalogue = load_catalogue(self.catalogue_file)
+            if self.catalogue is None:
+                self.catalogue = ItemCatalogue(
+                    (item['name'], item_id_from_url(item['url'])) for item in self.data['items']
+                    if item_id_from_url(item['url']) is not None)
+        return self.catalogue
+    
+    def catalogue_is_stale(self):
+        """True if the catalogue cache is missing or older than CATALOGUE_MAX_AGE"""
+        try:
+            return time.time() - os.path.getmtime(self.catalogue_file) > CATALOGUE_MAX_AGE
+        except OSError:
+            return True
+    
+    def refresh_catalogue(self):
+        """Download the item catalogue, cache it and return it; can run on any thread"""
+        catalogue = fetch_catalogue(self.http)
+        save_catalogue(self.catalogue_file, catalogue)
+        self.catalogue = catalogue
+        return catalogue
+    
+    def import_items(self, entries):
+        """Add items by name in one batch with a single save
+
+        entries are dicts from read_import_rows. Names are resolved to item
+        ids through the catalogue; names already tracked and names the
+        catalogue does not know are left out. Returns (added, skipped,
+        unknown) lists of names.
+        """
+        catalogue = self.get_catalogue()
+        tracked = {item['name'].lower() for item in self.data['items']}
+        new_items = []
+        skipped = []
+        unknown = []
+        for entry in entries:
+            name = entry['name']
+            if name.lower() in tracked:
+                skipped.append(name)
+                continue
+            found = catalogue.lookup(name)
+            if found is None:
+                unknown.append(name)
+                continue
+            # Use the catalogue's spelling of the name
+            name, item_id = found
+            tracked.add(name.lower())
+            new_items.append({
+                'name': name,
+                'url': item_url(name, item_id),
+                'reference_price': entry.get('reference_price', 0),
+                'buy_price': entry.get('buy_price', 0),
+                'sell_price': entry.get('sell_price', 0),
+                'quantity': entry.get('quantity', 1),
+                'current_price': 0,
+                'change_1m': 0,
+                'change_3m': 0,
+                'change_6m': 0,
+                'last_updated': ''
+            })
+        
+        if new_items:
+            items = self.data['items']
+            start = len(items)
+            items.extend(new_items)
+            self.storage.save_items(items[start:])
+            self.items_by_name = None
+            self.flush()
+        return [item['name'] for item in new_items], skipped, unknown
+    
+    def import_items_file(self, path):
+        """import_items() from a CSV or text file
+
+        Returns (added, skipped, unknown, invalid); invalid lists the rows
+        left out for a value that is not a number, as (line number, reason).
+        """
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            entries, invalid = read_import_rows(f)
+        return self.import_items(entries) + (invalid,)
+    
+    def scrape_price(self, url):
+        """Fetch price and historical changes from the configured price source
+
+        Joins a fetch already in flight for the same item instead of
+        starting another.
+        """
+        return self.in_flight.fetch(price_key(url), lambda: self.price_source.fetch(url))
+    
+    def fetch_prices(self, items, on_result):
+        """Fetch prices for items concurrently
+
+        Can run on any thread and never modifies the item dicts:
+        on_result(item, result) is called, possibly from worker threads, for
+        every item whose price was fetched. Returns a summary message, or
+        None if the update was stopped.
+        """
+        self.http.reset_stats()
+        self.cache.reset_stats()
+        self.in_flight.reset_stats()
+        self.guard.reset_stats()
+        
+        settings = self.data['settings']
+        groups = self.group_items_by_price_key(items)
+        if settings['adaptive_refresh']:
+            # Only groups the scheduler finds due, within the per-cycle budget
+            scheduler = RefreshScheduler(self.history, settings['refresh_base_minutes'],
+                                         settings['refresh_max_minutes'], settings['refresh_budget'])
+            keys = [price_key(items[indices[0]]['url']) for indices in groups]
+            stale_groups = [groups[group_index] for group_index in scheduler.plan(items, groups, keys)]
+        else:
+            # Items refreshed within the TTL are skipped without touching the network
+            stale_groups = [indices for indices in groups
+                            if not all(self.is_fresh(items[i]) for i in indices)]
+        self.cache.record_hit(len(groups) - len(stale_groups))
+        # Only duplicates in groups that reach the network were merged into a fetch
+        self.in_flight.record_coalesced(sum(len(indices) - 1 for indices in stale_groups))
+        
+        if settings['update_engine'] == 'async' and AsyncUpdateEngine.available():
+            return self.fetch_prices_async(settings, items, stale_groups, on_result)
+        
+        def update_single_price(item_indices):
+            """Fetch one price and report it for every item tracking it"""
+            if self.stop_updating:
+                return
+            
+            result = self.scrape_price(items[item_indices[0]]['url'])
+            if result[0] is not None:
+                for item_index in item_indices:
+                    on_result(items[item_index], result)
+            
+            return item_indices
+        
+        # Use ThreadPoolExecutor to fetch all prices concurrently; the shared
+        # session keeps one pooled connection per worker
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(update_single_price, indices) for indices in stale_groups]
+            
+            for future in as_completed(futures):
+                if self.stop_updating:
+                    break
+                future.result()
+        
+        self.cache.save()
+        if self.stop_updating:
+            return None
+        
+        stats = self.http.get_stats()
+        return (f"Update complete ({stats['requests']} requests, "
+                f"{stats['connections_opened']} connections opened, "
+                f"{stats['connections_reused']} reused, "
+                f"{stats['connections_dropped']} dropped, "
+                f"{stats['bytes_not_downloaded'] // 1024} KB not downloaded, "
+                f"{self.in_flight.get_stats()['coalesced']} coalesced; "
+                f"{self.format_cache_stats()})")
+    
+    def fetch_prices_async(self, settings, items, groups, on_result):
+        """Fetch the given item groups with the asyncio engine
+
+        Results are reported together once the engine finishes, but each
+        owned key is resolved as soon as its own fetch completes, so callers
+        waiting on it elsewhere are not held up by the rest of the pass.
+        """
+        # Claim every key up front; ones already in flight elsewhere are
+        # waited on instead of fetched again
+        keys = [price_key(items[indices[0]]['url']) for indices in groups]
+        claims = [self.in_flight.claim(key) for key in keys]
+        owned = [group_index for group_index, (future, owner) in enumerate(claims) if owner]
+        
+        engine = AsyncUpdateEngine(self.price_source,
+                                   concurrency=settings['async_concurrency'],
+                                   guard=self.guard)
+        unresolved = set(range(len(owned)))
+        
+        def resolve(position, result):
+            # Waiters get (None, ...) for anything the engine did not parse
+            unresolved.discard(position)
+            self.in_flight.resolve(keys[owned[position]], result)
+        
+        engine_results = {}
+        try:
+            engine_results = engine.run([items[groups[group_index][0]]['url'] for group_index in owned],
+                                        lambda: self.stop_updating, resolve)
+        finally:
+            # Anything the engine never got to
+            for position in sorted(unresolved):
+                resolve(position, (None, 0, 0, 0))
+        self.cache.save()
+        if self.stop_updating:
+            return None
+        
+        results = {owned[position]: result for position, result in engine_results.items()}
+        for group_index, (future, owner) in enumerate(claims):
+            if not owner:
+                result = future.result()
+                if result[0] is not None:
+                    results[group_index] = result
+        
+        for group_index, result in results.items():
+            for index in groups[group_index]:
+                on_result(items[index], result)
+        
+        coalesced = self.in_flight.get_stats()['coalesced']
+        return f"Update complete ({len(results)}/{len(groups)} prices, {coalesced} coalesced; {self.format_cache_stats()})"
+    
+    def update_all_prices(self):
+        """Fetch every item's price and apply the results on this thread
+
+        Returns the summary message from fetch_prices.
+        """
+        results = []
+        message = self.fetch_prices(list(self.data['items']),
+                                    lambda item, result: results.append((item, result)))
+        for item, result in results:
+            self.apply_price_result(item, result)
+        self.flush()
+        return message
+    
+    def compact_history(self, force=False):
+        """Thin out and drop old price history points per the history settings
+
+        Runs at most once a day unless forced, so it can be called after
+        every update. Returns the number of points removed, or None if it
+        was not due. Can run on any thread.
+        """
+        compacted_at = self.history.compacted_at()
+        if not force and compacted_at is not None and time.time() - compacted_at < HISTORY_COMPACT_INTERVAL:
+            return None
+        settings = self.data['settings']
+        return self.history.compact_all(settings['history_retention_days'],
+                                        settings['history_daily_after_days'])
+    
+    def is_fresh(self, item):
+        """Return True if the item has a price fetched within the cache TTL"""
+        ttl_minutes = self.data['settings']['cache_ttl_minutes']
+        if ttl_minutes <= 0 or item.get('current_price', 0) <= 0:
+            return False
+        try:
+            last_updated = datetime.strptime(item.get('last_updated', ''), "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return False
+        return (datetime.now() - last_updated).total_seconds() < ttl_minutes * 60
+    
+    def format_cache_stats(self):
+        stats = self.cache.get_stats()
+        message = f"cache: {stats['hits']} hit, {stats['revalidated']} revalidated, {stats['misses']} miss"
+        guard_stats = self.guard.get_stats()
+        if guard_stats['throttled'] or guard_stats['failed_fast']:
+            message += f"; {guard_stats['throttled']} throttled, {guard_stats['failed_fast']} failed fast"
+        return message
+    
+    def group_items_by_price_key(self, items):
+        """Group item indices by the item they point at so each is fetched once"""
+        groups = {}
+        for index, item in enumerate(items):
+            groups.setdefault(price_key(item['url']), []).append(index)
+        return list(groups.values())
+    
+    def apply_price_result(self, item, result):
+        """Store a scrape result on an item; return True if it had a price"""
+        if result[0] is None:
+            return False
+        old_values = metric_values(item)
+        item['current_price'] = result[0]
+        item['change_1m'] = result[1]
+        item['change_3m'] = result[2]
+        item['change_6m'] = result[3]
+        item['last_updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.storage.save_item(item)
+        self.history.append(price_key(item['url']), result[0])
+        fired = self.alerts.check(item['name'], old_values, metric_values(item))
+        if fired:
+            self.send_alerts(fired)
+        return True
+    
+    def add_alert(self, item_name, metric, direction, threshold):
+        """Add a price alert rule and save it; returns the rule"""
+        rule = self.alerts.add({'item_name': item_name, 'metric': metric,
+                                'direction': direction, 'threshold': threshold})
+        self.save_alerts()
+        return rule
+    
+    def remove_alert(self, rule_id):
+        """Remove a price alert rule and save the rest; returns it, or None if there was none"""
+        rule = self.alerts.remove(rule_id)
+        if rule is not None:
+            self.save_alerts()
+        return rule
+    
+    def save_alerts(self):
+        self.data['settings']['alerts'] = self.alerts.to_list()
+        self.storage.save_settings(self.data['settings'])
+    
+    def send_alerts(self, fired):
+        """Deliver fired alerts to the alert handler, the desktop and the webhook
+
+        The webhook is posted from a background thread so a slow endpoint
+        never holds up applying prices.
+        """
+        settings = self.data['settings']
+        messages = [f"Alert: {describe_rule(rule)} (now {format_value(rule['metric'], value)})"
+                    for rule, value in fired]
+        for message in messages:
+            if self.alert_handler is not None:
+                self.alert_handler(message)
+            if settings['alert_desktop'] and desktop_notification is not None:
+                try:
+                    desktop_notification.notify(title="OSRS Price Alert", message=message, timeout=10)
+                except Exception as e:
+                    print(f"Error showing desktop notification: {e}")
+        
+        webhook_url = settings['alert_webhook_url']
+        if webhook_url:
+            payload = {'alerts': [dict(rule, value=value, message=message)
+                                  for (rule, value), message in zip(fired, messages)]}
+            threading.Thread(target=self.post_webhook, args=(webhook_url, payload), daemon=True).start()
+    
+    def post_webhook(self, url, payload):
+        try:
+            response = requests.post(url, json=payload, timeout=10, headers={'User-Agent': USER_AGENT})
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Error posting alert webhook: {e}")
+    
+    def log_transaction(self, item_name, new_qty, new_buy_price, new_sell_price, old_qty, old_buy_price, old_sell_price):
+        """Log a transaction when quantity or prices change"""
+        qty_change = new_qty - old_qty
+        
+        # Only log if there's an actual change
+        if qty_change == 0 and new_buy_price == old_buy_price and new_sell_price == old_sell_price:
+            return
+        
+        transaction_type = 'BUY' if qty_change > 0 else 'SELL' if qty_change < 0 else 'PRICE_UPDATE'
+        
+        # For buys, use buy price; for sells, use sell price
+        transaction_qty = abs(qty_change) if qty_change != 0 else 0
+        if qty_change > 0:
+            transaction_price = new_buy_price
+        elif qty_change < 0:
+            transaction_price = new_sell_price
+        else:
+            transaction_price = 0
+        
+        transaction = {
+            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'item_name': item_name,
+            'type': transaction_type,
+            'quantity': transaction_qty,
+            'price_per_unit': transaction_price,
+            'total_cost': transaction_qty * transaction_price,
+            'old_quantity': old_qty,
+            'new_quantity': new_qty
+        }
+        
+        # SQLite keeps transactions on disk until something asks for them,
+        # so only a list that is already loaded is kept in step
+        if self.data.get('transactions') is not None:
+            self.data['transactions'].append(transaction)
+        self.storage.add_transaction(transaction)
+        if self.ledger is not None:
+            self.ledger.add(transaction)
+        if self.transaction_index is not None:
+            self.transaction_index.add(transaction)
+    
+    def delete_transaction(self, transaction_id):
+        """Delete a transaction by id; return it, or None if there is no such id"""
+        transaction = self.get_transaction_index().remove(transaction_id)
+        if transaction is None:
+            return None
+        self.storage.delete_transaction(transaction)
+        if self.ledger is not None:
+            self.ledger.remove(transaction)
+        transactions = self.get_transactions()
+        # The list is in id order (ids are handed out increasing), so the
+        # transaction is found by bisection rather than a scan
+        lo, hi = 0, len(transactions)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if transactions[mid]['id'] < transaction_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(transactions) and transactions[lo] is transaction:
+            del transactions[lo]
+        return transaction
+    
+    def clear_transactions(self):
+        """Delete all transaction history"""
+        self.data['transactions'] = []
+        self.storage.clear_transactions()
+        if self.ledger is not None:
+            self.ledger.clear()
+        self.transaction_index = None
+    
+    def iter_price_rows(self, item_names=None):
+        """Yield a row of EXPORT_COLUMNS['prices'] per item, as the prices view shows it"""
+        items = self.data['items']
+        rows = zip(items.rows('name', 'current_price', 'reference_price', 'quantity',
+                              'change_1m', 'change_3m', 'change_6m'),
+                   items.change_percents(), items.portfolio_values())
+        for (name, current_price, reference_price, quantity,
+             change_1m, change_3m, change_6m), change_percent, portfolio_value in rows:
+            if item_names is not None and name not in item_names:
+                continue
+            change_percent = change_percent or 0
+            if quantity <= 0:
+                portfolio_value = 0
+            
+            yield (name,
+                   current_price,
+                   f"{change_1m:+.2f}" if change_1m != 0 else "",
+                   f"{change_3m:+.2f}" if change_3m != 0 else "",
+                   f"{change_6m:+.2f}" if change_6m != 0 else "",
+                   reference_price,
+                   f"{change_percent:+.2f}%",
+                   quantity,
+                   portfolio_value)
+    
+    def iter_transaction_rows(self, start=None, end=None, item_names=None):
+        """Yield a row of EXPORT_COLUMNS['transactions'] per transaction
+
+        start and end are datetimes, both included. Transactions already
+        loaded are read from memory; otherwise they are streamed from
+        storage without being loaded.
+        """
+        if start is not None:
+            start = start.strftime(EXPORT_DATE_FORMAT)
+        if end is not None:
+            end = end.strftime(EXPORT_DATE_FORMAT)
+        if self.data.get('transactions') is not None:
+            transactions = filter_transactions(self.data['transactions'], start, end, item_names)
+        else:
+            transactions = self.storage.iter_transactions(start, end, item_names)
+        for trans in transactions:
+            yield (trans.get('date', ''),
+                   trans.get('item_name', ''),
+                   trans.get('type', ''),
+                   trans.get('quantity', 0),
+                   trans.get('price_per_unit', 0),
+                   trans.get('total_cost', 0))
+    
+    def iter_price_history_rows(self, start=None, end=None, item_names=None):
+        """Yield a row of EXPORT_COLUMNS['price_history'] per recorded price
+
+        start and end are datetimes, both included. Each item's series is
+        streamed from the history files in chunks, one item after another;
+        items sharing a price key are written once.
+        """
+        start = int(start.timestamp()) if start is not None else None
+        end = int(end.timestamp()) if end is not None else None
+        format_timestamp = TimestampFormatter()
+        seen = set()
+        for name, url in list(self.data['items'].rows('name', 'url')):
+            if item_names is not None and name not in item_names:
+                continue
+            key = price_key(url)
+            if key in seen:
+                continue
+            seen.add(key)
+            for timestamp, price in self.history.iter_range(key, start, end):
+                yield format_timestamp(timestamp), name, price
+    
+    def export(self, dataset, file_path, fmt=None, start=None, end=None, item_names=None,
+               progress=None):
+        """Write a dataset to a file and return the number of rows written
+
+        dataset is 'prices', 'transactions' or 'price_history' and fmt one
+        of EXPORT_FORMATS, taken from the file extension when left out.
+        start and end (datetimes, both included) limit transactions and
+        price history to a date range; item_names limits any dataset to
+        those items. Rows are generated and written in chunks, with
+        progress(rows_written) called after each one, so memory use stays
+        flat however large the dataset is.
+        """
+        if item_names is not None:
+            item_names = set(item_names)
+        if dataset == 'prices':
+            rows = self.iter_price_rows(item_names)
+        elif dataset == 'transactions':
+            rows = self.iter_transaction_rows(start, end, item_names)
+        elif dataset == 'price_history':
+            rows = self.iter_price_history_rows(start, end, item_names)
+        else:
+            raise ValueError(f"Unknown export dataset: {dataset}")
+        return write_export(file_path, EXPORT_COLUMNS[dataset], rows, fmt, progress=progress)
+    
+    def write_prices_csv(self, file_path):
+        """Write prices and positions to a CSV file"""
+        self.export('prices', file_path, 'csv')
+    
+    def write_history_csv(self, file_path):
+        """Write the transaction history to a CSV file"""
+        self.export('transactions', file_path, 'csv')
+    
+    def flush(self):
+        """Write pending data and the HTTP cache to disk now"""
+        self.storage.flush()
+        self.cache.save()
+    
+    def close(self):
+        self.http.close()
+        self.cache.save()
+        self.storage.close()
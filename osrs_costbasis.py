@@ -0,0 +1,190 @@
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # optional: batch FIFO recompute falls back to the lot loop
+    np = None
+
+# 'average' spreads the cost of every unit held evenly; 'fifo' and 'lifo'
+# sell the oldest or newest lot first
+COST_BASIS_METHODS = ('average', 'fifo', 'lifo')
+
+# Below this many transactions the NumPy setup costs more than it saves
+_VECTORIZE_MIN = 1000
+
+
+def new_position():
+    """An empty position
+
+    lots is a deque of open [quantity, price] lots, oldest first; it is only
+    kept for the 'fifo' and 'lifo' methods.
+    """
+    return {'quantity': 0, 'cost_basis': 0, 'cost_of_sold': 0, 'proceeds': 0, 'lots': deque()}
+
+
+def apply_transaction(position, transaction, method='average'):
+    """Apply one BUY or SELL to a position; other transaction types are ignored
+
+    A sell larger than the holding only sells what is held.
+    """
+    trans_type = transaction.get('type', '')
+    qty = transaction.get('quantity', 0)
+    price = transaction.get('price_per_unit', 0)
+
+    if trans_type == 'BUY':
+        position['quantity'] += qty
+        position['cost_basis'] += qty * price
+        if qty > 0 and method != 'average':
+            position['lots'].append([qty, price])
+    elif trans_type == 'SELL' and position['quantity'] > 0:
+        qty_to_sell = min(qty, position['quantity'])
+        if method == 'average':
+            cost_per_unit = position['cost_basis'] / position['quantity']
+            cost = qty_to_sell * cost_per_unit
+        else:
+            cost = _consume_lots(position['lots'], qty_to_sell, method == 'lifo')
+        position['cost_of_sold'] += cost
+        position['proceeds'] += qty_to_sell * price
+        position['quantity'] -= qty_to_sell
+        position['cost_basis'] -= cost
+
+
+def _consume_lots(lots, quantity, newest_first):
+    """Remove quantity units from the lots and return their cost"""
+    cost = 0
+    while quantity > 0 and lots:
+        lot = lots[-1] if newest_first else lots[0]
+        taken = min(quantity, lot[0])
+        cost += taken * lot[1]
+        lot[0] -= taken
+        quantity -= taken
+        if lot[0] <= 0:
+            if newest_first:
+                lots.pop()
+            else:
+                lots.popleft()
+    return cost
+
+
+def replay(transactions, method='average'):
+    """Build item_name -> position by applying transactions in order"""
+    positions = {}
+    for transaction in transactions:
+        item_name = transaction.get('item_name', '')
+        position = positions.get(item_name)
+        if position is None:
+            position = positions[item_name] = new_position()
+        apply_transaction(position, transaction, method)
+    return positions
+
+
+def recompute(transactions, method='average'):
+    """Rebuild every position from scratch
+
+    FIFO over a large ledger is computed with NumPy when it is installed;
+    everything else replays the lots in Python. Both give the same
+    positions. The NumPy path is a modest gain, not an order of magnitude:
+    reading the transaction dicts into arrays is a third of its time and
+    every item still costs a dozen small array calls, so over a million
+    trades it takes a half to two thirds of the time of the replay.
+
+    'average' is not vectorized. A sell scales the cost basis by the share
+    of the holding kept, so a closed form needs a running product of those
+    ratios: it reaches the bottom of the double range after about a
+    thousand sells of an item, has to restart wherever a holding is sold
+    out, and worked around in logs gives bases a few ulps off the replay's.
+    The replay needs no lots for 'average' and already takes about as long
+    as the NumPy FIFO path's fixed costs, so there is nothing to win.
+    """
+    if method == 'fifo' and np is not None and len(transactions) >= _VECTORIZE_MIN:
+        return _recompute_fifo_numpy(transactions)
+    return replay(transactions, method)
+
+
+def _recompute_fifo_numpy(transactions):
+    """FIFO positions for all items from cumulative quantity arrays
+
+    Per item, with B and S the running totals of bought and requested sold
+    units, the units actually sold (sells are capped at the holding) are
+    E = S + min(0, running minimum of B - S). Under FIFO the sold units are
+    the first E[-1] units bought, so their cost is read off the running
+    cost of the buys and whatever is left over forms the open lots.
+    """
+    names = [trans.get('item_name', '') for trans in transactions]
+    types = [trans.get('type', '') for trans in transactions]
+    qty = np.array([trans.get('quantity', 0) for trans in transactions])
+    price = np.array([trans.get('price_per_unit', 0) for trans in transactions])
+    is_buy = np.array([trans_type == 'BUY' for trans_type in types], dtype=bool)
+    is_sell = np.array([trans_type == 'SELL' for trans_type in types], dtype=bool)
+
+    codes = {}
+    item_codes = np.array([codes.setdefault(name, len(codes)) for name in names])
+    order = np.argsort(item_codes, kind='stable')
+    boundaries = np.flatnonzero(np.diff(item_codes[order])) + 1
+
+    positions = {}
+    names_by_code = list(codes)
+    for group in np.split(order, boundaries):
+        position = new_position()
+        positions[names_by_code[item_codes[group[0]]]] = position
+
+        group_qty = qty[group]
+        group_price = price[group]
+        group_buy = is_buy[group]
+        bought = np.cumsum(np.where(group_buy, group_qty, 0))
+        requested = np.cumsum(np.where(is_sell[group], group_qty, 0))
+        sold = requested + np.minimum(np.minimum.accumulate(bought - requested), 0)
+        sold_per_trans = np.diff(sold, prepend=0)
+
+        buy_qty = group_qty[group_buy & (group_qty > 0)]
+        buy_price = group_price[group_buy & (group_qty > 0)]
+        buy_cost = np.cumsum(buy_qty * buy_price)
+        buy_units = np.cumsum(buy_qty)
+        total_sold = sold[-1].item()
+        total_bought = bought[-1].item()
+
+        # Lots before `first_open` are fully sold; `first_open` may be partly sold
+        first_open = int(np.searchsorted(buy_units, total_sold, side='right'))
+        cost_of_sold = buy_cost[first_open - 1].item() if first_open > 0 else 0
+        lots = deque()
+        if first_open < len(buy_qty):
+            sold_from_lot = total_sold - (buy_units[first_open - 1].item() if first_open > 0 else 0)
+            cost_of_sold += sold_from_lot * buy_price[first_open].item()
+            lots.append([buy_qty[first_open].item() - sold_from_lot, buy_price[first_open].item()])
+            lots.extend([lot_qty, lot_price] for lot_qty, lot_price in
+                        zip(buy_qty[first_open + 1:].tolist(), buy_price[first_open + 1:].tolist()))
+
+        total_cost = buy_cost[-1].item() if len(buy_cost) else 0
+        position['quantity'] = total_bought - total_sold
+        position['cost_basis'] = total_cost - cost_of_sold
+        position['cost_of_sold'] = cost_of_sold
+        position['proceeds'] = (sold_per_trans * group_price).sum().item()
+        position['lots'] = lots
+    return positions
+
+
+def position_pnl(position, market_price):
+    """Realized and unrealized gain for a position at a market price
+
+    market_price of None (or 0) means an open holding cannot be valued; its
+    unrealized gain is then None.
+    """
+    realized = position['proceeds'] - position['cost_of_sold']
+    if position['quantity'] <= 0:
+        market_value = 0
+        unrealized = 0
+    elif market_price:
+        market_value = position['quantity'] * market_price
+        unrealized = market_value - position['cost_basis']
+    else:
+        market_value = 0
+        unrealized = None
+    return {
+        'quantity': position['quantity'],
+        'cost_basis': position['cost_basis'],
+        'cost_of_sold': position['cost_of_sold'],
+        'proceeds': position['proceeds'],
+        'realized_gain': realized,
+        'market_value': market_value,
+        'unrealized_gain': unrealized
+    }
@@ -0,0 +1,199 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet and Arrow exports
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet', 'arrow')
+
+# File extension -> export format
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow'
+}
+
+# Datasets PriceTracker.export() can write, with their columns
+EXPORT_COLUMNS = {
+    'prices': ('Item', 'Current Price', '1M Change %', '3M Change %', '6M Change %',
+               'Reference Price', 'Change %', 'Quantity', 'Portfolio Value'),
+    'transactions': ('Date', 'Item', 'Type', 'Quantity', 'Price Per Unit', 'Total Cost'),
+    'price_history': ('Date', 'Item', 'Price')
+}
+
+# Dates as stored on transactions and written for price history points
+EXPORT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Rows pulled from the source and written per chunk; progress is reported per chunk
+EXPORT_CHUNK_ROWS = 10000
+
+
+def format_for_path(path):
+    """Export format implied by a file name; CSV when the extension is unknown"""
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+
+def parse_export_date(text, end_of_day=False):
+    """Parse 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' for a date range filter
+
+    A bare date closing a range (end_of_day) covers that whole day. Blank
+    text means no limit and returns None; anything else raises ValueError.
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text, EXPORT_DATE_FORMAT)
+    except ValueError:
+        date = datetime.strptime(text, "%Y-%m-%d")
+    return date.replace(hour=23, minute=59, second=59) if end_of_day else date
+
+
+class TimestampFormatter:
+    """Format epoch seconds as local EXPORT_DATE_FORMAT strings, quickly
+
+    Time zone offsets are whole quarter hours and clocks change on them, so
+    the local time is looked up once per quarter hour and the minutes and
+    seconds within it are appended from a table; the odd exception is
+    formatted in full. Series of points a minute apart then cost a string
+    concatenation per point instead of a localtime() and strftime().
+    """
+
+    # "MM:SS" for every second of an hour
+    MINUTES_SECONDS = [f"{second // 60:02d}:{second % 60:02d}" for second in range(3600)]
+
+    def __init__(self):
+        self.bucket = None
+        self.prefix = ''
+        self.second = 0
+
+    def __call__(self, timestamp):
+        offset = timestamp % 900
+        bucket = timestamp - offset
+        if bucket != self.bucket:
+            local = time.localtime(bucket)
+            if local.tm_sec or local.tm_min % 15 or \
+                    time.localtime(bucket + 899).tm_gmtoff != local.tm_gmtoff:
+                # Not a quarter-hour offset (e.g. historic local mean time),
+                # or a clock change inside the quarter hour
+                return time.strftime(EXPORT_DATE_FORMAT, time.localtime(timestamp))
+            self.bucket = bucket
+            self.prefix = time.strftime("%Y-%m-%d %H:", local)
+            self.second = local.tm_min * 60
+        return self.prefix + self.MINUTES_SECONDS[self.second + offset]
+
+
+class CsvExportWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesExportWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.columns = columns
+        # One encoder for every row skips json.dumps() setting one up per call
+        self.encode = json.JSONEncoder().encode
+
+    def write(self, rows):
+        columns = self.columns
+        encode = self.encode
+        self.file.write(''.join(encode(dict(zip(columns, row))) + '\n' for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowExportWriter:
+    """Parquet (one row group per chunk) or Arrow IPC file output
+
+    The schema is taken from the first chunk, and later chunks are cast to
+    it (e.g. a column that is all None in a later chunk).
+    """
+
+    def __init__(self, path, columns, parquet=True):
+        if pa is None:
+            raise RuntimeError("Parquet and Arrow exports need the pyarrow package")
+        self.path = path
+        self.columns = columns
+        self.parquet = parquet
+        self.schema = None
+        self.writer = None
+        self.sink = None
+
+    def _open(self, schema):
+        self.schema = schema
+        if self.parquet:
+            self.writer = pq.ParquetWriter(self.path, schema)
+        else:
+            self.sink = pa.OSFile(self.path, 'wb')
+            self.writer = pa.ipc.new_file(self.sink, schema)
+
+    def write(self, rows):
+        table = pa.Table.from_arrays([pa.array(column) for column in zip(*rows)], names=self.columns)
+        if self.writer is None:
+            self._open(table.schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is None:
+            # Nothing was exported: write the columns with no rows
+            empty = pa.table({column: pa.array([], pa.string()) for column in self.columns})
+            self._open(empty.schema)
+            self.writer.write_table(empty)
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+
+
+def open_export_writer(path, columns, fmt):
+    if fmt == 'csv':
+        return CsvExportWriter(path, columns)
+    if fmt == 'jsonl':
+        return JsonLinesExportWriter(path, columns)
+    if fmt in ('parquet', 'arrow'):
+        return ArrowExportWriter(path, columns, parquet=fmt == 'parquet')
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def write_export(path, columns, rows, fmt=None, chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """Write an iterable of row tuples to a file chunk by chunk
+
+    Only one chunk of rows is held at a time, so rows can come from a
+    generator over any number of records. progress(rows_written) is called
+    after every chunk. Returns the number of rows written.
+    """
+    writer = open_export_writer(path, columns, fmt or format_for_path(path))
+    written = 0
+    try:
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                break
+            writer.write(chunk)
+            written += len(chunk)
+            if progress is not None:
+                progress(written)
+    finally:
+        writer.close()
+    return written
@@ -0,0 +1,96 @@
+import re
+
+# One precompiled pattern covering every field we need from an item page.
+# Every alternative starts at a '<' so the regex engine can skip straight
+# from tag to tag:
+#   anchor - the "Current Guide Price" heading; the price is the first
+#            title="..." span after it
+#   price  - a span carrying the exact price in its title attribute
+#   change - a stats__pc-change span (today's, then 1m, 3m and 6m)
+# The heading and price spans match in any case; the change spans match
+# exactly, as the old per-field patterns did.
+_TOKEN_PATTERN = re.compile(
+    r'<(?:'
+    r'(?P<anchor>h3[^>]*>\s*Current Guide Price)'
+    r'|span[^>]*title\s*=\s*["\'](?P<price>[0-9,]+)["\']'
+    r'|(?-i:span class=["\']stats__pc-change["\']>\s*(?P<change>[-+]?\s*\d+)\s*%?\s*</span>)'
+    r')',
+    re.IGNORECASE
+)
+
+# Characters kept between chunks so a tag split across two chunks still matches
+_OVERLAP = 512
+
+# Today's change is followed by the 1m, 3m and 6m changes
+_CHANGES_NEEDED = 4
+
+
+class ItemPageExtractor:
+    """Incremental, single-pass extractor for OSRS itemdb item pages.
+
+    Feed the page in any number of chunks; feed() returns True as soon as
+    the guide price and all change values have been seen, at which point
+    the rest of the page can be skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.anchored = False
+        self.price = None
+        self.changes = []
+        self.done = False
+        self.chars_read = 0
+
+    def feed(self, text):
+        """Scan another chunk of the page; return True once every field is found"""
+        if self.done:
+            return True
+
+        self.chars_read += len(text)
+        self.buffer += text
+        pos = 0
+        while True:
+            match = _TOKEN_PATTERN.search(self.buffer, pos)
+            if not match:
+                break
+            pos = match.end()
+            kind = match.lastgroup
+
+            if kind == 'anchor':
+                self.anchored = True
+            elif kind == 'price':
+                if self.anchored and self.price is None:
+                    price_str = match.group('price').replace(',', '')
+                    if price_str.isdigit():
+                        self.price = int(price_str)
+            elif len(self.changes) < _CHANGES_NEEDED:
+                self.changes.append(match.group('change'))
+
+            if self.price is not None and len(self.changes) >= _CHANGES_NEEDED:
+                self.done = True
+                self.buffer = ''
+                return True
+
+        # Drop everything already scanned, keeping a tail for split tags
+        self.buffer = self.buffer[max(pos, len(self.buffer) - _OVERLAP):]
+        return False
+
+    def result(self):
+        """Return (price, change_1m, change_3m, change_6m) from what has been read"""
+        changes = [0, 0, 0]  # 1m, 3m, 6m
+        if len(self.changes) >= _CHANGES_NEEDED:
+            try:
+                # Skip the first match (today's change), get 1m, 3m, 6m
+                for i in range(3):
+                    changes[i] = float(self.changes[i + 1].replace(' ', ''))
+            except ValueError:
+                changes = [0, 0, 0]
+
+        return self.price, changes[0], changes[1], changes[2]
+
+
+def extract_item_page(html):
+    """Extract (price, change_1m, change_3m, change_6m) from a complete item page"""
+    extractor = ItemPageExtractor()
+    extractor.feed(html)
+    return extractor.result()
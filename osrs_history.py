@@ -0,0 +1,273 @@
+import hashlib
+import mmap
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+
+HOUR = 3600
+DAY = 86400
+
+# Rows are two signed 64-bit integers: epoch seconds and the price in gp
+_TYPECODE = 'q'
+_ROW_SIZE = 2 * array(_TYPECODE).itemsize
+
+_SAFE_KEY = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Empty file whose modification time records the last compact_all()
+_COMPACTED_MARKER = '.compacted'
+
+
+def _read_rows(path):
+    """Read every complete row of a history file as one flat array"""
+    rows = array(_TYPECODE)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return rows
+    rows.frombytes(data[:len(data) - len(data) % _ROW_SIZE])
+    return rows
+
+
+class PriceHistoryStore:
+    """Append-only price history, one file of (timestamp, price) rows per item
+
+    Rows are fixed-width pairs of 64-bit integers, so an append is one
+    small write at the end of the file no matter how long the history is,
+    and a compaction replaces the whole file in one os.replace(). Reads
+    memory-map the file and binary-search the timestamps, so range queries
+    never load the whole series.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.RLock()
+        # Bumped on every write; changed maps a key to the version of its last write
+        self.version = 0
+        self.changed = {}
+        # File key -> the keys callers have used for it, so a write found
+        # by file name (as compact_all does) is reported under those keys
+        self.aliases = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _file_key(self, key):
+        file_key = str(key)
+        if not _SAFE_KEY.match(file_key):
+            # Arbitrary URLs and names are hashed into a file-safe key
+            file_key = hashlib.sha1(file_key.encode('utf-8')).hexdigest()[:16]
+        self.aliases.setdefault(file_key, set()).add(key)
+        return file_key
+
+    def _path(self, key):
+        return os.path.join(self.directory, self._file_key(key) + '.hist')
+
+    def _mark_changed(self, key):
+        self.version += 1
+        for alias in self.aliases[self._file_key(key)]:
+            self.changed[alias] = self.version
+
+    def append(self, key, price, timestamp=None):
+        """Record a price for an item; timestamp defaults to now"""
+        if timestamp is None:
+            timestamp = time.time()
+        self.extend(key, [(timestamp, price)])
+
+    def extend(self, key, points):
+        """Record many (timestamp, price) points for an item, in time order"""
+        path = self._path(key)
+        rows = array(_TYPECODE, [int(value) for point in points for value in point])
+        with self.lock:
+            with open(path, 'ab') as f:
+                # A crash mid-write can leave part of a row; drop it so the
+                # rows after it stay aligned
+                size = f.tell()
+                if size % _ROW_SIZE:
+                    f.truncate(size - size % _ROW_SIZE)
+                f.write(rows.tobytes())
+            self._mark_changed(key)
+
+    @contextmanager
+    def _mapped(self, key):
+        """Yield (timestamps, prices) as read-only int64 views over the file"""
+        path = self._path(key)
+        with self.lock:
+            f = None
+            m = None
+            views = []
+            try:
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                # Only complete rows are visible
+                size -= size % _ROW_SIZE
+                if size:
+                    f = open(path, 'rb')
+                    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    views.append(memoryview(m))
+                    views.append(views[-1][:size])
+                else:
+                    views.append(memoryview(b''))
+                views.append(views[-1].cast(_TYPECODE))
+                timestamps = views[-1][0::2]
+                prices = views[-1][1::2]
+                try:
+                    yield timestamps, prices
+                finally:
+                    timestamps.release()
+                    prices.release()
+            finally:
+                for view in reversed(views):
+                    view.release()
+                if m is not None:
+                    m.close()
+                if f is not None:
+                    f.close()
+
+    def count(self, key):
+        """Number of points stored for an item"""
+        with self._mapped(key) as (timestamps, prices):
+            return len(timestamps)
+
+    def latest(self, key):
+        """Return the most recent (timestamp, price), or None"""
+        with self._mapped(key) as (timestamps, prices):
+            if not len(timestamps):
+                return None
+            return timestamps[-1], prices[-1]
+
+    def range(self, key, start=None, end=None):
+        """Return [(timestamp, price), ...] with start <= timestamp <= end"""
+        with self._mapped(key) as (timestamps, prices):
+            lo = bisect_left(timestamps, start) if start is not None else 0
+            hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+            return list(zip(timestamps[lo:hi].tolist(), prices[lo:hi].tolist()))
+
+    def range_columns(self, key, start=None, end=None):
+        """Return (timestamps, prices) arrays with start <= timestamp <= end
+
+        For callers that work on whole series (e.g. with numpy.frombuffer)
+        rather than on points. The file is read rather than mapped, which is
+        cheaper for the short series of one item.
+        """
+        path = self._path(key)
+        with self.lock:
+            rows = _read_rows(path)
+        timestamps = rows[0::2]
+        lo = bisect_left(timestamps, start) if start is not None else 0
+        hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+        return timestamps[lo:hi], rows[2 * lo + 1:2 * hi:2]
+
+    def iter_range(self, key, start=None, end=None, chunk_size=65536):
+        """Yield (timestamp, price) with start <= timestamp <= end, lazily
+
+        Points are read chunk_size at a time and the files are only mapped
+        while a chunk is read, so the lock is not held between chunks and
+        memory use does not grow with the length of the series. Chunks end
+        on a timestamp boundary and the next one starts after it, so a
+        compaction in between cannot repeat or skip points.
+        """
+        after = None
+        while True:
+            with self._mapped(key) as (timestamps, prices):
+                if after is not None:
+                    lo = bisect_right(timestamps, after)
+                else:
+                    lo = bisect_left(timestamps, start) if start is not None else 0
+                hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+                if lo >= hi:
+                    return
+                stop = min(lo + chunk_size, hi)
+                stop = bisect_right(timestamps, timestamps[stop - 1], stop, hi)
+                chunk = list(zip(timestamps[lo:stop].tolist(), prices[lo:stop].tolist()))
+            after = chunk[-1][0]
+            yield from chunk
+
+    def downsample(self, key, bucket=DAY, start=None, end=None):
+        """Aggregate points into buckets (HOUR, DAY or any number of seconds)
+
+        Returns [(bucket_start, low, high, last), ...] in time order.
+        """
+        buckets = []
+        for timestamp, price in self.range(key, start, end):
+            bucket_start = timestamp - timestamp % bucket
+            if buckets and buckets[-1][0] == bucket_start:
+                _, low, high, _ = buckets[-1]
+                buckets[-1] = (bucket_start, min(low, price), max(high, price), price)
+            else:
+                buckets.append((bucket_start, price, price, price))
+        return buckets
+
+    def compact(self, key, retention_days=0, daily_after_days=0, now=None):
+        """Drop and thin out old points for an item
+
+        Points older than retention_days are removed (0 keeps everything).
+        Points older than daily_after_days are reduced to the last point of
+        each day. The new rows are written to a temporary file that then
+        replaces the item's file, so a crash leaves either the old rows or
+        the new ones.
+        """
+        if now is None:
+            now = time.time()
+        # Held throughout (the lock is reentrant) so an append made while
+        # the points are thinned is not lost when the files are replaced
+        with self.lock:
+            return self._compact(key, retention_days, daily_after_days, now)
+
+    def _compact(self, key, retention_days, daily_after_days, now):
+        points = self.range(key)
+        if not points:
+            return 0
+
+        cutoff = now - retention_days * DAY if retention_days > 0 else None
+        thin_before = now - daily_after_days * DAY if daily_after_days > 0 else None
+        kept = []
+        for timestamp, price in points:
+            if cutoff is not None and timestamp < cutoff:
+                continue
+            if thin_before is not None and timestamp < thin_before and kept and \
+                    kept[-1][0] // DAY == timestamp // DAY:
+                kept[-1] = (timestamp, price)
+                continue
+            kept.append((timestamp, price))
+
+        if len(kept) == len(points):
+            return 0
+
+        path = self._path(key)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(array(_TYPECODE, [value for point in kept for value in point]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        self._mark_changed(key)
+        return len(points) - len(kept)
+
+    def changed_since(self, version):
+        """Keys written after the given version"""
+        with self.lock:
+            return [key for key, changed in self.changed.items() if changed > version]
+
+    def keys(self):
+        """File keys of every item with stored history"""
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.hist'))
+
+    def compacted_at(self):
+        """Epoch seconds of the last compact_all(), or None if it never ran"""
+        try:
+            return os.path.getmtime(os.path.join(self.directory, _COMPACTED_MARKER))
+        except OSError:
+            return None
+
+    def compact_all(self, retention_days=0, daily_after_days=0):
+        """Compact every item; return the number of points removed
+
+        The time of the run is stored in the directory (see compacted_at).
+        """
+        now = time.time()
+        removed = sum(self.compact(key, retention_days, daily_after_days, now) for key in self.keys())
+        with open(os.path.join(self.directory, _COMPACTED_MARKER), 'w'):
+            pass
+        return removed
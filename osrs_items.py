@@ -0,0 +1,339 @@
+import sys
+import weakref
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional: column operations fall back to Python loops
+    np = None
+
+# Field order matches the item dicts in the JSON data file
+INT_FIELDS = ('reference_price', 'buy_price', 'sell_price', 'quantity', 'current_price')
+FLOAT_FIELDS = ('change_1m', 'change_3m', 'change_6m')
+FIELDS = ('name', 'url', 'reference_price', 'buy_price', 'sell_price', 'quantity',
+          'current_price', 'change_1m', 'change_3m', 'change_6m', 'last_updated')
+_SCHEMA_KEYS = frozenset(FIELDS + ('id',))
+
+
+class ItemRow:
+    """Dict-like view of one row of an ItemTable
+
+    Reads and writes go straight to the table's columns. A row removed from
+    the table keeps working on a snapshot of its last values, like a dict
+    that was dropped from a list. The storage row id, when there is one,
+    is exposed as 'id'.
+    """
+
+    __slots__ = ('table', 'row_id', 'detached', '__weakref__')
+
+    def __init__(self, table, row_id):
+        self.table = table
+        self.row_id = row_id
+        self.detached = None  # last values once the row is removed
+
+    def __getitem__(self, key):
+        table = self.table
+        position = table.positions.get(self.row_id)
+        if position is None:
+            return self.detached[key]
+        column = table.columns.get(key)
+        if column is not None:
+            return column[position]
+        if key == 'id' and table.ids[position]:
+            return table.ids[position]
+        return table.extras[self.row_id][key]
+
+    def __setitem__(self, key, value):
+        table = self.table
+        position = table.positions.get(self.row_id)
+        if position is None:
+            self.detached[key] = value
+            return
+        table.version += 1
+        if key in table.columns:
+            table.columns[key][position] = table.coerce(key, value)
+        elif key == 'id':
+            table.ids[position] = value or 0
+        else:
+            table.extras.setdefault(self.row_id, {})[key] = value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def pick(self, *fields):
+        """Values of several schema fields at once, as a tuple"""
+        table = self.table
+        position = table.positions.get(self.row_id)
+        if position is None:
+            return tuple(self.detached.get(field) for field in fields)
+        return tuple(table.columns[field][position] for field in fields)
+
+    def keys(self):
+        return list(self.to_dict())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def to_dict(self):
+        """A plain dict copy, as stored in the JSON data file"""
+        table = self.table
+        position = table.positions.get(self.row_id)
+        if position is None:
+            return dict(self.detached)
+        data = {field: table.columns[field][position] for field in FIELDS}
+        if table.ids[position]:
+            data['id'] = table.ids[position]
+        data.update(table.extras.get(self.row_id, {}))
+        return data
+
+    def __repr__(self):
+        return f"ItemRow({self.to_dict()!r})"
+
+
+class ItemTable:
+    """Tracked items stored column-wise instead of as a list of dicts
+
+    Prices and quantities live in int64 arrays, changes in float64 arrays
+    and names are interned. The table behaves like the list it replaces
+    (len, iteration, indexing, append, del) and hands out ItemRow views;
+    the same row always yields the same view object while it is in use.
+    Whole-column calculations (portfolio values, change %, sort orders)
+    run over the arrays, with NumPy when it is installed.
+    """
+
+    def __init__(self, items=()):
+        self.columns = {field: array('q') for field in INT_FIELDS}
+        self.columns.update({field: array('d') for field in FLOAT_FIELDS})
+        self.columns.update({'name': [], 'url': [], 'last_updated': []})
+        self.ids = array('q')      # storage row id, 0 when not stored yet
+        self.row_ids = array('q')  # stable id of the row at each position
+        self.positions = {}        # row id -> position
+        self.extras = {}           # row id -> keys outside the fixed schema
+        self.views = weakref.WeakValueDictionary()
+        self.next_row_id = 0
+        self.version = 0           # bumped on every change
+        self.extend(items)
+
+    @staticmethod
+    def coerce(field, value):
+        if field in INT_FIELDS:
+            return int(value or 0)
+        if field in FLOAT_FIELDS:
+            return float(value or 0)
+        value = '' if value is None else str(value)
+        return sys.intern(value) if field == 'name' else value
+
+    def _view(self, position):
+        row_id = self.row_ids[position]
+        view = self.views.get(row_id)
+        if view is None:
+            view = self.views[row_id] = ItemRow(self, row_id)
+        return view
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def __iter__(self):
+        for position in range(len(self.row_ids)):
+            yield self._view(position)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._view(index) for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("item index out of range")
+        return self._view(position)
+
+    def append(self, item):
+        """Add an item (a dict or another table's row) at the end"""
+        row_id = self.next_row_id
+        self.next_row_id += 1
+        self.positions[row_id] = len(self.row_ids)
+        self.row_ids.append(row_id)
+        for field, column in self.columns.items():
+            column.append(self.coerce(field, item.get(field)))
+        self.ids.append(item.get('id') or 0)
+        extra_keys = item.keys() - _SCHEMA_KEYS
+        if extra_keys:
+            self.extras[row_id] = {key: item[key] for key in extra_keys}
+        self.version += 1
+
+    def extend(self, items):
+        """Append many items, filling each column in one pass"""
+        items = list(items)
+        start = len(self.row_ids)
+        first_row_id = self.next_row_id
+        self.next_row_id += len(items)
+        self.row_ids.extend(range(first_row_id, self.next_row_id))
+        self.positions.update(zip(range(first_row_id, self.next_row_id), range(start, start + len(items))))
+        for field in INT_FIELDS:
+            self.columns[field].extend([int(item.get(field) or 0) for item in items])
+        for field in FLOAT_FIELDS:
+            self.columns[field].extend([float(item.get(field) or 0) for item in items])
+        self.columns['name'].extend([sys.intern(str(item.get('name') or '')) for item in items])
+        for field in ('url', 'last_updated'):
+            self.columns[field].extend([str(item.get(field) or '') for item in items])
+        self.ids.extend([item.get('id') or 0 for item in items])
+        for row_id, item in enumerate(items, first_row_id):
+            extra_keys = item.keys() - _SCHEMA_KEYS
+            if extra_keys:
+                self.extras[row_id] = {key: item[key] for key in extra_keys}
+        self.version += 1
+
+    def __delitem__(self, position):
+        if position < 0:
+            position += len(self)
+        row_id = self.row_ids[position]
+        # Views still held elsewhere (e.g. by an update in flight) keep a
+        # copy; the copy goes away with the view
+        view = self.views.get(row_id)
+        if view is not None:
+            view.detached = view.to_dict()
+        for column in self.columns.values():
+            del column[position]
+        del self.ids[position]
+        del self.row_ids[position]
+        del self.positions[row_id]
+        self.extras.pop(row_id, None)
+        for index in range(position, len(self.row_ids)):
+            self.positions[self.row_ids[index]] = index
+        self.version += 1
+
+    def rows(self, *fields):
+        """Iterate over tuples of the given schema fields, one per row"""
+        return zip(*(self.columns[field] for field in fields))
+
+    def to_dicts(self):
+        """Plain dicts for every row, in order"""
+        dicts = [dict(zip(FIELDS, row)) for row in self.rows(*FIELDS)]
+        for position, storage_id in enumerate(self.ids):
+            if storage_id:
+                dicts[position]['id'] = storage_id
+        for row_id, extras in self.extras.items():
+            dicts[self.positions[row_id]].update(extras)
+        return dicts
+
+    # Whole-column calculations. Results are new lists; NumPy only ever sees
+    # short-lived views of the arrays, which would otherwise refuse to grow.
+
+    def portfolio_values(self):
+        """current_price * quantity per row, 0 where there is no current price"""
+        prices = self.columns['current_price']
+        quantities = self.columns['quantity']
+        if np is not None and len(prices):
+            price_array = np.frombuffer(prices, dtype=np.int64)
+            quantity_array = np.frombuffer(quantities, dtype=np.int64)
+            return np.where(price_array > 0, price_array * quantity_array, 0).tolist()
+        return [price * quantity if price > 0 else 0 for price, quantity in zip(prices, quantities)]
+
+    def change_percents(self):
+        """Current vs reference price change per row, None where either is missing"""
+        current = self.columns['current_price']
+        reference = self.columns['reference_price']
+        if np is not None and len(current):
+            current_array = np.frombuffer(current, dtype=np.int64).astype(np.float64)
+            reference_array = np.frombuffer(reference, dtype=np.int64).astype(np.float64)
+            valid = (current_array > 0) & (reference_array > 0)
+            percents = np.divide(current_array - reference_array, reference_array,
+                                 out=np.zeros_like(current_array), where=valid) * 100
+            return [percent if ok else None for percent, ok in zip(percents.tolist(), valid.tolist())]
+        return [(price - ref) / ref * 100 if price > 0 and ref > 0 else None
+                for price, ref in zip(current, reference)]
+
+    def total_value(self):
+        """Sum of portfolio_values()"""
+        return sum(self.portfolio_values())
+
+    def sort_keys(self, key):
+        """Per-row sort keys for a view column; None where the cell shows N/A or -
+
+        key is 'name', 'display_price', 'change_1m', 'change_3m',
+        'change_6m', 'reference_price', 'change_percent', 'quantity' or
+        'portfolio_value'.
+        """
+        columns = self.columns
+        if key == 'name':
+            return list(columns['name'])
+        if key in ('reference_price', 'quantity'):
+            return list(columns[key])
+        if key in FLOAT_FIELDS:
+            return [value or None for value in columns[key]]
+        if key == 'display_price':
+            return [price if price > 0 else (ref if ref > 0 else None)
+                    for price, ref in zip(columns['current_price'], columns['reference_price'])]
+        if key == 'change_percent':
+            return self.change_percents()
+        if key == 'portfolio_value':
+            return [value if quantity != 0 and value else None
+                    for value, quantity in zip(self.portfolio_values(), columns['quantity'])]
+        raise KeyError(key)
+
+    def _sort_key_array(self, key):
+        """sort_keys() as a float64 array with NaN for None (numeric keys only)"""
+        columns = self.columns
+        if key in INT_FIELDS:
+            return np.frombuffer(columns[key], dtype=np.int64).astype(np.float64)
+        if key in FLOAT_FIELDS:
+            values = np.frombuffer(columns[key], dtype=np.float64).copy()
+            values[values == 0] = np.nan
+            return values
+        current = np.frombuffer(columns['current_price'], dtype=np.int64).astype(np.float64)
+        reference = np.frombuffer(columns['reference_price'], dtype=np.int64).astype(np.float64)
+        if key == 'display_price':
+            values = np.where(current > 0, current, reference)
+            values[values <= 0] = np.nan
+            return values
+        if key == 'change_percent':
+            valid = (current > 0) & (reference > 0)
+            return np.divide(current - reference, reference, out=np.full_like(current, np.nan),
+                             where=valid) * 100
+        if key == 'portfolio_value':
+            quantity = np.frombuffer(columns['quantity'], dtype=np.int64).astype(np.float64)
+            return np.where((current > 0) & (quantity != 0), current * quantity, np.nan)
+        raise KeyError(key)
+
+    def sort_order(self, key):
+        """Return (positions with a key in ascending order, positions without one)"""
+        if np is not None and key != 'name' and len(self):
+            values = self._sort_key_array(key)
+            missing = np.isnan(values)
+            present = np.flatnonzero(~missing)
+            present = present[np.argsort(values[present], kind='stable')]
+            return present.tolist(), np.flatnonzero(missing).tolist()
+        keys = self.sort_keys(key)
+        present = [position for position, value in enumerate(keys) if value is not None]
+        present.sort(key=keys.__getitem__)
+        missing = [position for position, value in enumerate(keys) if value is None]
+        return present, missing
+
+
+def to_json(obj):
+    """json.dumps default= hook writing tables and rows as plain lists and dicts"""
+    if isinstance(obj, ItemTable):
+        return obj.to_dicts()
+    if isinstance(obj, ItemRow):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
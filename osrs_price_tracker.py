@@ -1,185 +1,136 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-import requests
-import re
-import json
 import threading
-import time
 from datetime import datetime
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import csv
 
-class OSRSPriceTracker:
+from osrs_alerts import ALERT_DIRECTIONS, ALERT_METRICS, describe_rule
+from osrs_analytics import VOLATILITY_WINDOW
+from osrs_core import PriceTracker, item_url
+from osrs_costbasis import COST_BASIS_METHODS
+from osrs_export import EXPORT_COLUMNS, EXPORT_FORMATS, parse_export_date
+
+# How often the Tk main loop drains queued worker results (milliseconds)
+UI_TICK_MS = 100
+
+# Pixel sizes used to work out how many rows fit in the virtual grid
+VIRTUAL_ROW_HEIGHT = 20
+VIRTUAL_HEADER_HEIGHT = 25
+
+# Item fields a prices view row is built from
+ROW_FIELDS = ('name', 'reference_price', 'current_price', 'quantity', 'change_1m', 'change_3m', 'change_6m')
+
+# History view filter entry that shows every item's transactions
+ALL_ITEMS = 'All items'
+
+# Holdings listed in the analytics view, largest first
+ALLOCATION_ROWS = 100
+
+# Prices view column -> ItemTable sort key
+SORT_KEYS = {
+    'Item': 'name',
+    'Current Price': 'display_price',
+    '1M Change': 'change_1m',
+    '3M Change': 'change_3m',
+    '6M Change': 'change_6m',
+    'Reference Price': 'reference_price',
+    'Change %': 'change_percent',
+    'Quantity': 'quantity',
+    'Portfolio Value': 'portfolio_value'
+}
+
+
+class UIUpdateQueue:
+    """Thread-safe hand-off from worker threads to the Tk main loop
+
+    Workers queue price results and callbacks; the main loop drains the
+    queue on a fixed tick so every Tk call happens on the main thread.
+    All price results pending at a tick are merged into one repaint, and
+    a newer result for an item replaces an older one not yet applied.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending_prices = {}
+        self.callbacks = []
+        self.events = 0
+        self.repaints = 0
+    
+    def put_price(self, item, result):
+        """Queue a scrape result to be applied to an item dict"""
+        with self.lock:
+            self.events += 1
+            self.pending_prices[id(item)] = (item, result)
+    
+    def call(self, func, *args):
+        """Queue a function to run on the main thread after pending prices are applied"""
+        with self.lock:
+            self.callbacks.append((func, args))
+    
+    def drain(self):
+        """Take everything queued; return (price updates, callbacks)"""
+        with self.lock:
+            prices = list(self.pending_prices.values())
+            callbacks = self.callbacks
+            self.pending_prices = {}
+            self.callbacks = []
+            if prices:
+                self.repaints += 1
+        return prices, callbacks
+    
+    def get_stats(self):
+        """Return event counts; coalesced is events absorbed into a shared repaint"""
+        with self.lock:
+            return {
+                'events': self.events,
+                'repaints': self.repaints,
+                'coalesced': self.events - self.repaints
+            }
+
+
+class OSRSPriceTracker(PriceTracker):
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("OSRS Price Tracker")
         self.root.geometry("1100x700")
         self.root.configure(bg='#2b2b2b')
         
-        # Data file for persistence
-        self.data_file = "osrs_tracker_data.json"
+        # Load data and set up fetching; saves are debounced on the Tk loop
+        PriceTracker.__init__(self, self.root.after, self.on_save_error, self.on_alert)
         
-        # Load saved data or initialize with default items
-        self.load_data()
+        # Sort variables; sort_orders caches the model-side order per column
+        self.sort_column = None
+        self.sort_reverse = False
+        self.sort_orders = {}
         
         # Create GUI
         self.create_gui()
         
         # Start price update thread
         self.update_thread = None
-        self.stop_updating = False
         
-        # Sort variables
-        self.sort_column = None
-        self.sort_reverse = False
+        # Worker threads hand results to the main loop through this queue
+        self.ui_queue = UIUpdateQueue()
+        self.root.after(UI_TICK_MS, self.process_ui_queue)
+        
+        # Keep the item catalogue for search and import fresh in the background
+        if self.catalogue_is_stale():
+            threading.Thread(target=self.refresh_catalogue_quietly, daemon=True).start()
         
         # Bind close event
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-    def load_data(self):
-        """Load data from JSON file or initialize with defaults"""
-        default_data = {
-            "items": [
-                {
-                    "name": "Torstol Seed",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Torstol+seed/viewitem?obj=5304",
-                    "reference_price": 13333,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 1,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Dragon Pickaxe",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Dragon+pickaxe/viewitem?obj=11920",
-                    "reference_price": 900000,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 1,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Anglerfish",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Anglerfish/viewitem?obj=13441",
-                    "reference_price": 1440,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 100,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Blighted Ice Sack",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Blighted+ancient+ice+sack/viewitem?obj=24607",
-                    "reference_price": 272,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 100,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Dragon Arrow",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Dragon+arrow/viewitem?obj=11212",
-                    "reference_price": 1400,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 100,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Bond",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Old+school+bond/viewitem?obj=13190",
-                    "reference_price": 12000000,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 1,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Spirit Shield",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Spirit+shield/viewitem?obj=12829",
-                    "reference_price": 55000,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 1,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                },
-                {
-                    "name": "Black Chinchompa",
-                    "url": "https://secure.runescape.com/m=itemdb_oldschool/Black+chinchompa/viewitem?obj=11959",
-                    "reference_price": 2500,
-                    "buy_price": 0,
-                    "sell_price": 0,
-                    "quantity": 100,
-                    "current_price": 0,
-                    "change_1m": 0,
-                    "change_3m": 0,
-                    "change_6m": 0,
-                    "last_updated": ""
-                }
-            ],
-            "transactions": []
-        }
-        
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    self.data = json.load(f)
-                    # Ensure transactions key exists
-                    if 'transactions' not in self.data:
-                        self.data['transactions'] = []
-                    # Migrate items to new schema with buy_price and sell_price
-                    for item in self.data.get('items', []):
-                        if 'buy_price' not in item:
-                            item['buy_price'] = 0
-                        if 'sell_price' not in item:
-                            item['sell_price'] = 0
-                        if 'change_1m' not in item:
-                            item['change_1m'] = 0
-                        if 'change_3m' not in item:
-                            item['change_3m'] = 0
-                        if 'change_6m' not in item:
-                            item['change_6m'] = 0
-            except:
-                self.data = default_data
-        else:
-            self.data = default_data
+    def on_save_error(self, error):
+        messagebox.showerror("Error", f"Failed to save data: {str(error)}")
     
-    def save_data(self):
-        """Save data to JSON file"""
+    def refresh_catalogue_quietly(self):
+        """refresh_catalogue() for a background thread; the cached catalogue stays on failure"""
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=2)
+            self.refresh_catalogue()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save data: {str(e)}")
+            print(f"Error refreshing item catalogue: {e}")
+    
+    def on_alert(self, message):
+        self.show_notification(message, 8000, '#ffa500')
     
     def create_gui(self):
         """Create the main GUI"""
@@ -233,7 +184,12 @@ class OSRSPriceTracker:
         self.history_btn = tk.Button(tab_frame, text="History", 
                                     command=self.show_history_tab,
                                     bg='#444444', fg='white', font=('Arial', 10, 'bold'))
-        self.history_btn.pack(side=tk.LEFT)
+        self.history_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.analytics_btn = tk.Button(tab_frame, text="Analytics", 
+                                      command=self.show_analytics_tab,
+                                      bg='#444444', fg='white', font=('Arial', 10, 'bold'))
+        self.analytics_btn.pack(side=tk.LEFT)
         
         # Control buttons frame (RIGHT side)
         self.control_buttons_frame = tk.Frame(top_frame, bg='#2b2b2b')
@@ -259,8 +215,18 @@ class OSRSPriceTracker:
                               bg='#d13438', fg='white', font=('Arial', 10, 'bold'))
         remove_btn.pack(side=tk.LEFT, padx=(0, 5))
         
+        import_btn = tk.Button(self.control_buttons_frame, text="Import", 
+                              command=self.import_items_dialog,
+                              bg='#107c10', fg='white', font=('Arial', 10, 'bold'))
+        import_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
+        alerts_btn = tk.Button(self.control_buttons_frame, text="Alerts", 
+                              command=self.manage_alerts,
+                              bg='#ca5010', fg='white', font=('Arial', 10, 'bold'))
+        alerts_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
         self.export_prices_btn = tk.Button(self.control_buttons_frame, text="Export", 
-                              command=self.export_prices_csv,
+                              command=lambda: self.export_data('prices'),
                               bg='#006dbf', fg='white', font=('Arial', 10, 'bold'))
         self.export_prices_btn.pack(side=tk.LEFT)
         
@@ -272,10 +238,12 @@ class OSRSPriceTracker:
         self.notification_label = tk.Label(main_frame, text="",
                                           fg='#00ff00', bg='#2b2b2b', font=('Arial', 9))
         self.notification_label.pack(side=tk.TOP, anchor='ne', padx=(0, 10), pady=(2, 0))
+        self.notification_job = None
         
         # Create both views but only show prices initially
         self.create_prices_view()
         self.create_history_view()
+        self.create_analytics_view()
         self.show_prices_tab()
     
     def create_prices_view(self):
@@ -288,6 +256,7 @@ class OSRSPriceTracker:
         # Scrollbar
         scrollbar = ttk.Scrollbar(tree_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.prices_scrollbar = scrollbar
         
         # Treeview - columns with Current Price before Reference Price, plus change columns
         columns = ('Item', 'Current Price', '1M Change', '3M Change', '6M Change', 'Reference Price', 'Change %', 'Quantity', 'Portfolio Value')
@@ -316,7 +285,20 @@ class OSRSPriceTracker:
         # Bind double-click to edit
         self.tree.bind('<Double-1>', self.edit_item)
         
-        # Populate tree with initial data
+        # Virtual grid: with many items only the visible window gets rows.
+        # view_order holds data indices in display order.
+        self.virtual_mode = False
+        self.view_order = []
+        self.view_order_dirty = True
+        self.view_offset = 0
+        self.page_size = 30
+        self.tree.bind('<Configure>', self.on_tree_resize)
+        self.tree.bind('<MouseWheel>', self.on_tree_mousewheel)
+        self.tree.bind('<Button-4>', self.on_tree_mousewheel)
+        self.tree.bind('<Button-5>', self.on_tree_mousewheel)
+        
+        # Populate tree with initial data; iid -> (values, tag) last written
+        self.rendered_rows = {}
         self.refresh_tree()
     
     def create_history_view(self):
@@ -331,6 +313,27 @@ class OSRSPriceTracker:
                                      font=('Arial', 10, 'bold'), fg='#00ffff', bg='#3c3c3c')
         self.summary_label.pack(padx=10, pady=5)
         
+        method_frame = tk.Frame(summary_frame, bg='#3c3c3c')
+        method_frame.pack(pady=(0, 5))
+        tk.Label(method_frame, text="Cost basis:", fg='white', bg='#3c3c3c',
+                 font=('Arial', 9, 'bold')).pack(side=tk.LEFT, padx=(0, 5))
+        self.cost_basis_var = tk.StringVar(value=self.data['settings']['cost_basis_method'])
+        method_box = ttk.Combobox(method_frame, textvariable=self.cost_basis_var, values=COST_BASIS_METHODS,
+                                  state='readonly', width=10)
+        method_box.pack(side=tk.LEFT)
+        method_box.bind('<<ComboboxSelected>>', self.on_cost_basis_method_changed)
+        
+        # Realized / unrealized gain per item
+        self.pnl_tree = ttk.Treeview(self.history_frame, columns=('Item', 'Held', 'Cost Basis', 'Realized', 'Unrealized'),
+                                     show='headings', height=6)
+        for col in ('Item', 'Held', 'Cost Basis', 'Realized', 'Unrealized'):
+            self.pnl_tree.heading(col, text=col)
+            self.pnl_tree.column(col, anchor='center', width=100)
+        self.pnl_tree.column('Item', anchor='w', width=150)
+        self.pnl_tree.pack(fill=tk.X, pady=(0, 5))
+        self.pnl_tree.tag_configure('green', foreground='#00FF00')
+        self.pnl_tree.tag_configure('red', foreground='#FF0000')
+        
         # Button frame for history controls
         button_frame = tk.Frame(self.history_frame, bg='#2b2b2b')
         button_frame.pack(fill=tk.X, padx=(0, 0), pady=(0, 5))
@@ -346,10 +349,19 @@ class OSRSPriceTracker:
         delete_all_btn.pack(side=tk.LEFT, padx=(0, 5))
         
         export_hist_btn = tk.Button(button_frame, text="Export History", 
-                                   command=self.export_history_csv,
+                                   command=lambda: self.export_data('transactions'),
                                    bg='#006dbf', fg='white', font=('Arial', 10, 'bold'))
         export_hist_btn.pack(side=tk.LEFT)
         
+        # Show one item's transactions, from the per-item date index
+        self.history_item_var = tk.StringVar(value=ALL_ITEMS)
+        self.history_item_box = ttk.Combobox(button_frame, textvariable=self.history_item_var,
+                                             values=(ALL_ITEMS,), state='readonly', width=25)
+        self.history_item_box.pack(side=tk.RIGHT)
+        self.history_item_box.bind('<<ComboboxSelected>>', lambda event: self.refresh_history_rows())
+        tk.Label(button_frame, text="Item:", fg='white', bg='#2b2b2b',
+                 font=('Arial', 9, 'bold')).pack(side=tk.RIGHT, padx=(0, 5))
+        
         # Scrollbar
         scrollbar = ttk.Scrollbar(self.history_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -371,212 +383,345 @@ class OSRSPriceTracker:
         
         self.history_tree.tag_configure('green', foreground='#00FF00')
         self.history_tree.tag_configure('red', foreground='#FF0000')
+        self.history_tree.tag_configure('buy', foreground='#00FF00')
+        self.history_tree.tag_configure('sell', foreground='#FFD700')
+    
+    def create_analytics_view(self):
+        """Create the portfolio analytics view"""
+        self.analytics_frame = tk.Frame(self.content_frame, bg='#2b2b2b')
+        
+        summary_frame = tk.Frame(self.analytics_frame, bg='#3c3c3c', relief=tk.RAISED, bd=1)
+        summary_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        self.analytics_value_label = tk.Label(summary_frame, text="Total Value: 0 gp",
+                                              font=('Arial', 10, 'bold'), fg='#00ffff', bg='#3c3c3c')
+        self.analytics_value_label.pack(padx=10, pady=(5, 0))
+        self.analytics_change_label = tk.Label(summary_frame, text="",
+                                               font=('Arial', 10), fg='white', bg='#3c3c3c')
+        self.analytics_change_label.pack(padx=10)
+        self.analytics_risk_label = tk.Label(summary_frame, text="",
+                                             font=('Arial', 10), fg='white', bg='#3c3c3c')
+        self.analytics_risk_label.pack(padx=10, pady=(0, 5))
+        
+        # Largest holdings by share of portfolio value
+        scrollbar = ttk.Scrollbar(self.analytics_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        columns = ('Item', 'Value', 'Weight')
+        self.allocation_tree = ttk.Treeview(self.analytics_frame, columns=columns, show='headings',
+                                            yscrollcommand=scrollbar.set)
+        scrollbar.config(command=self.allocation_tree.yview)
+        for col in columns:
+            self.allocation_tree.heading(col, text=col)
+            self.allocation_tree.column(col, anchor='center', width=120)
+        self.allocation_tree.column('Item', anchor='w', width=200)
+        self.allocation_tree.pack(fill=tk.BOTH, expand=True)
+    
+    def refresh_analytics(self):
+        """Show the current portfolio analytics"""
+        analytics = self.get_analytics()
+        self.analytics_value_label.config(
+            text=f"Total Value: {analytics['total_value']:,} gp across {analytics['held_items']} held items")
+        self.analytics_change_label.config(
+            text=f"Value-weighted change: 1M {analytics['change_1m']:+.2f}% | "
+                 f"3M {analytics['change_3m']:+.2f}% | 6M {analytics['change_6m']:+.2f}%")
+        if analytics['volatility_series']:
+            volatility_str = f"{analytics['volatility']:.2f}% daily"
+        else:
+            volatility_str = "N/A (not enough history)"
+        self.analytics_risk_label.config(
+            text=f"Volatility ({VOLATILITY_WINDOW}d): {volatility_str} | "
+                 f"Max Drawdown: {analytics['max_drawdown']:.2f}%")
+        
+        self.allocation_tree.delete(*self.allocation_tree.get_children())
+        for name, value, weight in analytics['allocation'][:ALLOCATION_ROWS]:
+            self.allocation_tree.insert('', 'end', values=(name, f"{value:,}", f"{weight * 100:.2f}%"))
+    
+    def on_cost_basis_method_changed(self, event=None):
+        """Switch cost-basis method and rebuild the ledger with it"""
+        self.data['settings']['cost_basis_method'] = self.cost_basis_var.get()
+        self.storage.save_settings(self.data['settings'])
+        self.ledger = None
+        self.refresh_history_tree()
     
     def show_prices_tab(self):
         """Switch to prices view"""
         self.history_frame.pack_forget()
+        self.analytics_frame.pack_forget()
         self.tree_frame.pack(fill=tk.BOTH, expand=True)
         self.prices_btn.config(bg='#0078d4')
         self.history_btn.config(bg='#444444')
+        self.analytics_btn.config(bg='#444444')
         self.control_buttons_frame.pack(side=tk.RIGHT, fill=tk.X)
         self.refresh_tree()
     
     def show_history_tab(self):
         """Switch to history view"""
         self.tree_frame.pack_forget()
+        self.analytics_frame.pack_forget()
         self.history_frame.pack(fill=tk.BOTH, expand=True)
         self.history_btn.config(bg='#0078d4')
         self.prices_btn.config(bg='#444444')
+        self.analytics_btn.config(bg='#444444')
         self.control_buttons_frame.pack_forget()
         self.refresh_history_tree()
     
+    def show_analytics_tab(self):
+        """Switch to analytics view"""
+        self.tree_frame.pack_forget()
+        self.history_frame.pack_forget()
+        self.analytics_frame.pack(fill=tk.BOTH, expand=True)
+        self.analytics_btn.config(bg='#0078d4')
+        self.prices_btn.config(bg='#444444')
+        self.history_btn.config(bg='#444444')
+        self.control_buttons_frame.pack_forget()
+        self.refresh_analytics()
+    
     def show_notification(self, message, duration=3000, color='#00ff00'):
         """Show a notification in the upper right corner"""
         self.notification_label.config(text=message, fg=color)
-        # Auto-hide after duration (in milliseconds)
-        self.root.after(duration, lambda: self.notification_label.config(text=""))
+        # Auto-hide after duration (in milliseconds); a newer message restarts the timer
+        if self.notification_job is not None:
+            self.root.after_cancel(self.notification_job)
+        self.notification_job = self.root.after(duration, self.hide_notification)
     
-    def refresh_tree(self):
-        """Refresh the treeview with current data"""
-        self.tree.delete(*self.tree.get_children())
-        
-        for idx, item_data in enumerate(self.data['items']):
-            reference_price = item_data.get('reference_price', 0)
-            current_price = item_data.get('current_price', 0)
-            quantity = item_data.get('quantity', 1)
-            change_1m = item_data.get('change_1m', 0)
-            change_3m = item_data.get('change_3m', 0)
-            change_6m = item_data.get('change_6m', 0)
+    def hide_notification(self):
+        self.notification_job = None
+        self.notification_label.config(text="")
+    
+    def format_item_row(self, fields):
+        """Return (values, tag) for an item's treeview row, given its ROW_FIELDS values"""
+        name, reference_price, current_price, quantity, change_1m, change_3m, change_6m = fields
 
-            # Use current_price if available, otherwise use reference_price for display
-            display_price = current_price if current_price > 0 else reference_price
+        # Use current_price if available, otherwise use reference_price for display
+        display_price = current_price if current_price > 0 else reference_price
 
-            # Calculate change based on current price vs reference price
-            change_percent = 0
-            if reference_price > 0 and current_price > 0:
-                change_percent = ((current_price - reference_price) / reference_price) * 100
-                change_str = f"{change_percent:+.2f}%"
-            else:
-                change_str = "N/A"
+        # Calculate change based on current price vs reference price
+        change_percent = 0
+        if reference_price > 0 and current_price > 0:
+            change_percent = ((current_price - reference_price) / reference_price) * 100
+            change_str = f"{change_percent:+.2f}%"
+        else:
+            change_str = "N/A"
 
-            # Format change percentages with color coding
-            def format_change(change_val):
-                if change_val == 0:
-                    return "-"
-                change_str = f"{change_val:+.1f}%"
-                return change_str
+        # Format change percentages with color coding
+        def format_change(change_val):
+            if change_val == 0:
+                return "-"
+            change_str = f"{change_val:+.1f}%"
+            return change_str
 
-            # Portfolio value based on current price
-            portfolio_value = 0
-            if quantity == 0:
-                portfolio_value_str = "-"
-            elif current_price > 0:
-                portfolio_value = current_price * quantity
-                portfolio_value_str = f"{portfolio_value:,}"
-            else:
-                portfolio_value_str = "N/A"
+        # Portfolio value based on current price
+        portfolio_value = 0
+        if quantity == 0:
+            portfolio_value_str = "-"
+        elif current_price > 0:
+            portfolio_value = current_price * quantity
+            portfolio_value_str = f"{portfolio_value:,}"
+        else:
+            portfolio_value_str = "N/A"
 
-            reference_price_str = f"{reference_price:,}"
-            current_price_str = f"{display_price:,}" if display_price > 0 else "N/A"
-            change_1m_str = format_change(change_1m)
-            change_3m_str = format_change(change_3m)
-            change_6m_str = format_change(change_6m)
+        reference_price_str = f"{reference_price:,}"
+        current_price_str = f"{display_price:,}" if display_price > 0 else "N/A"
+        change_1m_str = format_change(change_1m)
+        change_3m_str = format_change(change_3m)
+        change_6m_str = format_change(change_6m)
 
-            values = (
-                item_data['name'],
-                current_price_str,
-                change_1m_str,
-                change_3m_str,
-                change_6m_str,
-                reference_price_str,
-                change_str,
-                quantity,
-                portfolio_value_str
-            )
+        values = (
+            name,
+            current_price_str,
+            change_1m_str,
+            change_3m_str,
+            change_6m_str,
+            reference_price_str,
+            change_str,
+            quantity,
+            portfolio_value_str
+        )
 
-            # Store the data index as the item ID
-            item_id = self.tree.insert('', 'end', values=values, tags=(f'data_index_{idx}',))
-            
-            # Color the entire row based on current price vs reference price
-            if change_percent > 0:
-                self.tree.tag_configure(f'green_{item_id}', foreground='#00FF00')
-                self.tree.item(item_id, tags=(f'green_{item_id}', f'data_index_{idx}'))
-            elif change_percent < 0:
-                self.tree.tag_configure(f'red_{item_id}', foreground='#FF0000')
-                self.tree.item(item_id, tags=(f'red_{item_id}', f'data_index_{idx}'))
-    
-    def scrape_price(self, url):
-        """Scrape price and historical changes from OSRS website"""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            html = response.text
-            
-            if len(html) < 100:
-                return None, 0, 0, 0
-            
-            # Extract current price
-            price = None
-            patterns = [
-                r'<h3[^>]*>Current Guide Price[^<]*<span[^>]*title\s*=\s*["\']([0-9,]+)["\'][^>]*>',
-                r'Current Guide Price.*?<span[^>]*title\s*=\s*["\']([0-9,]+)["\']',
-                r'<span[^>]*title\s*=\s*["\']([0-9,]+)["\'][^>]*>[^<]*</span>',
-                r'title\s*=\s*["\']([0-9,]+)["\']'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, html, re.IGNORECASE)
-                if match:
-                    price_str = match.group(1).replace(',', '')
-                    if price_str.isdigit():
-                        price = int(price_str)
-                        break
-            
-            # Extract 1/3/6 month changes from stats__pc-change spans
-            changes = [0, 0, 0]  # 1m, 3m, 6m
-            change_pattern = r'<span class=["\']stats__pc-change["\']>\s*([-+]?\s*\d+)\s*%?\s*</span>'
-            change_matches = re.findall(change_pattern, html)
-            
-            # The first change is today's, followed by 1m, 3m, 6m
-            # We only want the 1m, 3m, 6m changes (skip the first one)
-            if len(change_matches) >= 4:
-                try:
-                    # Skip the first match (today's change), get 1m, 3m, 6m
-                    for i in range(3):
-                        change_str = change_matches[i + 1].replace(' ', '').replace('%', '')
-                        changes[i] = float(change_str)
-                except (ValueError, IndexError):
-                    pass
-            
-            return price, changes[0], changes[1], changes[2]
+        # Color the entire row based on current price vs reference price
+        if change_percent > 0:
+            tag = 'green'
+        elif change_percent < 0:
+            tag = 'red'
+        else:
+            tag = None
+        return values, tag
+    
+    def refresh_tree(self):
+        """Bring the treeview in line with the data, touching only rows that changed
+
+        Row iids are the data indices. The values last written to each row
+        are remembered and the widget is only updated when they differ.
+        Rows are kept in view_order, so the current sort survives refreshes.
+        """
+        items = self.data['items']
+        virtual = len(items) > self.data['settings']['virtual_grid_threshold']
+        if virtual != self.virtual_mode:
+            self.set_virtual_mode(virtual)
+        if self.view_order_dirty or len(self.view_order) != len(items):
+            self.view_order = self.build_view_order()
+            self.view_order_dirty = False
+        if self.virtual_mode:
+            self.render_virtual_window()
+            return
+        
+        for idx, fields in enumerate(items.rows(*ROW_FIELDS)):
+            iid = str(idx)
+            row = self.format_item_row(fields)
+            rendered = self.rendered_rows.get(iid)
+            if rendered == row:
+                continue
             
-        except Exception as e:
-            print(f"Error scraping price: {e}")
-            return None, 0, 0, 0
+            values, tag = row
+            tags = (tag,) if tag else ()
+            if rendered is None:
+                self.tree.insert('', 'end', iid=iid, values=values, tags=tags)
+            else:
+                self.tree.item(iid, values=values, tags=tags)
+            self.rendered_rows[iid] = row
+        
+        # Drop rows for items that no longer exist
+        for idx in range(len(items), len(self.rendered_rows)):
+            iid = str(idx)
+            self.tree.delete(iid)
+            del self.rendered_rows[iid]
+        
+        if self.sort_column:
+            order = [str(idx) for idx in self.view_order]
+            if list(self.tree.get_children('')) != order:
+                for position, iid in enumerate(order):
+                    self.tree.move(iid, '', position)
+    
+    def set_virtual_mode(self, enabled):
+        """Switch the prices view between a full treeview and a virtual grid"""
+        self.tree.delete(*self.tree.get_children())
+        self.rendered_rows = {}
+        self.virtual_mode = enabled
+        self.view_order = []
+        self.view_offset = 0
+        if enabled:
+            # The scrollbar tracks our window over view_order, not the widget
+            self.tree.configure(yscrollcommand='')
+            self.prices_scrollbar.config(command=self.on_virtual_scroll)
+        else:
+            self.tree.configure(yscrollcommand=self.prices_scrollbar.set)
+            self.prices_scrollbar.config(command=self.tree.yview)
+    
+    def render_virtual_window(self):
+        """Show only the rows of view_order that fit in the visible window"""
+        items = self.data['items']
+        total = len(self.view_order)
+        self.view_offset = max(0, min(self.view_offset, total - self.page_size))
+        visible = self.view_order[self.view_offset:self.view_offset + self.page_size]
+        
+        wanted = {str(idx) for idx in visible}
+        for iid in list(self.rendered_rows):
+            if iid not in wanted:
+                self.tree.delete(iid)
+                del self.rendered_rows[iid]
+        
+        for position, idx in enumerate(visible):
+            iid = str(idx)
+            row = self.format_item_row(items[idx].pick(*ROW_FIELDS))
+            rendered = self.rendered_rows.get(iid)
+            values, tag = row
+            tags = (tag,) if tag else ()
+            if rendered is None:
+                self.tree.insert('', position, iid=iid, values=values, tags=tags)
+            else:
+                if rendered != row:
+                    self.tree.item(iid, values=values, tags=tags)
+                if self.tree.index(iid) != position:
+                    self.tree.move(iid, '', position)
+            self.rendered_rows[iid] = row
+        
+        if total:
+            self.prices_scrollbar.set(self.view_offset / total,
+                                      (self.view_offset + len(visible)) / total)
+        else:
+            self.prices_scrollbar.set(0, 1)
+    
+    def on_virtual_scroll(self, *args):
+        """Scrollbar command in virtual mode: move the window over view_order"""
+        if args[0] == 'moveto':
+            self.view_offset = int(float(args[1]) * len(self.view_order))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.page_size
+            self.view_offset += step
+        self.render_virtual_window()
+    
+    def on_tree_mousewheel(self, event):
+        if not self.virtual_mode:
+            return None
+        if event.num == 4 or event.delta > 0:
+            self.on_virtual_scroll('scroll', -3, 'units')
+        else:
+            self.on_virtual_scroll('scroll', 3, 'units')
+        return 'break'
+    
+    def on_tree_resize(self, event):
+        page_size = max(1, (event.height - VIRTUAL_HEADER_HEIGHT) // VIRTUAL_ROW_HEIGHT)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            if self.virtual_mode:
+                self.render_virtual_window()
+    
+    def get_data_index(self, item_id):
+        """Return the data index of a prices treeview row"""
+        return int(item_id)
     
     def update_prices_thread(self):
         """Start price update in a separate thread"""
         if self.update_thread and self.update_thread.is_alive():
             return
         
+        self.update_btn.config(state='disabled', text='Updating...')
+        self.show_notification("Updating prices...", 15000, '#ffff00')
+        
         self.update_thread = threading.Thread(target=self.update_prices)
         self.update_thread.daemon = True
         self.update_thread.start()
     
+    def process_ui_queue(self):
+        """Apply queued worker results and callbacks on the Tk main thread"""
+        try:
+            price_updates, callbacks = self.ui_queue.drain()
+            for item, result in price_updates:
+                self.apply_price_result(item, result)
+            if price_updates:
+                self.refresh_tree()
+            for func, args in callbacks:
+                func(*args)
+        finally:
+            self.root.after(UI_TICK_MS, self.process_ui_queue)
+    
     def update_prices(self):
-        """Update all item prices concurrently"""
-        self.update_btn.config(state='disabled', text='Updating...')
-        self.show_notification("Updating prices...", 15000, '#ffff00')
-        
-        # Store current sort state before update
-        current_sort_column = self.sort_column
-        current_sort_reverse = self.sort_reverse
-        
-        total_items = len(self.data['items'])
-        updated_count = [0]  # Use list to allow modification in nested function
-        
-        def update_single_price(item_index):
-            """Update price for a single item"""
-            if self.stop_updating:
-                return
-            
-            item = self.data['items'][item_index]
-            result = self.scrape_price(item['url'])
-            if result[0] is not None:
-                item['current_price'] = result[0]
-                item['change_1m'] = result[1]
-                item['change_3m'] = result[2]
-                item['change_6m'] = result[3]
-                item['last_updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                updated_count[0] += 1
-            
-            return item_index
-        
-        # Use ThreadPoolExecutor to fetch all prices concurrently (max 5 threads)
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(update_single_price, i) for i in range(len(self.data['items']))]
-            
-            # Wait for all to complete
-            for future in as_completed(futures):
-                if self.stop_updating:
-                    break
-                future.result()
-                self.root.after(0, self.refresh_tree)
-        
-        # Save data and update GUI
-        self.save_data()
-        self.root.after(0, self.refresh_tree)
-        
-        # Restore sort state after refresh
-        if current_sort_column:
-            self.root.after(0, lambda: self.sort_treeview(current_sort_column))
-        
-        self.root.after(0, lambda: self.update_btn.config(state='normal', text='Update All Prices'))
-        self.root.after(0, lambda: self.show_notification("Update complete", 3000, '#00ff00'))
+        """Update all item prices concurrently
+
+        Runs on the update thread and never touches Tk or the item dicts
+        directly; results go through self.ui_queue.
+        """
+        message = self.fetch_prices(list(self.data['items']), self.ui_queue.put_price)
+        if message is not None:
+            self.ui_queue.call(self.finish_update, message)
+            try:
+                self.compact_history()
+            except Exception as e:
+                print(f"Error compacting price history: {e}")
+    
+    def finish_update(self, message):
+        """Restore the UI once a full update's results are applied"""
+        self.update_btn.config(state='normal', text='Update All Prices')
+        self.show_notification(message, 3000, '#00ff00')
+    
+    def apply_price_result(self, item, result):
+        """Store a scrape result on an item; return True if it had a price"""
+        if not PriceTracker.apply_price_result(self, item, result):
+            return False
+        self.invalidate_sort_orders()
+        return True
     
     def update_selected_item(self):
         """Update price for selected item only"""
@@ -585,17 +730,7 @@ class OSRSPriceTracker:
             messagebox.showwarning("Warning", "Please select an item to update.")
             return
         
-        # Get the data index from the tag
-        item_id = selection[0]
-        tags = self.tree.item(item_id, 'tags')
-        data_index = None
-        for tag in tags:
-            if tag.startswith('data_index_'):
-                data_index = int(tag.split('_')[-1])
-                break
-        
-        if data_index is None:
-            return
+        data_index = self.get_data_index(selection[0])
         
         item = self.data['items'][data_index]
         
@@ -603,18 +738,21 @@ class OSRSPriceTracker:
         self.show_notification(f"Updating {item['name']}...", 10000, '#ffff00')
         
         def update():
-            result = self.scrape_price(item['url'])
-            if result[0] is not None:
-                item['current_price'] = result[0]
-                item['change_1m'] = result[1]
-                item['change_3m'] = result[2]
-                item['change_6m'] = result[3]
-                item['last_updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.save_data()
+            self.cache.reset_stats()
+            if self.is_fresh(item):
+                self.cache.record_hit()
+            else:
+                result = self.scrape_price(item['url'])
+                if result[0] is not None:
+                    self.ui_queue.put_price(item, result)
+                self.cache.save()
             
-            self.refresh_tree()
+            message = f"Update complete ({self.format_cache_stats()})"
+            self.ui_queue.call(finish, message)
+        
+        def finish(message):
             self.update_selected_btn.config(state='normal', text='Update Selected')
-            self.show_notification("Update complete", 3000, '#00ff00')
+            self.show_notification(message, 3000, '#00ff00')
         
         thread = threading.Thread(target=update)
         thread.daemon = True
@@ -622,7 +760,7 @@ class OSRSPriceTracker:
     
     def add_item(self):
         """Add a new item"""
-        dialog = AddItemDialog(self.root)
+        dialog = AddItemDialog(self.root, self.get_catalogue())
         if dialog.result:
             name, url, ref_price, buy_price, sell_price, quantity = dialog.result
             new_item = {
@@ -639,10 +777,36 @@ class OSRSPriceTracker:
                 'last_updated': ''
             }
             self.data['items'].append(new_item)
-            self.save_data()
+            # Save the table's row so a storage id lands on it
+            self.storage.save_item(self.data['items'][-1])
+            self.items_by_name = None
+            self.invalidate_sort_orders()
             self.refresh_tree()
             self.show_notification(f"Added '{name}'", 2000, '#00ff00')
     
+    def import_items_dialog(self):
+        """Add every item named in a CSV or text file"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("CSV or text files", "*.csv *.txt"), ("All files", "*.*")])
+        if not file_path:
+            return
+        try:
+            added, skipped, unknown, invalid = self.import_items_file(file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to import items: {str(e)}")
+            return
+        
+        self.invalidate_sort_orders()
+        self.refresh_tree()
+        self.show_notification(f"Imported {len(added)} items ({len(skipped)} already tracked)", 3000, '#00ff00')
+        if unknown:
+            shown = "\n".join(unknown[:20]) + ("\n..." if len(unknown) > 20 else "")
+            messagebox.showwarning("Unknown Items", f"{len(unknown)} names were not found in the item catalogue:\n{shown}")
+        if invalid:
+            shown = "\n".join(f"Line {line_number}: {reason}" for line_number, reason in invalid[:20]) + \
+                ("\n..." if len(invalid) > 20 else "")
+            messagebox.showwarning("Invalid Rows", f"{len(invalid)} rows were skipped:\n{shown}")
+    
     def remove_item(self):
         """Remove selected item"""
         selection = self.tree.selection()
@@ -650,23 +814,15 @@ class OSRSPriceTracker:
             messagebox.showwarning("Warning", "Please select an item to remove.")
             return
         
-        # Get the data index from the tag
-        item_id = selection[0]
-        tags = self.tree.item(item_id, 'tags')
-        data_index = None
-        for tag in tags:
-            if tag.startswith('data_index_'):
-                data_index = int(tag.split('_')[-1])
-                break
-        
-        if data_index is None:
-            return
+        data_index = self.get_data_index(selection[0])
         
         item_name = self.data['items'][data_index]['name']
         
         if messagebox.askyesno("Confirm", f"Are you sure you want to remove '{item_name}'?"):
+            self.storage.delete_item(self.data['items'][data_index])
             del self.data['items'][data_index]
-            self.save_data()
+            self.items_by_name = None
+            self.invalidate_sort_orders()
             self.refresh_tree()
             self.show_notification(f"Removed '{item_name}'", 2000, '#ff9999')
     
@@ -676,19 +832,7 @@ class OSRSPriceTracker:
         if not selection:
             return
         
-        # Get the data index from the tag instead of tree position
-        item_id = selection[0]
-        tags = self.tree.item(item_id, 'tags')
-        
-        # Find the data_index tag
-        data_index = None
-        for tag in tags:
-            if tag.startswith('data_index_'):
-                data_index = int(tag.split('_')[-1])
-                break
-        
-        if data_index is None:
-            return
+        data_index = self.get_data_index(selection[0])
         
         item = self.data['items'][data_index]
         old_quantity = item['quantity']
@@ -710,10 +854,22 @@ class OSRSPriceTracker:
                 old_sell_price = item.get('sell_price', 0)
                 self.log_transaction(name, quantity, buy_price, sell_price, old_quantity, old_buy_price, old_sell_price)
             
-            self.save_data()
+            self.storage.save_item(item)
+            self.items_by_name = None
+            self.invalidate_sort_orders()
             self.refresh_tree()
             self.show_notification(f"Updated '{name}'", 2000, '#00ff00')
     
+    def manage_alerts(self):
+        """Open the alert rules of the selected item"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select an item to set alerts for.")
+            return
+        
+        item = self.data['items'][self.get_data_index(selection[0])]
+        AlertDialog(self.root, self, item['name'])
+    
     def sort_treeview(self, col):
         """Sort treeview by column"""
         if self.sort_column == col:
@@ -730,132 +886,64 @@ class OSRSPriceTracker:
                 arrow = " ↑↓"
             self.tree.heading(column, text=f"{column}{arrow}")
 
-        # Get items and sort them based on their data indices
-        items_data = []
-        for item_id in self.tree.get_children(''):
-            value = self.tree.set(item_id, col)
-            # Extract data index from tags
-            tags = self.tree.item(item_id, 'tags')
-            data_index = None
-            for tag in tags:
-                if tag.startswith('data_index_'):
-                    data_index = int(tag.split('_')[-1])
-                    break
-            items_data.append((value, data_index, item_id))
-        
-        # Sort based on column type
-        if col == 'Item':
-            items_data.sort(key=lambda x: x[0], reverse=self.sort_reverse)
-        else:
-            # Convert values to numbers for numeric sorting
-            def convert_value(item):
-                try:
-                    clean_value = item[0].replace(',', '').replace('+', '').replace('%', '')
-                    return float(clean_value)
-                except (ValueError, TypeError):
-                    return float('-inf')
-            
-            items_data.sort(key=convert_value, reverse=self.sort_reverse)
+        # Rows are arranged from the cached model-side order (display only,
+        # data stays intact)
+        self.view_order_dirty = True
+        self.view_offset = 0
+        self.refresh_tree()
+    
+    def get_sort_order(self, col):
+        """Return (ascending indices with a value, indices without one) for a column
 
-        # Rearrange items in sorted order (tree display only, data stays intact)
-        for index, (_, _, item_id) in enumerate(items_data):
-            self.tree.move(item_id, '', index)
+        Keys are computed once per column and cached until the data changes,
+        so clicking a column again only reverses the cached order.
+        """
+        if col not in self.sort_orders:
+            self.sort_orders[col] = self.data['items'].sort_order(SORT_KEYS[col])
+        return self.sort_orders[col]
     
-    def log_transaction(self, item_name, new_qty, new_buy_price, new_sell_price, old_qty, old_buy_price, old_sell_price):
-        """Log a transaction when quantity or prices change"""
-        if 'transactions' not in self.data:
-            self.data['transactions'] = []
-        
-        qty_change = new_qty - old_qty
-        
-        # Only log if there's an actual change
-        if qty_change == 0 and new_buy_price == old_buy_price and new_sell_price == old_sell_price:
-            return
-        
-        transaction_type = 'BUY' if qty_change > 0 else 'SELL' if qty_change < 0 else 'PRICE_UPDATE'
-        
-        # For buys, use buy price; for sells, use sell price
-        transaction_qty = abs(qty_change) if qty_change != 0 else 0
-        if qty_change > 0:
-            transaction_price = new_buy_price
-        elif qty_change < 0:
-            transaction_price = new_sell_price
-        else:
-            transaction_price = 0
-        
-        transaction = {
-            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'item_name': item_name,
-            'type': transaction_type,
-            'quantity': transaction_qty,
-            'price_per_unit': transaction_price,
-            'total_cost': transaction_qty * transaction_price,
-            'old_quantity': old_qty,
-            'new_quantity': new_qty
-        }
-        
-        self.data['transactions'].append(transaction)
-        self.save_data()
+    def build_view_order(self):
+        """Data indices in display order; items without a value always sort last"""
+        if not self.sort_column:
+            return list(range(len(self.data['items'])))
+        present, missing = self.get_sort_order(self.sort_column)
+        if self.sort_reverse:
+            return present[::-1] + missing
+        return present + missing
+    
+    def invalidate_sort_orders(self):
+        """Forget cached sort orders after the item data changed"""
+        self.sort_orders = {}
+        self.view_order_dirty = True
     
     def refresh_history_tree(self):
-        """Refresh the history treeview"""
-        self.history_tree.delete(*self.history_tree.get_children())
+        """Refresh the history summary, item filter and transaction rows"""
+        self.refresh_history_summary()
+        self.refresh_history_rows()
+    
+    def refresh_history_summary(self):
+        """Refresh the portfolio summary line and the per-item gain/loss rows"""
+        self.pnl_tree.delete(*self.pnl_tree.get_children())
         
-        if 'transactions' not in self.data or not self.data['transactions']:
+        transactions = self.get_transactions()
+        if not transactions:
             self.summary_label.config(text="Portfolio: Current Value: 0 gp | Gain/Loss (Realized): 0 gp (0%) | Unrealized: 0 gp (0%)")
             return
         
-        # Calculate portfolio metrics based on transaction history
-        total_cost_of_sold = 0  # Cost basis of items that were sold
-        total_proceeds_from_sales = 0  # Revenue from sales
-        holdings = {}  # item_name -> {quantity, cost_basis}
-        
-        for trans in self.data['transactions']:
-            trans_type = trans.get('type', '')
-            qty = trans.get('quantity', 0)
-            price = trans.get('price_per_unit', 0)
-            item_name = trans.get('item_name', '')
-            
-            if trans_type == 'BUY':
-                if item_name not in holdings:
-                    holdings[item_name] = {'quantity': 0, 'cost_basis': 0}
-                holdings[item_name]['quantity'] += qty
-                holdings[item_name]['cost_basis'] += qty * price
-            elif trans_type == 'SELL':
-                if item_name in holdings and holdings[item_name]['quantity'] > 0:
-                    # Calculate the cost basis of sold items (FIFO)
-                    qty_to_sell = min(qty, holdings[item_name]['quantity'])
-                    cost_per_unit = holdings[item_name]['cost_basis'] / holdings[item_name]['quantity']
-                    total_cost_of_sold += qty_to_sell * cost_per_unit
-                    total_proceeds_from_sales += qty_to_sell * price
-                    
-                    # Reduce holdings
-                    holdings[item_name]['quantity'] -= qty_to_sell
-                    holdings[item_name]['cost_basis'] -= qty_to_sell * cost_per_unit
-        
-        # Calculate current portfolio value and unrealized gains
-        current_value = 0
-        cost_basis_unrealized = 0
-        for item_name, holding in holdings.items():
-            if holding['quantity'] > 0:
-                # Find the item in the items list to get current price
-                for item in self.data['items']:
-                    if item['name'] == item_name:
-                        current_price = item.get('current_price', 0)
-                        sell_price = item.get('sell_price', 0)
-                        # Use current_price if available, otherwise use sell_price
-                        price_to_use = current_price if current_price > 0 else sell_price
-                        if price_to_use > 0:
-                            current_value += holding['quantity'] * price_to_use
-                        cost_basis_unrealized += holding['cost_basis']
-                        break
+        # Portfolio metrics come from the running ledger
+        ledger = self.get_ledger()
+        items_by_name = self.get_items_by_name()
+        summary = ledger.summary(items_by_name)
+        current_value = summary['current_value']
+        total_cost_of_sold = summary['cost_of_sold']
+        cost_basis_unrealized = summary['cost_basis']
         
         # Realized gain/loss = proceeds from sales - cost basis of sold items
-        realized_gain = total_proceeds_from_sales - total_cost_of_sold
+        realized_gain = summary['realized_gain']
         realized_percent = (realized_gain / total_cost_of_sold * 100) if total_cost_of_sold > 0 else 0
         
         # Unrealized gain/loss = current value of holdings - cost basis of holdings
-        unrealized_gain_loss = current_value - cost_basis_unrealized
+        unrealized_gain_loss = summary['unrealized_gain']
         unrealized_percent = (unrealized_gain_loss / cost_basis_unrealized * 100) if cost_basis_unrealized > 0 else 0
         
         # Format values
@@ -867,18 +955,32 @@ class OSRSPriceTracker:
         summary_text = f"Portfolio: Current Value: {current_value:,} gp | Gain/Loss (Realized): {realized_gain_str} gp ({realized_percent:+.2f}%) | Unrealized: {unrealized_str} gp ({unrealized_percent:+.2f}%)"
         self.summary_label.config(text=summary_text, fg=realized_color)
         
-        # Sort transactions by date (newest first)
-        sorted_transactions = sorted(self.data['transactions'], key=lambda x: x.get('date', ''), reverse=True)
+        for item_name, pnl in sorted(ledger.item_pnl(items_by_name).items()):
+            unrealized = pnl['unrealized_gain']
+            values = (
+                item_name,
+                f"{pnl['quantity']:,}",
+                f"{round(pnl['cost_basis']):,}",
+                f"{round(pnl['realized_gain']):+,}",
+                f"{round(unrealized):+,}" if unrealized is not None else "N/A"
+            )
+            total_gain = pnl['realized_gain'] + (unrealized or 0)
+            self.pnl_tree.insert('', 'end', values=values, tags=('green' if total_gain >= 0 else 'red',))
+    
+    def refresh_history_rows(self):
+        """Refill the transaction rows, newest first, for the item chosen in the filter"""
+        self.history_tree.delete(*self.history_tree.get_children())
         
-        # Build a mapping of sorted transactions to original indices
-        trans_index_map = {}
-        for idx, trans in enumerate(self.data['transactions']):
-            for sort_idx, sorted_trans in enumerate(sorted_transactions):
-                if trans is sorted_trans:
-                    trans_index_map[sort_idx] = idx
-                    break
+        index = self.get_transaction_index()
+        item_names = index.item_names()
+        self.history_item_box.config(values=(ALL_ITEMS,) + tuple(item_names))
+        shown_item = self.history_item_var.get()
+        if shown_item not in item_names:
+            shown_item = ALL_ITEMS
+            self.history_item_var.set(ALL_ITEMS)
         
-        for sort_idx, trans in enumerate(sorted_transactions):
+        # Rows are keyed by transaction id, newest first from the date index
+        for trans in index.newest_first(None if shown_item == ALL_ITEMS else shown_item):
             date = trans.get('date', '')
             item_name = trans.get('item_name', '')
             trans_type = trans.get('type', '')
@@ -895,104 +997,54 @@ class OSRSPriceTracker:
                 f"{total:,}"
             )
             
-            # Get the original index in the data array
-            original_index = trans_index_map.get(sort_idx, sort_idx)
-            item_id = self.history_tree.insert('', 'end', values=values, tags=(f'data_index_{original_index}',))
-            
             # Color code transactions
-            if trans_type == 'BUY':
-                self.history_tree.tag_configure(f'buy_{item_id}', foreground='#00FF00')
-                self.history_tree.item(item_id, tags=(f'buy_{item_id}', f'data_index_{original_index}'))
-            elif trans_type == 'SELL':
-                self.history_tree.tag_configure(f'sell_{item_id}', foreground='#FFD700')
-                self.history_tree.item(item_id, tags=(f'sell_{item_id}', f'data_index_{original_index}'))
+            tags = ('buy',) if trans_type == 'BUY' else ('sell',) if trans_type == 'SELL' else ()
+            self.history_tree.insert('', 'end', iid=str(trans['id']), values=values, tags=tags)
 
     def on_closing(self):
         """Handle application closing"""
         self.stop_updating = True
         if self.update_thread and self.update_thread.is_alive():
             self.update_thread.join(timeout=2)
+        self.close()
         self.root.destroy()
     
-    def export_prices_csv(self):
-        """Export prices and positions to CSV"""
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialfile=f"osrs_prices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        )
-        
-        if not file_path:
+    def export_data(self, dataset):
+        """Ask what to export and where, then write it on a background thread"""
+        selected = [self.data['items'][self.get_data_index(iid)]['name'] for iid in self.tree.selection()]
+        dialog = ExportDialog(self.root, dataset, len(selected))
+        if not dialog.result:
             return
+        dataset, fmt, start, end, selected_only = dialog.result
         
-        try:
-            with open(file_path, 'w', newline='') as csvfile:
-                fieldnames = ['Item', 'Current Price', '1M Change %', '3M Change %', '6M Change %', 'Reference Price', 'Change %', 'Quantity', 'Portfolio Value']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for item in self.data['items']:
-                    reference_price = item.get('reference_price', 0)
-                    current_price = item.get('current_price', 0)
-                    quantity = item.get('quantity', 0)
-                    change_1m = item.get('change_1m', 0)
-                    change_3m = item.get('change_3m', 0)
-                    change_6m = item.get('change_6m', 0)
-                    
-                    change_percent = 0
-                    if reference_price > 0 and current_price > 0:
-                        change_percent = ((current_price - reference_price) / reference_price) * 100
-                    
-                    portfolio_value = 0
-                    if quantity > 0 and current_price > 0:
-                        portfolio_value = current_price * quantity
-                    
-                    writer.writerow({
-                        'Item': item['name'],
-                        'Current Price': current_price,
-                        '1M Change %': f"{change_1m:+.2f}" if change_1m != 0 else "",
-                        '3M Change %': f"{change_3m:+.2f}" if change_3m != 0 else "",
-                        '6M Change %': f"{change_6m:+.2f}" if change_6m != 0 else "",
-                        'Reference Price': reference_price,
-                        'Change %': f"{change_percent:+.2f}%",
-                        'Quantity': quantity,
-                        'Portfolio Value': portfolio_value
-                    })
-            
-            self.show_notification("Prices exported", 2000, '#00ff00')
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export prices: {str(e)}")
-    
-    def export_history_csv(self):
-        """Export transaction history to CSV"""
         file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialfile=f"osrs_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            defaultextension=f".{fmt}",
+            filetypes=[(f"{fmt.upper()} files", f"*.{fmt}"), ("All files", "*.*")],
+            initialfile=f"osrs_{dataset}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
         )
         
         if not file_path:
             return
         
+        # The export reads SQLite on its own connection, so commit pending rows first
+        self.flush()
+        self.show_notification("Exporting...", 15000, '#ffff00')
+        threading.Thread(target=self.run_export,
+                         args=(dataset, file_path, fmt, start, end, selected if selected_only else None),
+                         daemon=True).start()
+    
+    def run_export(self, dataset, file_path, fmt, start, end, item_names):
+        """Write an export (background thread); progress goes to the notification label"""
+        def progress(rows):
+            self.ui_queue.call(self.show_notification, f"Exporting... {rows:,} rows", 15000, '#ffff00')
+        
         try:
-            with open(file_path, 'w', newline='') as csvfile:
-                fieldnames = ['Date', 'Item', 'Type', 'Quantity', 'Price Per Unit', 'Total Cost']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for trans in self.data.get('transactions', []):
-                    writer.writerow({
-                        'Date': trans.get('date', ''),
-                        'Item': trans.get('item_name', ''),
-                        'Type': trans.get('type', ''),
-                        'Quantity': trans.get('quantity', 0),
-                        'Price Per Unit': trans.get('price_per_unit', 0),
-                        'Total Cost': trans.get('total_cost', 0)
-                    })
-            
-            self.show_notification("History exported", 2000, '#00ff00')
+            rows = self.export(dataset, file_path, fmt, start, end, item_names, progress)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to export history: {str(e)}")
+            self.ui_queue.call(self.hide_notification)
+            self.ui_queue.call(messagebox.showerror, "Error", f"Failed to export {dataset}: {str(e)}")
+            return
+        self.ui_queue.call(self.show_notification, f"Exported {rows:,} rows", 3000, '#00ff00')
     
     def delete_selected_transaction(self):
         """Delete selected transaction from history"""
@@ -1002,27 +1054,16 @@ class OSRSPriceTracker:
             return
         
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this transaction?"):
-            # Get the data index from the tag
-            item_id = selection[0]
-            tags = self.history_tree.item(item_id, 'tags')
-            data_index = None
-            for tag in tags:
-                if tag.startswith('data_index_'):
-                    data_index = int(tag.split('_')[-1])
-                    break
-            
-            if data_index is not None:
-                # Delete from data
-                del self.data['transactions'][data_index]
-                self.save_data()
-                self.refresh_history_tree()
+            if self.delete_transaction(int(selection[0])) is not None:
+                # Only the deleted row goes; the totals come from the ledger
+                self.history_tree.delete(selection[0])
+                self.refresh_history_summary()
                 self.show_notification("Transaction deleted", 2000, '#ff9999')
     
     def delete_all_history(self):
         """Delete all transaction history"""
         if messagebox.askyesno("Confirm", "Are you sure you want to delete ALL history?\nThis cannot be undone."):
-            self.data['transactions'] = []
-            self.save_data()
+            self.clear_transactions()
             self.refresh_history_tree()
             self.show_notification("All history cleared", 2000, '#ff9999')
     
@@ -1032,12 +1073,14 @@ class OSRSPriceTracker:
 
 
 class AddItemDialog:
-    def __init__(self, parent):
+    def __init__(self, parent, catalogue=None):
         self.result = None
+        self.catalogue = catalogue
+        self.suggestions = []
         
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Add New Item")
-        self.dialog.geometry("550x360")
+        self.dialog.geometry("550x460")
         self.dialog.configure(bg='#2b2b2b')
         self.dialog.transient(parent)
         self.dialog.grab_set()
@@ -1063,6 +1106,13 @@ class AddItemDialog:
         row1_entry.pack(fill=tk.X, pady=(0, 5))
         self.name_entry = tk.Entry(row1_entry, font=('Arial', 9))
         self.name_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.name_entry.bind('<KeyRelease>', self.on_name_typed)
+        
+        # Catalogue matches for the name typed so far; picking one fills in the URL
+        self.suggestion_list = tk.Listbox(main_frame, height=5, font=('Arial', 9),
+                                          bg='#3c3c3c', fg='white', selectbackground='#0078d4')
+        self.suggestion_list.pack(fill=tk.X, pady=(0, 5))
+        self.suggestion_list.bind('<<ListboxSelect>>', self.on_suggestion_selected)
         
         # Row 2: URL label and entry
         row2_label = tk.Frame(main_frame, bg='#2b2b2b')
@@ -1146,6 +1196,26 @@ class AddItemDialog:
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for prices and quantity.")
     
+    def on_name_typed(self, event=None):
+        """Show catalogue matches for the name typed so far"""
+        if self.catalogue is None:
+            return
+        self.suggestions = self.catalogue.search(self.name_entry.get())
+        self.suggestion_list.delete(0, tk.END)
+        for name, item_id in self.suggestions:
+            self.suggestion_list.insert(tk.END, name)
+    
+    def on_suggestion_selected(self, event=None):
+        """Fill in the name and URL of the picked item"""
+        selection = self.suggestion_list.curselection()
+        if not selection:
+            return
+        name, item_id = self.suggestions[selection[0]]
+        self.name_entry.delete(0, tk.END)
+        self.name_entry.insert(0, name)
+        self.url_entry.delete(0, tk.END)
+        self.url_entry.insert(0, item_url(name, item_id))
+    
     def cancel(self):
         self.dialog.destroy()
     
@@ -1287,6 +1357,165 @@ class EditItemDialog:
             webbrowser.open(url)
 
 
+class ExportDialog:
+    """Choose a dataset, file format, date range and items to export"""
+    
+    def __init__(self, parent, dataset, selected_count):
+        self.result = None
+        self.dataset = dataset
+        self.selected_count = selected_count
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Export")
+        self.dialog.geometry("420x300")
+        self.dialog.configure(bg='#2b2b2b')
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        
+        # Center the dialog
+        self.dialog.geometry("+%d+%d" % (parent.winfo_rootx() + 50, parent.winfo_rooty() + 50))
+        
+        self.create_widgets()
+        
+        # Wait for dialog to close
+        self.dialog.wait_window()
+    
+    def create_widgets(self):
+        main_frame = tk.Frame(self.dialog, bg='#2b2b2b')
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        # Dataset and file format
+        choice_frame = tk.Frame(main_frame, bg='#2b2b2b')
+        choice_frame.pack(fill=tk.X, pady=(0, 8))
+        tk.Label(choice_frame, text="Export", fg='white', bg='#2b2b2b', font=('Arial', 9, 'bold')).pack(side=tk.LEFT)
+        self.dataset_var = tk.StringVar(value=self.dataset)
+        ttk.Combobox(choice_frame, textvariable=self.dataset_var, values=list(EXPORT_COLUMNS),
+                     state='readonly', width=14).pack(side=tk.LEFT, padx=5)
+        tk.Label(choice_frame, text="as", fg='white', bg='#2b2b2b', font=('Arial', 9, 'bold')).pack(side=tk.LEFT)
+        self.format_var = tk.StringVar(value=EXPORT_FORMATS[0])
+        ttk.Combobox(choice_frame, textvariable=self.format_var, values=EXPORT_FORMATS,
+                     state='readonly', width=8).pack(side=tk.LEFT, padx=5)
+        
+        # Date range, for transactions and price history
+        tk.Label(main_frame, text="Dates (YYYY-MM-DD, blank for no limit):", fg='white', bg='#2b2b2b',
+                 font=('Arial', 9, 'bold')).pack(anchor='w', pady=(0, 2))
+        range_frame = tk.Frame(main_frame, bg='#2b2b2b')
+        range_frame.pack(fill=tk.X, pady=(0, 8))
+        tk.Label(range_frame, text="From", fg='white', bg='#2b2b2b', font=('Arial', 9)).pack(side=tk.LEFT)
+        self.start_entry = tk.Entry(range_frame, font=('Arial', 9), width=12)
+        self.start_entry.pack(side=tk.LEFT, padx=5)
+        tk.Label(range_frame, text="To", fg='white', bg='#2b2b2b', font=('Arial', 9)).pack(side=tk.LEFT)
+        self.end_entry = tk.Entry(range_frame, font=('Arial', 9), width=12)
+        self.end_entry.pack(side=tk.LEFT, padx=5)
+        
+        # Item filter: the items selected in the prices view
+        self.selected_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(main_frame, text=f"Only the {self.selected_count} selected items",
+                       variable=self.selected_var, fg='white', bg='#2b2b2b', selectcolor='#444444',
+                       activebackground='#2b2b2b', font=('Arial', 9),
+                       state=tk.NORMAL if self.selected_count else tk.DISABLED).pack(anchor='w', pady=(0, 8))
+        
+        # Buttons
+        button_frame = tk.Frame(main_frame, bg='#2b2b2b')
+        button_frame.pack(fill=tk.X, pady=(8, 0))
+        
+        tk.Button(button_frame, text="Export", command=self.export,
+                 bg='#107c10', fg='white', font=('Arial', 9, 'bold'), padx=20).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(button_frame, text="Cancel", command=self.dialog.destroy,
+                 bg='#d13438', fg='white', font=('Arial', 9, 'bold'), padx=20).pack(side=tk.LEFT)
+    
+    def export(self):
+        try:
+            start = parse_export_date(self.start_entry.get())
+            end = parse_export_date(self.end_entry.get(), end_of_day=True)
+        except ValueError:
+            messagebox.showerror("Error", "Please enter dates as YYYY-MM-DD.")
+            return
+        
+        self.result = (self.dataset_var.get(), self.format_var.get(), start, end, self.selected_var.get())
+        self.dialog.destroy()
+
+
+class AlertDialog:
+    """Lists an item's alert rules and adds or removes them in place"""
+    
+    def __init__(self, parent, tracker, item_name):
+        self.tracker = tracker
+        self.item_name = item_name
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(f"Alerts: {item_name}")
+        self.dialog.geometry("550x360")
+        self.dialog.configure(bg='#2b2b2b')
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        
+        # Center the dialog
+        self.dialog.geometry("+%d+%d" % (parent.winfo_rootx() + 50, parent.winfo_rooty() + 50))
+        
+        self.create_widgets()
+        self.refresh_rules()
+        
+        # Wait for dialog to close
+        self.dialog.wait_window()
+    
+    def create_widgets(self):
+        main_frame = tk.Frame(self.dialog, bg='#2b2b2b')
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        # Existing rules; iids are rule ids
+        self.rules_tree = ttk.Treeview(main_frame, columns=('Rule',), show='headings', height=8)
+        self.rules_tree.heading('Rule', text='Rule')
+        self.rules_tree.column('Rule', anchor='w', width=480)
+        self.rules_tree.pack(fill=tk.BOTH, expand=True, pady=(0, 8))
+        
+        # New rule: metric, direction and threshold
+        form_frame = tk.Frame(main_frame, bg='#2b2b2b')
+        form_frame.pack(fill=tk.X, pady=(0, 8))
+        tk.Label(form_frame, text="When", fg='white', bg='#2b2b2b', font=('Arial', 9, 'bold')).pack(side=tk.LEFT)
+        self.metric_var = tk.StringVar(value=ALERT_METRICS[0])
+        ttk.Combobox(form_frame, textvariable=self.metric_var, values=ALERT_METRICS,
+                     state='readonly', width=14).pack(side=tk.LEFT, padx=5)
+        self.direction_var = tk.StringVar(value=ALERT_DIRECTIONS[0])
+        ttk.Combobox(form_frame, textvariable=self.direction_var, values=ALERT_DIRECTIONS,
+                     state='readonly', width=7).pack(side=tk.LEFT, padx=(0, 5))
+        self.threshold_entry = tk.Entry(form_frame, font=('Arial', 9), width=14)
+        self.threshold_entry.pack(side=tk.LEFT)
+        
+        # Buttons
+        button_frame = tk.Frame(main_frame, bg='#2b2b2b')
+        button_frame.pack(fill=tk.X)
+        
+        tk.Button(button_frame, text="Add Alert", command=self.add_rule,
+                 bg='#107c10', fg='white', font=('Arial', 9, 'bold'), padx=20).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(button_frame, text="Remove Selected", command=self.remove_rule,
+                 bg='#d13438', fg='white', font=('Arial', 9, 'bold'), padx=20).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(button_frame, text="Close", command=self.dialog.destroy,
+                 bg='#444444', fg='white', font=('Arial', 9, 'bold'), padx=20).pack(side=tk.LEFT)
+    
+    def refresh_rules(self):
+        self.rules_tree.delete(*self.rules_tree.get_children())
+        for rule in self.tracker.alerts.rules_for(self.item_name):
+            self.rules_tree.insert('', 'end', iid=str(rule['id']), values=(describe_rule(rule),))
+    
+    def add_rule(self):
+        try:
+            threshold = float(self.threshold_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid number for the threshold.")
+            return
+        if self.metric_var.get() == 'price':
+            threshold = int(threshold)
+        self.tracker.add_alert(self.item_name, self.metric_var.get(), self.direction_var.get(), threshold)
+        self.threshold_entry.delete(0, tk.END)
+        self.refresh_rules()
+    
+    def remove_rule(self):
+        for iid in self.rules_tree.selection():
+            self.tracker.remove_alert(int(iid))
+        self.refresh_rules()
+
+
 if __name__ == "__main__":
     app = OSRSPriceTracker()
     app.run()
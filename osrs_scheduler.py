@@ -0,0 +1,105 @@
+import heapq
+import time
+from datetime import datetime
+
+DAY = 86400
+
+# Price movement is measured over this window of recorded history
+VOLATILITY_WINDOW_DAYS = 14
+
+# A group that moved this much (percent, over the window) is refreshed twice as often
+VOLATILITY_REFERENCE_PCT = 5.0
+
+# Cap on how much portfolio value can shorten an interval
+MAX_VALUE_WEIGHT = 10.0
+
+# Never refresh a group more often than this, however hot it is (seconds)
+MIN_INTERVAL = 5 * 60
+
+
+def last_updated_timestamp(item):
+    """Epoch seconds of an item's last_updated, or None if it was never fetched"""
+    try:
+        return datetime.strptime(item.get('last_updated', ''), "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+
+class RefreshScheduler:
+    """Decides which price groups to fetch in an update cycle
+
+    Each group (the items sharing one price lookup) gets a refresh interval
+    that shrinks with recent price movement and with the group's share of
+    portfolio value. A group is due once its interval has passed since its
+    last update. Due groups go through a heap ordered by how overdue they
+    are relative to their own interval, and at most `budget` of them are
+    fetched per cycle (0 means no limit); the rest wait for the next cycle.
+
+    Groups nobody holds whose price has not moved for a full volatility
+    window drop to max_interval.
+    """
+
+    def __init__(self, history=None, base_minutes=60, max_minutes=7 * 24 * 60, budget=0):
+        self.history = history
+        self.base_interval = base_minutes * 60
+        self.max_interval = max(max_minutes * 60, MIN_INTERVAL)
+        self.budget = budget
+
+    def movement(self, key, item, now):
+        """Return (percent price range over the window, True if the window is fully covered)"""
+        if self.history is not None:
+            points = self.history.range(key, now - VOLATILITY_WINDOW_DAYS * DAY, now)
+            if len(points) >= 2:
+                prices = [price for timestamp, price in points]
+                low = min(prices)
+                covered = points[-1][0] - points[0][0] >= (VOLATILITY_WINDOW_DAYS - 1) * DAY
+                if low > 0:
+                    return (max(prices) - low) / low * 100, covered
+        # Without enough history, scale the 1 month change to the window
+        change_1m = abs(item.get('change_1m', 0) or 0)
+        return change_1m * VOLATILITY_WINDOW_DAYS / 30, False
+
+    def interval(self, key, group_items, now, average_value):
+        """Refresh interval in seconds for one price group"""
+        item = group_items[0]
+        movement, covered = self.movement(key, item, now)
+        quantity = sum(member.get('quantity', 0) for member in group_items)
+        if quantity <= 0 and movement == 0 and covered:
+            return self.max_interval
+
+        value = sum(member.get('current_price', 0) * member.get('quantity', 0) for member in group_items)
+        value_weight = min(value / average_value, MAX_VALUE_WEIGHT) if average_value > 0 else 0
+        interval = self.base_interval / (1 + movement / VOLATILITY_REFERENCE_PCT + value_weight)
+        return min(max(interval, MIN_INTERVAL), self.max_interval)
+
+    def plan(self, items, groups, keys, now=None):
+        """Return the indices of the groups to fetch now, most overdue first
+
+        groups is a list of item index lists and keys their price keys.
+        """
+        if now is None:
+            now = time.time()
+        values = [item.get('current_price', 0) * item.get('quantity', 0) for item in items]
+        held = [value for value in values if value > 0]
+        average_value = sum(held) / len(held) if held else 0
+
+        heap = []
+        for group_index, indices in enumerate(groups):
+            group_items = [items[i] for i in indices]
+            timestamps = [last_updated_timestamp(member) for member in group_items]
+            if any(timestamp is None or member.get('current_price', 0) <= 0
+                   for timestamp, member in zip(timestamps, group_items)):
+                # Never fetched (or failed last time): due before anything else
+                heap.append((float('-inf'), group_index))
+                continue
+            elapsed = now - min(timestamps)
+            if elapsed < MIN_INTERVAL:
+                continue  # cannot be due yet; skip reading its history
+            interval = self.interval(keys[group_index], group_items, now, average_value)
+            lateness = elapsed / interval
+            if lateness >= 1:
+                heap.append((-lateness, group_index))
+
+        heapq.heapify(heap)
+        limit = self.budget if self.budget > 0 else len(heap)
+        return [heapq.heappop(heap)[1] for _ in range(min(limit, len(heap)))]
@@ -0,0 +1,83 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(*parts):
+    """Return a file under tests/fixtures as text"""
+    with open(os.path.join(FIXTURES_DIR, *parts), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture
+def fixture_text():
+    return read_fixture
+
+
+class StubServer:
+    """Local keep-alive HTTP server answering GETs from a route table
+
+    routes maps a request path (with its query string) to a
+    (status, headers, body) tuple, or to a function taking the request
+    headers and returning one. Unknown paths get a 404. Every request is
+    logged as (path, headers), and accepted connections are counted.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests.append((self.path, dict(self.headers)))
+                route = stub.routes.get(self.path, (404, {}, b'not found'))
+                status, headers, body = route(self.headers) if callable(route) else route
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def url(self, path=''):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def paths(self):
+        with self.lock:
+            return [path for path, headers in self.requests]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
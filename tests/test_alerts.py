@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from osrs_alerts import ALERT_METRICS, AlertEngine, describe_rule, metric_values
+from osrs_core import PriceTracker
+
+
+def rule(threshold, direction='above', metric='price', item_name='Abyssal whip'):
+    return {'item_name': item_name, 'metric': metric, 'direction': direction, 'threshold': threshold}
+
+
+def fired_thresholds(engine, item_name, old, new, metric='price'):
+    return sorted(rule['threshold'] for rule, value in engine.check(item_name, {metric: old}, {metric: new}))
+
+
+def test_rules_fire_only_when_the_value_crosses_them():
+    engine = AlertEngine([rule(100), rule(200), rule(300), rule(150, 'below'), rule(50, 'below')])
+
+    assert fired_thresholds(engine, 'Abyssal whip', 90, 200) == [100, 200]
+    # Staying past a threshold does not fire it again
+    assert fired_thresholds(engine, 'Abyssal whip', 200, 250) == []
+    assert fired_thresholds(engine, 'Abyssal whip', 250, 150) == [150]
+    assert fired_thresholds(engine, 'Abyssal whip', 150, 40) == [50]
+    assert fired_thresholds(engine, 'Abyssal whip', 40, 40) == []
+    assert fired_thresholds(engine, 'Abyssal whip', 40, 1000) == [100, 200, 300]
+    assert fired_thresholds(engine, 'Twisted bow', 90, 1000) == []
+
+
+def test_first_value_fires_every_rule_it_satisfies():
+    engine = AlertEngine([rule(100), rule(200), rule(150, 'below'), rule(120, 'below')])
+    assert fired_thresholds(engine, 'Abyssal whip', None, 150) == [100, 150]
+    assert fired_thresholds(engine, 'Abyssal whip', 150, None) == []
+
+
+def test_metrics_are_checked_separately():
+    engine = AlertEngine([rule(5.0, metric='change_percent'), rule(-3.0, 'below', metric='change_1m')])
+    item = {'current_price': 1100, 'reference_price': 1000, 'change_1m': -4.0}
+
+    fired = engine.check('Abyssal whip', {'price': 1000, 'change_percent': 0.0, 'change_1m': 0.0},
+                         metric_values(item))
+
+    assert sorted((rule['metric'], value) for rule, value in fired) == \
+        [('change_1m', -4.0), ('change_percent', pytest.approx(10.0))]
+    assert metric_values({'current_price': 0, 'reference_price': 1000}) == dict.fromkeys(ALERT_METRICS)
+
+
+def test_add_and_remove_rules():
+    engine = AlertEngine()
+    first = engine.add(rule(100))
+    second = engine.add(rule(100))
+    assert (first['id'], second['id']) == (1, 2)
+    assert engine.remove(first['id']) is first
+    assert engine.remove(first['id']) is None
+    assert [rule for rule, value in engine.check('Abyssal whip', {'price': 0}, {'price': 100})] == [second]
+    assert describe_rule(second) == 'Abyssal whip price above 100'
+
+    with pytest.raises(ValueError):
+        engine.add(rule(100, direction='sideways'))
+    with pytest.raises(ValueError):
+        engine.add(rule(100, metric='volume'))
+    # Loaded rules keep their ids, and new ones are numbered after them
+    assert AlertEngine([dict(second)]).add(rule(5))['id'] == 3
+
+
+def crosses(rule, old, new):
+    """Whether a move from old to new crosses a rule, checked directly"""
+    threshold = rule['threshold']
+    if rule['direction'] == 'above':
+        return new >= threshold and (old is None or old < threshold)
+    return new <= threshold and (old is None or old > threshold)
+
+
+def test_index_agrees_with_checking_every_rule():
+    rng = random.Random(7)
+    rules = [rule(rng.randint(0, 100), rng.choice(('above', 'below')), item_name=rng.choice('ab'))
+             for _ in range(500)]
+    engine = AlertEngine(dict(rule) for rule in rules)
+
+    for _ in range(200):
+        item_name = rng.choice('ab')
+        old = rng.choice((None, rng.randint(0, 100)))
+        new = rng.randint(0, 100)
+        expected = sorted(rule['threshold'] for rule in rules
+                          if rule['item_name'] == item_name and crosses(rule, old, new))
+        assert fired_thresholds(engine, item_name, old, new) == expected
+
+
+def test_tracker_alerts_when_a_price_is_applied(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    messages = []
+    tracker = PriceTracker(on_alert=messages.append)
+    item = tracker.data['items'][0]
+    item['current_price'] = 1000
+    tracker.add_alert(item['name'], 'price', 'above', 1500)
+
+    tracker.apply_price_result(item, (1400, 0, 0, 0))
+    tracker.apply_price_result(item, (1600, 0, 0, 0))
+    tracker.apply_price_result(item, (1700, 0, 0, 0))
+    tracker.close()
+
+    assert messages == [f"Alert: {item['name']} price above 1,500 (now 1,600 gp)"]
+    # Rules are saved with the settings
+    tracker = PriceTracker()
+    assert [rule['threshold'] for rule in tracker.alerts.to_list()] == [1500]
+    tracker.close()
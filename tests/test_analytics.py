@@ -0,0 +1,83 @@
+import random
+import time
+from array import array
+
+import pytest
+
+import osrs_analytics
+from osrs_analytics import SERIES_DAYS, PortfolioAnalytics, daily_close_matrix, daily_closes
+from osrs_core import price_key
+from osrs_history import DAY, PriceHistoryStore
+from osrs_items import ItemTable
+
+from benchmarks.synthetic import fill_history, make_items
+
+
+def test_daily_close_matrix_matches_daily_closes():
+    pytest.importorskip('numpy')
+    rng = random.Random(1)
+    start = 1000 * DAY
+    columns = []
+    for _ in range(50):
+        # Gaps, several points a day and series starting mid-window
+        timestamps = sorted(rng.randrange(start, start + SERIES_DAYS * DAY) for _ in range(rng.randint(1, 800)))
+        columns.append((array('q', timestamps), array('q', [rng.randint(1, 10 ** 6) for _ in timestamps])))
+
+    matrix = daily_close_matrix(columns, start)
+
+    for row, (timestamps, prices) in enumerate(columns):
+        assert matrix[row].tolist() == list(daily_closes(timestamps, prices, start))
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_incremental_updates_match_a_cold_build(tmp_path, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(osrs_analytics, 'np', None)
+    now = time.time()
+    items = ItemTable(make_items(40, priced=1.0, held=0.8))
+    history = PriceHistoryStore(str(tmp_path))
+    keys = [price_key(url) for url in items.columns['url']]
+    fill_history(history, keys[:30], 90, now=now)
+    analytics = PortfolioAnalytics(history, price_key)
+    first = analytics.compute(items, now)
+
+    history.append(keys[3], 5, now)
+    history.append(keys[35], 7, now)
+    items[5]['quantity'] += 10
+    result = analytics.compute(items, now)
+
+    assert result['series'][-1] != first['series'][-1]
+    assert result == PortfolioAnalytics(history, price_key).compute(items, now)
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_day_rollover_matches_a_cold_build(tmp_path, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(osrs_analytics, 'np', None)
+    now = 1000 * DAY + DAY // 2
+    items = ItemTable(make_items(40, priced=1.0, held=0.8))
+    history = PriceHistoryStore(str(tmp_path))
+    keys = [price_key(url) for url in items.columns['url']]
+    # Older than the window, so the rolled over days must carry the earlier closes
+    fill_history(history, keys[:20], SERIES_DAYS + 30, now=now)
+    for position, key in enumerate(keys[20:30]):
+        # A point a week, so the window opens between two of them
+        history.extend(key, [(now - day * DAY, 1000 + position + day) for day in range(SERIES_DAYS + 30 - position, 0, -7)])
+    # Only on the window's first day, and only after its last day
+    history.append(keys[30], 50, now - (SERIES_DAYS - 1) * DAY)
+    history.extend(keys[31], [(now - DAY, 60), (now + 2 * DAY, 70)])
+    for position in (3, 30, 31):
+        items[position]['quantity'] = 5
+    analytics = PortfolioAnalytics(history, price_key)
+    analytics.compute(items, now)
+
+    reads = []
+    range_columns = history.range_columns
+    monkeypatch.setattr(history, 'range_columns', lambda key, *args: reads.append(key) or range_columns(key, *args))
+    history.append(keys[3], 5, now + DAY)
+    for later in (now + DAY, now + 3 * DAY, now + (SERIES_DAYS + 5) * DAY):
+        del reads[:]
+        result = analytics.compute(items, later)
+        if later == now + DAY:
+            assert sorted(reads) == sorted([keys[3], keys[30], keys[31]])
+        assert result == PortfolioAnalytics(history, price_key).compute(items, later)
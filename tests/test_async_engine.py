@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from osrs_core import AsyncUpdateEngine, DEFAULT_SETTINGS, PriceTracker, ResponseCache, create_price_source
+
+from conftest import read_fixture
+
+pytest.importorskip('aiohttp')
+
+DETAIL = '/api/catalogue/detail.json?item=4151'
+GRAPH = '/api/graph/4151.json'
+PAGE = '/Abyssal+whip/viewitem?obj=4151'
+WHIP = (1612000, 1.0, -2.0, 7.0)
+
+
+def serve_item(stub_server):
+    """Serve the whip with ETags, answering 304 to a matching If-None-Match"""
+    def route(content_type, body):
+        def respond(headers):
+            if headers.get('If-None-Match') == '"v1"':
+                return 304, {'ETag': '"v1"'}, b''
+            return 200, {'Content-Type': content_type, 'ETag': '"v1"'}, body
+        return respond
+    stub_server.routes[DETAIL] = route('application/json', read_fixture('itemdb', 'detail_4151.json'))
+    stub_server.routes[GRAPH] = route('application/json', read_fixture('itemdb', 'graph_4151.json'))
+    stub_server.routes[PAGE] = route('text/html', read_fixture('pages', 'abyssal_whip.html'))
+
+
+@pytest.mark.parametrize('price_source', ['api', 'html'])
+def test_async_engine_uses_price_source_and_cache(stub_server, tmp_path, price_source):
+    serve_item(stub_server)
+    cache = ResponseCache(str(tmp_path / 'cache.json'))
+    source = create_price_source(None, dict(DEFAULT_SETTINGS, price_source=price_source), cache)
+    if price_source == 'api':
+        source.sources[0].base_url = stub_server.url()
+    expected_paths = [DETAIL, GRAPH] if price_source == 'api' else [PAGE]
+
+    assert AsyncUpdateEngine(source).run([stub_server.url(PAGE)]) == {0: WHIP}
+    assert stub_server.paths() == expected_paths
+    assert cache.get_stats()['misses'] == len(expected_paths)
+
+    assert AsyncUpdateEngine(source).run([stub_server.url(PAGE)]) == {0: WHIP}
+    assert [headers.get('If-None-Match') for path, headers in stub_server.requests[len(expected_paths):]] == \
+        ['"v1"'] * len(expected_paths)
+    assert cache.get_stats()['revalidated'] == len(expected_paths)
+
+
+def test_async_update_saves_validators(stub_server, tmp_path, monkeypatch):
+    serve_item(stub_server)
+    monkeypatch.chdir(tmp_path)
+    settings = dict(DEFAULT_SETTINGS, update_engine='async', cache_ttl_minutes=0)
+    item = {'name': 'Abyssal whip', 'url': stub_server.url(PAGE), 'reference_price': 0, 'buy_price': 0,
+            'sell_price': 0, 'quantity': 1, 'current_price': 0, 'change_1m': 0, 'change_3m': 0,
+            'change_6m': 0, 'last_updated': ''}
+    with open('osrs_tracker_data.json', 'w') as f:
+        json.dump({'items': [item], 'transactions': [], 'settings': settings}, f)
+
+    tracker = PriceTracker()
+    tracker.price_source.sources[0].base_url = stub_server.url()
+    results = []
+    message = tracker.fetch_prices(list(tracker.data['items']), lambda item, result: results.append(result))
+    assert 'cache: 0 hit, 0 revalidated, 2 miss' in message
+    assert results == [WHIP]
+    # Saved by the update itself, as the GUI only flushes the cache on exit
+    assert os.path.exists('osrs_http_cache.json')
+    tracker.close()
+
+    # A new tracker revalidates from the saved cache instead of refetching
+    tracker = PriceTracker()
+    tracker.price_source.sources[0].base_url = stub_server.url()
+    assert 'cache: 0 hit, 2 revalidated, 0 miss' in tracker.update_all_prices()
+    tracker.close()
+
+
+@pytest.mark.parametrize('engine', ['thread', 'async'])
+@pytest.mark.parametrize('fresh, coalesced', [(False, 1), (True, 0)])
+def test_only_fetched_duplicates_count_as_coalesced(stub_server, tmp_path, monkeypatch, engine, fresh, coalesced):
+    serve_item(stub_server)
+    monkeypatch.chdir(tmp_path)
+    settings = dict(DEFAULT_SETTINGS, update_engine=engine, price_source='html', cache_ttl_minutes=60)
+    last_updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if fresh else ''
+    item = {'name': 'Abyssal whip', 'url': stub_server.url(PAGE), 'reference_price': 0, 'buy_price': 0,
+            'sell_price': 0, 'quantity': 1, 'current_price': 1600000, 'change_1m': 0, 'change_3m': 0,
+            'change_6m': 0, 'last_updated': last_updated}
+    with open('osrs_tracker_data.json', 'w') as f:
+        json.dump({'items': [item, dict(item, name='Abyssal whip (alt)')], 'transactions': [],
+                   'settings': settings}, f)
+
+    tracker = PriceTracker()
+    message = tracker.fetch_prices(list(tracker.data['items']), lambda item, result: None)
+    tracker.close()
+    # Two items share one price; when the TTL skips it nothing was merged into a fetch
+    assert f'{coalesced} coalesced' in message
+    assert len(stub_server.paths()) == (0 if fresh else 1)
+
+
+def test_waiters_get_their_price_before_the_async_pass_ends(stub_server, tmp_path, monkeypatch):
+    page = read_fixture('pages', 'abyssal_whip.html')
+    release = threading.Event()
+
+    def whip(headers):
+        # Answer once the waiter below has joined this fetch
+        deadline = time.monotonic() + 3
+        while tracker.in_flight.get_stats()['coalesced'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return 200, {'Content-Type': 'text/html'}, page
+
+    def slow(headers):
+        release.wait(5)
+        return 200, {'Content-Type': 'text/html'}, page
+    slow_page = '/Slow+item/viewitem?obj=1'
+    stub_server.routes[PAGE] = whip
+    stub_server.routes[slow_page] = slow
+    monkeypatch.chdir(tmp_path)
+    settings = dict(DEFAULT_SETTINGS, update_engine='async', price_source='html', cache_ttl_minutes=0)
+    item = {'name': 'Abyssal whip', 'url': stub_server.url(PAGE), 'reference_price': 0, 'buy_price': 0,
+            'sell_price': 0, 'quantity': 1, 'current_price': 0, 'change_1m': 0, 'change_3m': 0,
+            'change_6m': 0, 'last_updated': ''}
+    with open('osrs_tracker_data.json', 'w') as f:
+        json.dump({'items': [item, dict(item, name='Slow item', url=stub_server.url(slow_page))],
+                   'transactions': [], 'settings': settings}, f)
+
+    tracker = PriceTracker()
+    results = []
+    update = threading.Thread(target=tracker.fetch_prices,
+                              args=(list(tracker.data['items']), lambda item, result: results.append(result)))
+    update.start()
+    try:
+        while PAGE not in stub_server.paths():
+            time.sleep(0.01)
+        # "Update Selected" on the whip while the pass still waits on the slow item
+        waiter_results = []
+        waiter = threading.Thread(target=lambda: waiter_results.append(tracker.scrape_price(item['url'])))
+        waiter.start()
+        waiter.join(3)
+        assert waiter_results == [WHIP]
+        assert update.is_alive()
+    finally:
+        release.set()
+        update.join()
+        tracker.close()
+    assert results == [WHIP, WHIP]
+    assert stub_server.paths().count(PAGE) == 1
+    assert tracker.in_flight.get_stats()['coalesced'] == 1
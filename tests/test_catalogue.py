@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+
+from osrs_catalogue import ItemCatalogue, read_import_rows, save_catalogue
+from osrs_core import PriceTracker
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'osrs_cli.py')
+
+CATALOGUE = ItemCatalogue([
+    ('Dragon pickaxe', 11920), ('Dragon dagger', 1215), ('Dragon bones', 536), ('Rune pickaxe', 1275),
+    ('Abyssal whip', 4151), ('Abyssal dagger', 13265), ("Zulrah's scales", 12934), ('Pickaxe handle', 466)
+])
+
+
+def names(results):
+    return [name for name, item_id in results]
+
+
+def test_search_puts_name_prefixes_first():
+    assert names(CATALOGUE.search('dragon')) == ['Dragon bones', 'Dragon dagger', 'Dragon pickaxe']
+    # Then names with a word starting with the query
+    assert names(CATALOGUE.search('pick')) == ['Pickaxe handle', 'Dragon pickaxe', 'Rune pickaxe']
+    assert names(CATALOGUE.search('dra pick')) == ['Dragon pickaxe']
+    assert names(CATALOGUE.search('  DAGGER ')) == ['Abyssal dagger', 'Dragon dagger']
+    assert names(CATALOGUE.search("zulrah's")) == ["Zulrah's scales"]
+    assert names(CATALOGUE.search('dragon', limit=2)) == ['Dragon bones', 'Dragon dagger']
+    assert CATALOGUE.search('') == []
+    assert CATALOGUE.search('crystal') == []
+
+
+def test_lookup_ignores_case():
+    assert CATALOGUE.lookup(' abyssal WHIP ') == ('Abyssal whip', 4151)
+    assert CATALOGUE.lookup('Abyssal') is None
+    assert len(ItemCatalogue([('Abyssal whip', 4151), ('abyssal whip', 1)])) == 1
+
+
+def test_read_import_rows_formats():
+    assert read_import_rows(['Abyssal whip\n', '\n', '# a comment, with commas\n', 'Dragon bones,"1,000",250\n']) == \
+        ([{'name': 'Abyssal whip'}, {'name': 'Dragon bones', 'quantity': 1000, 'reference_price': 250}], [])
+    assert read_import_rows(['Item Name,Buy Price,Notes,Qty\n', 'Abyssal whip,1.5e6,keep,2\n']) == \
+        ([{'name': 'Abyssal whip', 'buy_price': 1500000, 'quantity': 2}], [])
+
+
+def test_read_import_rows_reports_rows_that_are_not_numbers():
+    lines = ['name,quantity,sell price\n', '# held\n', 'Abyssal whip,2,\n', 'Dragon bones,lots,100\n',
+             'Rune pickaxe,1,1.2m\n', 'Dragon dagger\n']
+
+    entries, invalid = read_import_rows(lines)
+
+    assert entries == [{'name': 'Abyssal whip', 'quantity': 2}, {'name': 'Dragon dagger'}]
+    assert invalid == [(4, "quantity 'lots' is not a number"), (5, "sell_price '1.2m' is not a number")]
+
+
+def test_import_items_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_catalogue('osrs_item_catalogue.json', CATALOGUE)
+    (tmp_path / 'items.csv').write_text('dragon pickaxe\nrune PICKAXE,3\nCrystal bow\nDragon bones,x\n'
+                                        'Rune pickaxe,1\n', encoding='utf-8')
+    tracker = PriceTracker()
+    tracked = len(tracker.data['items'])
+
+    added, skipped, unknown, invalid = tracker.import_items_file('items.csv')
+
+    assert added == ['Rune pickaxe']
+    assert tracker.data['items'][-1]['quantity'] == 3
+    assert tracker.data['items'][-1]['url'].endswith('viewitem?obj=1275')
+    # Already tracked (as 'Dragon Pickaxe'), or imported earlier in the file
+    assert skipped == ['dragon pickaxe', 'Rune pickaxe']
+    assert unknown == ['Crystal bow']
+    assert invalid == [(4, "quantity 'x' is not a number")]
+    assert len(tracker.data['items']) == tracked + 1
+    tracker.close()
+
+
+def test_cli_import_reports_invalid_rows(tmp_path):
+    save_catalogue(str(tmp_path / 'osrs_item_catalogue.json'), CATALOGUE)
+    (tmp_path / 'items.csv').write_text('Dragon dagger,ten\nDragon bones,5\n', encoding='utf-8')
+
+    output = subprocess.run([sys.executable, CLI, '--data-dir', str(tmp_path), 'import',
+                             str(tmp_path / 'items.csv')], capture_output=True, text=True, check=True).stdout
+
+    assert 'Imported 1 items (0 already tracked, 0 unknown, 1 invalid)' in output
+    assert "Skipped line 1: quantity 'ten' is not a number" in output
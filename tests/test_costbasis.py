@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from osrs_costbasis import COST_BASIS_METHODS, position_pnl, recompute, replay
+
+POSITION_FIELDS = ('quantity', 'cost_basis', 'cost_of_sold', 'proceeds')
+
+
+def trans(kind, quantity, price, item_name='Whip'):
+    return {'item_name': item_name, 'type': kind, 'quantity': quantity, 'price_per_unit': price}
+
+
+def random_ledger(rng, count, items=5):
+    """Buys, sells (oversells included), zero quantities and non-trades over a few items"""
+    ledger = []
+    for _ in range(count):
+        kind = rng.choices(['BUY', 'SELL', 'PRICE_UPDATE'], weights=[5, 4, 1])[0]
+        quantity = rng.choice([0, rng.randint(1, 50), rng.randint(1, 500)])
+        ledger.append(trans(kind, quantity, rng.randint(1, 10000), f'Item {rng.randrange(items)}'))
+    return ledger
+
+
+def summary(positions):
+    return {name: tuple(position[field] for field in POSITION_FIELDS) + (list(map(list, position['lots'])),)
+            for name, position in positions.items()}
+
+
+PARTIAL = [trans('BUY', 10, 100), trans('BUY', 10, 200), trans('SELL', 15, 300)]
+
+
+@pytest.mark.parametrize('method, cost_of_sold, cost_basis, lots', [
+    ('fifo', 10 * 100 + 5 * 200, 5 * 200, [[5, 200]]),
+    ('lifo', 10 * 200 + 5 * 100, 5 * 100, [[5, 100]]),
+    ('average', 15 * 150, 5 * 150, []),
+])
+def test_partial_lot_sell(method, cost_of_sold, cost_basis, lots):
+    position = replay(PARTIAL, method)['Whip']
+    assert position['quantity'] == 5
+    assert position['cost_of_sold'] == cost_of_sold
+    assert position['cost_basis'] == cost_basis
+    assert position['proceeds'] == 15 * 300
+    assert list(map(list, position['lots'])) == lots
+
+
+@pytest.mark.parametrize('method', COST_BASIS_METHODS)
+def test_oversell_only_sells_what_is_held(method):
+    ledger = [trans('SELL', 3, 50), trans('BUY', 5, 10), trans('SELL', 8, 20), trans('BUY', 2, 30)]
+    position = replay(ledger, method)['Whip']
+    assert position['proceeds'] == 5 * 20
+    assert position['cost_of_sold'] == 5 * 10
+    assert position['quantity'] == 2
+    assert position['cost_basis'] == 2 * 30
+    if method != 'average':
+        assert list(map(list, position['lots'])) == [[2, 30]]
+
+
+@pytest.mark.parametrize('method, realized, unrealized', [
+    ('fifo', 4500 - 2000, 5 * 400 - 1000),
+    ('lifo', 4500 - 2500, 5 * 400 - 500),
+    ('average', 4500 - 2250, 5 * 400 - 750),
+])
+def test_position_pnl(method, realized, unrealized):
+    position = replay(PARTIAL, method)['Whip']
+
+    pnl = position_pnl(position, 400)
+    assert pnl['realized_gain'] == realized
+    assert pnl['unrealized_gain'] == unrealized
+    assert pnl['market_value'] == 5 * 400
+
+    # An open holding without a market price cannot be valued
+    assert position_pnl(position, None)['unrealized_gain'] is None
+    assert position_pnl(position, 0)['market_value'] == 0
+
+
+@pytest.mark.parametrize('method', COST_BASIS_METHODS)
+def test_closed_position_pnl(method):
+    position = replay([trans('BUY', 4, 10), trans('SELL', 4, 15)], method)['Whip']
+    pnl = position_pnl(position, None)
+    assert pnl == {'quantity': 0, 'cost_basis': 0, 'cost_of_sold': 40, 'proceeds': 60,
+                   'realized_gain': 20, 'market_value': 0, 'unrealized_gain': 0}
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_numpy_fifo_matches_replay(seed):
+    pytest.importorskip('numpy')
+    from osrs_costbasis import _recompute_fifo_numpy
+
+    rng = random.Random(seed)
+    ledger = random_ledger(rng, rng.choice([1, 10, 200, 3000]), items=rng.choice([1, 5, 50]))
+    assert summary(_recompute_fifo_numpy(ledger)) == summary(replay(ledger, 'fifo'))
+
+
+@pytest.mark.parametrize('method', COST_BASIS_METHODS)
+def test_recompute_matches_replay_on_large_ledgers(method):
+    ledger = random_ledger(random.Random(99), 5000)
+    assert summary(recompute(ledger, method)) == summary(replay(ledger, method))
@@ -0,0 +1,105 @@
+import csv
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from osrs_core import PriceTracker, price_key
+from osrs_export import (EXPORT_DATE_FORMAT, TimestampFormatter, format_for_path, parse_export_date,
+                         write_export)
+
+COLUMNS = ('Item', 'Price', 'Change %')
+# The second chunk has no change at all, so pyarrow types that column as null
+ROWS = [('Abyssal whip', 1612000, 1.5), ('Dragon bones', 2500, -0.5), ('Bond', 6000000, None),
+        ('Rune pickaxe', 12000, None)]
+
+
+def read_back(path, fmt):
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            return [tuple(row) for row in csv.reader(f)]
+    if fmt == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+    pa = pytest.importorskip('pyarrow')
+    if fmt == 'parquet':
+        table = pytest.importorskip('pyarrow.parquet').read_table(path)
+    else:
+        with pa.OSFile(path, 'rb') as f:
+            table = pa.ipc.open_file(f).read_all()
+    return table
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_arrow_formats_cast_later_chunks_to_the_first_schema(tmp_path, fmt):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'prices.{fmt}')
+
+    assert write_export(path, COLUMNS, iter(ROWS), chunk_rows=2) == 4
+
+    table = read_back(path, fmt)
+    assert table.column_names == list(COLUMNS)
+    assert str(table.schema.field('Change %').type) == 'double'
+    assert table.column('Change %').to_pylist() == [1.5, -0.5, None, None]
+    assert table.column('Price').to_pylist() == [1612000, 2500, 6000000, 12000]
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_arrow_formats_write_the_columns_when_empty(tmp_path, fmt):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'prices.{fmt}')
+
+    assert write_export(path, COLUMNS, []) == 0
+
+    table = read_back(path, fmt)
+    assert table.column_names == list(COLUMNS)
+    assert table.num_rows == 0
+
+
+def test_text_formats(tmp_path):
+    progress = []
+    assert write_export(str(tmp_path / 'prices.csv'), COLUMNS, ROWS, chunk_rows=3, progress=progress.append) == 4
+    assert progress == [3, 4]
+    assert read_back(str(tmp_path / 'prices.csv'), 'csv') == \
+        [COLUMNS] + [tuple('' if value is None else str(value) for value in row) for row in ROWS]
+
+    write_export(str(tmp_path / 'prices.ndjson'), COLUMNS, ROWS)
+    assert read_back(str(tmp_path / 'prices.ndjson'), 'jsonl') == [dict(zip(COLUMNS, row)) for row in ROWS]
+
+
+def test_format_and_date_parsing():
+    assert format_for_path('a/b.PARQUET') == 'parquet'
+    assert format_for_path('b.feather') == 'arrow'
+    assert format_for_path('b.txt') == 'csv'
+    assert parse_export_date(' ') is None
+    assert parse_export_date('2026-01-02', end_of_day=True) == datetime(2026, 1, 2, 23, 59, 59)
+    assert parse_export_date('2026-01-02 03:04:05', end_of_day=True) == datetime(2026, 1, 2, 3, 4, 5)
+    with pytest.raises(ValueError):
+        parse_export_date('02/01/2026')
+
+
+def test_timestamp_formatter_matches_strftime():
+    formatter = TimestampFormatter()
+    start = int(time.time()) - 3 * 86400
+    for timestamp in list(range(start, start + 7200, 61)) + [0, 86399, start + 12345]:
+        assert formatter(timestamp) == time.strftime(EXPORT_DATE_FORMAT, time.localtime(timestamp))
+
+
+def test_tracker_exports_price_history_in_a_date_range(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = PriceTracker()
+    item = tracker.data['items'][0]
+    key = price_key(item['url'])
+    day = datetime(2026, 3, 1, 12)
+    for offset in range(5):
+        tracker.history.append(key, 100 + offset, (day + timedelta(days=offset)).timestamp())
+
+    written = tracker.export('price_history', 'history.jsonl', start=parse_export_date('2026-03-02'),
+                             end=parse_export_date('2026-03-03', end_of_day=True), item_names=[item['name']])
+    tracker.close()
+
+    assert written == 2
+    assert read_back('history.jsonl', 'jsonl') == [
+        {'Date': '2026-03-02 12:00:00', 'Item': item['name'], 'Price': 101},
+        {'Date': '2026-03-03 12:00:00', 'Item': item['name'], 'Price': 102}]
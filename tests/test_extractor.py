@@ -0,0 +1,76 @@
+import os
+import re
+
+import pytest
+
+from osrs_extractor import ItemPageExtractor, extract_item_page
+
+from conftest import FIXTURES_DIR, read_fixture
+
+PAGES = sorted(name for name in os.listdir(os.path.join(FIXTURES_DIR, 'pages')) if name.endswith('.html'))
+
+
+def cascade_scrape(html):
+    """The regex cascade scrape_price used before the single-pass extractor"""
+    if len(html) < 100:
+        return None, 0, 0, 0
+
+    price = None
+    price_patterns = [
+        r'<h3[^>]*>Current Guide Price[^<]*<span[^>]*title\s*=\s*["\']([0-9,]+)["\'][^>]*>',
+        r'Current Guide Price.*?<span[^>]*title\s*=\s*["\']([0-9,]+)["\']',
+        r'<span[^>]*title\s*=\s*["\']([0-9,]+)["\'][^>]*>[^<]*</span>',
+        r'title\s*=\s*["\']([0-9,]+)["\']'
+    ]
+    for pattern in price_patterns:
+        match = re.search(pattern, html, re.IGNORECASE)
+        if match:
+            price_str = match.group(1).replace(',', '')
+            if price_str.isdigit():
+                price = int(price_str)
+                break
+
+    changes = [0, 0, 0]
+    matches = re.findall(r'<span class=["\']stats__pc-change["\']>\s*([-+]?\s*\d+)\s*%?\s*</span>', html)
+    if len(matches) >= 4:
+        try:
+            for i in range(3):
+                changes[i] = float(matches[i + 1].replace(' ', '').replace('%', ''))
+        except ValueError:
+            changes = [0, 0, 0]
+
+    return price, changes[0], changes[1], changes[2]
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_matches_cascade(name):
+    html = read_fixture('pages', name)
+    assert extract_item_page(html) == cascade_scrape(html)
+
+
+@pytest.mark.parametrize('name', PAGES)
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1000])
+def test_chunked_feed_matches_whole_page(name, chunk_size):
+    html = read_fixture('pages', name)
+    extractor = ItemPageExtractor()
+    for start in range(0, len(html), chunk_size):
+        if extractor.feed(html[start:start + chunk_size]):
+            break
+    assert extractor.result() == extract_item_page(html)
+
+
+def test_expected_values():
+    assert extract_item_page(read_fixture('pages', 'abyssal_whip.html')) == (1612000, 1.0, -2.0, 7.0)
+    assert extract_item_page(read_fixture('pages', 'uppercase_tags.html')) == (2301, -3.0, 5.0, -8.0)
+    assert extract_item_page(read_fixture('pages', 'price_after_badge.html'))[0] == 187
+    assert extract_item_page(read_fixture('pages', 'missing_changes.html')) == (4, 0, 0, 0)
+    assert extract_item_page(read_fixture('pages', 'not_found.html')) == (None, 0, 0, 0)
+
+
+def test_done_once_every_field_is_found():
+    html = read_fixture('pages', 'abyssal_whip.html')
+    end = html.index('</div>', html.index('class="stats"'))
+    extractor = ItemPageExtractor()
+    assert extractor.feed(html[:end])
+    assert extractor.chars_read == end
+    assert not ItemPageExtractor().feed(html[:html.index('6 Month Change')])
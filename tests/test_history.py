@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import time
+from array import array
+
+import pytest
+
+import osrs_history
+from osrs_core import PriceTracker, SqliteStorage, no_timer
+from osrs_history import DAY, PriceHistoryStore
+
+URL = 'https://secure.runescape.com/m=itemdb_oldschool/Abyssal+whip/viewitem?obj=4151'
+
+
+def test_range_and_latest(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    for day in range(10):
+        store.append('4151', 100 + day, 1000 + day * DAY)
+
+    assert store.count('4151') == 10
+    assert store.latest('4151') == (1000 + 9 * DAY, 109)
+    assert store.range('4151', 1000 + 2 * DAY, 1000 + 4 * DAY) == \
+        [(1000 + day * DAY, 100 + day) for day in (2, 3, 4)]
+    assert list(store.iter_range('4151', chunk_size=3)) == store.range('4151')
+    assert store.range('missing') == []
+
+
+def test_compact_thins_and_drops_old_points(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    now = 100 * DAY
+    for hour in range(0, 60 * 24, 6):
+        store.append('key', hour, now - 60 * DAY + hour * 3600)
+
+    removed = store.compact('key', retention_days=50, daily_after_days=10, now=now)
+
+    points = store.range('key')
+    assert removed == 240 - len(points)
+    assert points[0][0] >= now - 50 * DAY
+    old = [timestamp for timestamp, price in points if timestamp < now - 10 * DAY]
+    assert len(old) == len({timestamp // DAY for timestamp in old})
+    assert store.compacted_at() is None
+
+
+@pytest.mark.parametrize('crash_at', [1, 2])
+def test_interrupted_compaction_leaves_whole_rows(tmp_path, monkeypatch, crash_at):
+    store = PriceHistoryStore(str(tmp_path))
+    points = [(day * DAY + hour * 3600, day * 100 + hour) for day in range(5) for hour in range(24)]
+    store.extend('key', points)
+    replace = os.replace
+    calls = []
+
+    def crash(source, target):
+        calls.append(target)
+        if len(calls) == crash_at:
+            raise OSError("power lost")
+        replace(source, target)
+    monkeypatch.setattr(osrs_history.os, 'replace', crash)
+    try:
+        store.compact('key', daily_after_days=1, now=10 * DAY)
+    except OSError:
+        pass
+
+    # Either the old rows or the compacted ones, never timestamps of one
+    # paired with prices of the other
+    kept = PriceHistoryStore(str(tmp_path)).range('key')
+    assert kept == points or kept == [point for point in points if point[0] % DAY == 23 * 3600]
+
+
+def test_partial_row_is_hidden_and_overwritten(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.extend('key', [(1000, 5), (2000, 6)])
+    # A crash mid-append leaves part of a row at the end of the file
+    with open(os.path.join(str(tmp_path), 'key.hist'), 'ab') as f:
+        f.write(array('q', [3000]).tobytes())
+
+    assert store.range('key') == [(1000, 5), (2000, 6)]
+    store.append('key', 7, 4000)
+    assert store.range('key') == [(1000, 5), (2000, 6), (4000, 7)]
+    assert list(zip(*store.range_columns('key'))) == store.range('key')
+
+
+def test_compact_all_reports_changes_under_the_callers_keys(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    for key in (4151, URL):
+        store.extend(key, [(hour * 3600, hour) for hour in range(48)])
+
+    # As after a restart: the keys are only known from the reads made since
+    store = PriceHistoryStore(str(tmp_path))
+    for key in (4151, URL):
+        store.range_columns(key)
+    version = store.version
+    assert store.compact_all(daily_after_days=1) == 2 * 46
+
+    changed = store.changed_since(version)
+    assert 4151 in changed
+    assert URL in changed
+
+
+def test_tracker_compacts_once_a_day_not_on_startup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = PriceHistoryStore('price_history')
+    now = time.time()
+    for hour in range(0, 24 * 60, 1):
+        store.append('4151', hour, now - 90 * DAY + hour * 3600)
+
+    tracker = PriceTracker()
+    assert tracker.history.count('4151') == 24 * 60
+
+    removed = tracker.compact_history()
+    assert removed > 0
+    assert tracker.history.count('4151') == 24 * 60 - removed
+    assert tracker.history.compacted_at() is not None
+
+    # Not due again until a day has passed, unless forced
+    old_day = (now - 80 * DAY) // DAY * DAY
+    tracker.history.append('882', 1, old_day + 60)
+    tracker.history.append('882', 2, old_day + 120)
+    assert tracker.compact_history() is None
+    assert tracker.compact_history(force=True) == 1
+    tracker.close()
+
+
+def test_sqlite_drops_the_old_snapshot_table(tmp_path):
+    db_path = str(tmp_path / 'data.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE price_snapshots (item_id INTEGER, timestamp TEXT, price INTEGER)")
+    conn.execute("INSERT INTO price_snapshots VALUES (1, '2026-01-01 00:00:00', 5)")
+    conn.commit()
+    conn.close()
+
+    SqliteStorage(db_path, no_timer).close()
+
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert 'price_snapshots' not in tables
+    assert {'items', 'transactions', 'settings'} <= tables
+
+
+def test_range_columns(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.extend('4151', [(1000 + day * DAY, 100 + day) for day in range(10)])
+
+    timestamps, prices = store.range_columns('4151', 1000 + 2 * DAY, 1000 + 4 * DAY)
+    assert list(zip(timestamps, prices)) == store.range('4151', 1000 + 2 * DAY, 1000 + 4 * DAY)
+    assert list(zip(*store.range_columns('4151'))) == store.range('4151')
+    assert store.range_columns('missing') == (array('q'), array('q'))
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from osrs_core import AsyncPriceSession, CircuitBreaker, CircuitOpenError, HostGuard, PriceSession
+
+
+class FlakyRoute:
+    """Route answering 503 (or hanging past the client timeout) until healed
+
+    The time of every request is logged so the rate limit can be checked.
+    """
+
+    def __init__(self, hang=0):
+        self.hang = hang
+        self.failing = True
+        self.times = []
+        self.lock = threading.Lock()
+
+    def __call__(self, headers):
+        with self.lock:
+            self.times.append(time.monotonic())
+        if not self.failing:
+            return 200, {}, 'ok'
+        if self.hang:
+            time.sleep(self.hang)
+        return 503, {}, 'unavailable'
+
+
+def breaker_state(guard, stub_server):
+    return guard.breakers[urlparse(stub_server.url()).netloc].state
+
+
+def test_retried_server_errors_open_half_open_and_close_the_circuit(stub_server):
+    route = stub_server.routes['/flaky'] = FlakyRoute()
+    guard = HostGuard(rate=0, burst=1, failure_threshold=3, reset_seconds=0.2)
+    http = PriceSession(pool_size=1, retries=5, backoff_factor=0, guard=guard)
+    url = stub_server.url('/flaky')
+
+    # Every retry goes through the guard, so they stop once the circuit opens
+    with pytest.raises(CircuitOpenError):
+        http.get(url)
+    assert len(route.times) == 3
+    assert guard.get_stats()['open_hosts'] == [urlparse(url).netloc]
+    with pytest.raises(CircuitOpenError):
+        http.get(url)
+    assert len(route.times) == 3
+
+    # A failed probe opens it again straight away
+    time.sleep(0.25)
+    with pytest.raises(CircuitOpenError):
+        http.get(url)
+    assert len(route.times) == 4
+    assert breaker_state(guard, stub_server) == 'open'
+
+    time.sleep(0.25)
+    route.failing = False
+    assert http.get(url).status_code == 200
+    assert breaker_state(guard, stub_server) == 'closed'
+    assert guard.get_stats()['open_hosts'] == []
+    http.close()
+
+
+def test_timeouts_count_as_failures(stub_server):
+    route = stub_server.routes['/slow'] = FlakyRoute(hang=0.5)
+    guard = HostGuard(rate=0, burst=1, failure_threshold=2, reset_seconds=30)
+    http = PriceSession(pool_size=1, retries=5, backoff_factor=0, timeout=0.1, guard=guard)
+
+    with pytest.raises(CircuitOpenError):
+        http.get(stub_server.url('/slow'))
+    assert len(route.times) == 2
+    assert http.get_stats()['errors'] == 2
+    http.close()
+
+
+def test_retries_keep_to_the_rate_limit(stub_server):
+    route = stub_server.routes['/flaky'] = FlakyRoute()
+    guard = HostGuard(rate=20, burst=1, failure_threshold=100)
+    http = PriceSession(pool_size=1, retries=4, backoff_factor=0, guard=guard)
+
+    assert http.get(stub_server.url('/flaky')).status_code == 503
+    assert len(route.times) == 5
+    gaps = [later - earlier for earlier, later in zip(route.times, route.times[1:])]
+    assert min(gaps) > 0.04
+    http.close()
+
+
+def test_unanswered_probe_times_out():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0, probe_timeout=0.1)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.15)
+    assert breaker.allow()
+    assert breaker.state == 'half-open'
+
+
+def test_cancelled_probe_is_released(stub_server):
+    aiohttp = pytest.importorskip('aiohttp')
+    route = stub_server.routes['/slow'] = FlakyRoute(hang=1)
+    guard = HostGuard(rate=0, burst=1, failure_threshold=1, reset_seconds=0, probe_timeout=60)
+    url = stub_server.url('/slow')
+    guard.record(url, status=503)
+
+    async def cancel_probe():
+        async with aiohttp.ClientSession() as session:
+            probe = asyncio.ensure_future(AsyncPriceSession(session, guard).get(url))
+            while not route.times:
+                await asyncio.sleep(0.01)
+            assert not guard.breakers[urlparse(url).netloc].allow()
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+
+    asyncio.run(cancel_probe())
+    # Neither a failure nor stuck half-open: the next call probes again
+    assert breaker_state(guard, stub_server) == 'open'
+    assert guard.reserve(url) == 0
+    assert breaker_state(guard, stub_server) == 'half-open'
+
+
+def test_connection_errors_are_retried_through_the_guard():
+    guard = HostGuard(rate=0, burst=1, failure_threshold=2, reset_seconds=30)
+    http = PriceSession(pool_size=1, retries=5, backoff_factor=0, timeout=0.5, guard=guard)
+
+    # Nothing listens on port 9 of localhost
+    with pytest.raises(CircuitOpenError):
+        http.get('http://127.0.0.1:9/')
+    assert http.get_stats()['errors'] == 2
+    http.close()
@@ -0,0 +1,41 @@
+import gc
+import weakref
+
+from osrs_items import ItemTable
+
+from benchmarks.synthetic import make_items
+
+
+def test_removed_row_keeps_its_values_while_held():
+    table = ItemTable(make_items(3))
+    row = table[1]
+    name = row['name']
+    del table[1]
+
+    assert len(table) == 2
+    assert row['name'] == name
+    row['current_price'] = 5
+    assert row.pick('name', 'current_price') == (name, 5)
+    assert row.to_dict()['current_price'] == 5
+    assert all(other['name'] != name for other in table)
+
+
+class Marker:
+    pass
+
+
+def test_removed_rows_are_not_kept_by_the_table():
+    items = make_items(2)
+    items[0]['note'] = Marker()
+    note = weakref.ref(items[0]['note'])
+    table = ItemTable(items)
+    del items
+
+    # The snapshot of a held row goes away with the row
+    row = table[0]
+    del table[0]
+    assert row['note'] is note()
+    del row
+    gc.collect()
+    assert note() is None
+    assert len(table) == 1
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from osrs_core import AsyncPriceSession, HtmlPriceSource, PriceSession
+from osrs_extractor import ItemPageExtractor
+
+from conftest import read_fixture
+
+
+def item_page(padding):
+    """The whip fixture with padding after the stats, like a real page's graph data and footer"""
+    html = read_fixture('pages', 'abyssal_whip.html')
+    return html.replace('</body>', '<script>' + 'x' * padding + '</script>\n</body>')
+
+
+def serve_pages(stub_server, padding, count=7):
+    for index in range(count):
+        stub_server.routes[f'/item/{index}'] = (200, {'Content-Type': 'text/html; charset=utf-8'},
+                                                item_page(padding))
+
+
+def test_stream_reads_out_a_short_tail_to_keep_the_connection(stub_server):
+    serve_pages(stub_server, 20000)
+    http = PriceSession(pool_size=1)
+    source = HtmlPriceSource(http, stream=True)
+
+    results = [source.fetch(stub_server.url(f'/item/{index}')) for index in range(7)]
+
+    assert results == [(1612000, 1.0, -2.0, 7.0)] * 7
+    stats = http.get_stats()
+    assert stats['requests'] == 7
+    assert stats['connections_dropped'] == 0
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 6
+    assert stub_server.connections == 1
+    assert stats['bytes_not_downloaded'] == 0
+    assert stats['bytes_received'] == 7 * len(item_page(20000))
+    http.close()
+
+
+def test_stream_drops_the_connection_rather_than_download_a_long_tail(stub_server):
+    serve_pages(stub_server, 300000)
+    http = PriceSession(pool_size=1)
+    source = HtmlPriceSource(http, stream=True)
+
+    results = [source.fetch(stub_server.url(f'/item/{index}')) for index in range(7)]
+
+    assert results == [(1612000, 1.0, -2.0, 7.0)] * 7
+    stats = http.get_stats()
+    assert stats['connections_dropped'] == 7
+    assert stats['connections_opened'] == 7
+    assert stub_server.connections == 7
+    page_size = len(item_page(300000))
+    for skipped in stats['bytes_not_downloaded_by_url'].values():
+        assert page_size - 64 * 1024 < skipped < page_size
+    assert stats['bytes_received'] + stats['bytes_not_downloaded'] == 7 * page_size
+    http.close()
+
+
+def test_async_stream_drops_the_connection_only_for_a_long_tail(stub_server):
+    aiohttp = pytest.importorskip('aiohttp')
+    stub_server.routes['/short'] = (200, {'Content-Type': 'text/html'}, item_page(20000))
+    stub_server.routes['/long'] = (200, {'Content-Type': 'text/html'}, item_page(300000))
+
+    async def fetch_all(paths):
+        connector = aiohttp.TCPConnector(limit=1)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            http = AsyncPriceSession(session)
+            results = []
+            for path in paths:
+                extractor = ItemPageExtractor()
+                await http.stream(stub_server.url(path), extractor)
+                results.append(extractor.result())
+            return results
+
+    assert asyncio.run(fetch_all(['/short'] * 3)) == [(1612000, 1.0, -2.0, 7.0)] * 3
+    assert stub_server.connections == 1
+    assert asyncio.run(fetch_all(['/long'] * 3)) == [(1612000, 1.0, -2.0, 7.0)] * 3
+    assert stub_server.connections == 4
+
+
+def test_error_pages_are_read_out(stub_server):
+    stub_server.routes['/missing'] = (404, {}, 'x' * 50000)
+    stub_server.routes['/item'] = (200, {}, item_page(0))
+    http = PriceSession(pool_size=1)
+    source = HtmlPriceSource(http, stream=True)
+
+    assert source.fetch(stub_server.url('/missing')) == (None, 0, 0, 0)
+    assert source.fetch(stub_server.url('/item'))[0] == 1612000
+    assert http.get_stats()['connections_dropped'] == 0
+    assert stub_server.connections == 1
+    http.close()
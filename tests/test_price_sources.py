@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from osrs_core import (DEFAULT_SETTINGS, FallbackPriceSource, ItemDbApiSource, PriceSession,
+                       ResponseCache, create_price_source)
+
+from conftest import read_fixture
+
+JSON = {'Content-Type': 'application/json'}
+HTML = {'Content-Type': 'text/html; charset=utf-8'}
+
+DETAIL = '/api/catalogue/detail.json?item=4151'
+GRAPH = '/api/graph/4151.json'
+PAGE = '/Abyssal+whip/viewitem?obj=4151'
+
+
+@pytest.fixture
+def http():
+    session = PriceSession(pool_size=1)
+    yield session
+    session.close()
+
+
+def make_source(stub_server, http, cache=None, price_source='api'):
+    settings = dict(DEFAULT_SETTINGS, price_source=price_source)
+    source = create_price_source(http, settings, cache)
+    if isinstance(source, FallbackPriceSource):
+        source.sources[0].base_url = stub_server.url()
+    return source
+
+
+def serve_item(stub_server, etag=None):
+    headers = {'ETag': etag} if etag else {}
+    stub_server.routes[DETAIL] = (200, dict(JSON, **headers), read_fixture('itemdb', 'detail_4151.json'))
+    stub_server.routes[GRAPH] = (200, dict(JSON, **headers), read_fixture('itemdb', 'graph_4151.json'))
+    stub_server.routes[PAGE] = (200, HTML, read_fixture('pages', 'abyssal_whip.html'))
+
+
+def test_api_source_reads_price_from_graph(stub_server, http):
+    serve_item(stub_server)
+    source = ItemDbApiSource(http, base_url=stub_server.url())
+
+    assert source.fetch(stub_server.url(PAGE)) == (1612000, 1.0, -2.0, 7.0)
+    assert stub_server.paths() == [DETAIL, GRAPH]
+
+
+def test_api_source_falls_back_to_detail_price_without_graph(stub_server, http):
+    serve_item(stub_server)
+    del stub_server.routes[GRAPH]
+    source = ItemDbApiSource(http, base_url=stub_server.url())
+
+    assert source.fetch(stub_server.url(PAGE)) == (1600000, 1.0, -2.0, 7.0)
+
+
+def test_fallback_uses_json_when_it_works(stub_server, http):
+    serve_item(stub_server)
+    source = make_source(stub_server, http)
+
+    assert source.fetch(stub_server.url(PAGE)) == (1612000, 1.0, -2.0, 7.0)
+    assert PAGE not in stub_server.paths()
+
+
+@pytest.mark.parametrize('detail', [
+    (500, JSON, '{"error": "internal"}'),
+    (200, JSON, 'not json'),
+    (200, JSON, '{"unexpected": {}}'),
+])
+def test_fallback_scrapes_html_when_json_fails(stub_server, http, detail):
+    serve_item(stub_server)
+    stub_server.routes[DETAIL] = detail
+    source = make_source(stub_server, http)
+
+    # The page gives the 1m/3m/6m changes from its own markup
+    assert source.fetch(stub_server.url(PAGE)) == (1612000, 1.0, -2.0, 7.0)
+    assert stub_server.paths()[-1] == PAGE
+
+
+def test_html_only_source_skips_json(stub_server, http):
+    serve_item(stub_server)
+    source = make_source(stub_server, http, price_source='html')
+
+    assert source.fetch(stub_server.url(PAGE))[0] == 1612000
+    assert stub_server.paths() == [PAGE]
+
+
+def test_not_modified_reuses_cached_payload(stub_server, http, tmp_path):
+    serve_item(stub_server, etag='"v1"')
+    cache = ResponseCache(str(tmp_path / 'cache.json'))
+    source = make_source(stub_server, http, cache)
+    url = stub_server.url(PAGE)
+
+    assert source.fetch(url) == (1612000, 1.0, -2.0, 7.0)
+    assert cache.get_stats() == {'hits': 0, 'misses': 2, 'revalidated': 0}
+
+    def not_modified(headers):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, JSON, '{}'
+    stub_server.routes[DETAIL] = not_modified
+    stub_server.routes[GRAPH] = not_modified
+
+    assert source.fetch(url) == (1612000, 1.0, -2.0, 7.0)
+    assert cache.get_stats() == {'hits': 0, 'misses': 2, 'revalidated': 2}
+    assert [headers.get('If-None-Match') for path, headers in stub_server.requests[2:]] == ['"v1"', '"v1"']
+
+    # Validators and payloads survive a restart
+    cache.save()
+    with open(tmp_path / 'cache.json') as f:
+        assert set(json.load(f)) == {stub_server.url(DETAIL), stub_server.url(GRAPH)}
+    reloaded = ResponseCache(str(tmp_path / 'cache.json'))
+    assert make_source(stub_server, http, reloaded).fetch(url) == (1612000, 1.0, -2.0, 7.0)
+    assert reloaded.get_stats()['revalidated'] == 2
+
+
+def test_not_modified_html_page(stub_server, http, tmp_path):
+    stub_server.routes[PAGE] = (200, dict(HTML, ETag='"p1"'), read_fixture('pages', 'abyssal_whip.html'))
+    cache = ResponseCache(str(tmp_path / 'cache.json'))
+    source = make_source(stub_server, http, cache, price_source='html')
+    url = stub_server.url(PAGE)
+    assert source.fetch(url)[0] == 1612000
+
+    stub_server.routes[PAGE] = lambda headers: (304, {'ETag': '"p1"'}, b'') \
+        if headers.get('If-None-Match') == '"p1"' else (200, HTML, '')
+    assert source.fetch(url) == (1612000, 1.0, -2.0, 7.0)
+    assert cache.get_stats()['revalidated'] == 1
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+
+from osrs_history import DAY, PriceHistoryStore
+from osrs_scheduler import MAX_VALUE_WEIGHT, MIN_INTERVAL, VOLATILITY_WINDOW_DAYS, RefreshScheduler
+
+NOW = datetime(2026, 3, 1, 12).timestamp()
+HOUR = 3600
+
+
+def item(updated_ago=None, price=100, quantity=0, change_1m=0.0):
+    """An item last fetched updated_ago seconds before NOW (None: never)"""
+    updated = '' if updated_ago is None else \
+        datetime.fromtimestamp(NOW - updated_ago).strftime("%Y-%m-%d %H:%M:%S")
+    return {'current_price': price, 'quantity': quantity, 'change_1m': change_1m, 'last_updated': updated}
+
+
+def plan(scheduler, items):
+    """Plan one group per item, keyed by position"""
+    return scheduler.plan(items, [[index] for index in range(len(items))], list(range(len(items))), NOW)
+
+
+def test_plan_puts_unpriced_groups_first_then_the_most_overdue():
+    items = [
+        item(2 * HOUR),           # 2x its hour
+        item(30 * 60),            # not due for another half hour
+        item(None),               # never fetched
+        item(3 * HOUR),           # 3x
+        item(60),                 # fetched a minute ago: not even looked at
+        item(5 * HOUR, price=0),  # last fetch failed
+    ]
+    assert plan(RefreshScheduler(base_minutes=60), items) == [2, 5, 3, 0]
+
+
+def test_plan_orders_by_lateness_relative_to_each_interval():
+    # Twice as late in wall-clock time, but its interval is three times longer
+    slow = item(4 * HOUR)
+    fast = item(2 * HOUR, change_1m=2 * 5.0 * 30 / VOLATILITY_WINDOW_DAYS)
+    assert plan(RefreshScheduler(base_minutes=60), [slow, fast]) == [1, 0]
+
+
+@pytest.mark.parametrize('budget, expected', [(0, [2, 0, 1]), (1, [2]), (2, [2, 0]), (5, [2, 0, 1])])
+def test_plan_keeps_to_the_budget(budget, expected):
+    items = [item(3 * HOUR), item(2 * HOUR), item(None), item(10 * 60)]
+    assert plan(RefreshScheduler(base_minutes=60, budget=budget), items) == expected
+
+
+@pytest.fixture
+def history(tmp_path):
+    """Daily points over the whole window for 'flat' and 'moving', three days for 'recent'"""
+    store = PriceHistoryStore(str(tmp_path))
+    for day in reversed(range(VOLATILITY_WINDOW_DAYS)):
+        timestamp = NOW - day * DAY
+        store.append('flat', 500, timestamp)
+        store.append('moving', 100 + day % 2 * 10, timestamp)
+        if day < 3:
+            store.append('recent', 500, timestamp)
+    return store
+
+
+def test_movement_from_history_and_fallback(history):
+    scheduler = RefreshScheduler(history)
+    assert scheduler.movement('flat', item(), NOW) == (0.0, True)
+    assert scheduler.movement('moving', item(), NOW) == (10.0, True)
+    assert scheduler.movement('recent', item(), NOW) == (0.0, False)
+    # Fewer than two points: the 1 month change, scaled to the window
+    assert scheduler.movement('missing', item(change_1m=-15.0), NOW) == \
+        (15.0 * VOLATILITY_WINDOW_DAYS / 30, False)
+
+
+def test_flat_unheld_groups_are_refreshed_rarely(history):
+    scheduler = RefreshScheduler(history, base_minutes=60, max_minutes=7 * 24 * 60)
+    assert scheduler.interval('flat', [item()], NOW, 0) == 7 * DAY
+    # Held, moving, or flat only for as long as it has been recorded: the base interval or less
+    assert scheduler.interval('flat', [item(quantity=1)], NOW, 100) == HOUR / 2
+    assert scheduler.interval('moving', [item()], NOW, 0) == HOUR / 3
+    assert scheduler.interval('recent', [item()], NOW, 0) == HOUR
+    # One held member keeps the whole group fresh
+    assert scheduler.interval('flat', [item(), item(quantity=1)], NOW, 100) == HOUR / 2
+
+
+def test_rare_groups_are_due_only_after_the_max_interval(history):
+    scheduler = RefreshScheduler(history, base_minutes=60, max_minutes=24 * 60)
+    items = [item(12 * HOUR), item(12 * HOUR, quantity=1)]
+    groups = [[0], [1]]
+    assert scheduler.plan(items, groups, ['flat', 'flat'], NOW) == [1]
+    items[0] = item(25 * HOUR)
+    assert scheduler.plan(items, groups, ['flat', 'flat'], NOW) == [1, 0]
+
+
+def test_interval_shrinks_with_value_up_to_the_cap():
+    scheduler = RefreshScheduler(base_minutes=60)
+    average = 1000
+    assert scheduler.interval('a', [item(quantity=0)], NOW, average) == HOUR
+    assert scheduler.interval('a', [item(price=10, quantity=100)], NOW, average) == HOUR / 2
+    assert scheduler.interval('a', [item(price=10, quantity=300)], NOW, average) == HOUR / 4
+    capped = HOUR / (1 + MAX_VALUE_WEIGHT)
+    assert scheduler.interval('a', [item(price=10, quantity=10 ** 6)], NOW, average) == capped
+    # Movement and value add up, but never below MIN_INTERVAL
+    assert scheduler.interval('a', [item(price=10, quantity=10 ** 6, change_1m=300.0)], NOW, average) == \
+        MIN_INTERVAL
+
+
+def test_plan_weights_by_value_against_the_average_holding():
+    # Both 40 minutes old; the larger holding's interval is under that
+    items = [item(40 * 60, price=10, quantity=10), item(40 * 60, price=10, quantity=1000), item(None, quantity=0)]
+    assert plan(RefreshScheduler(base_minutes=60), items) == [2, 1]
@@ -0,0 +1,170 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from osrs_core import DEFAULT_SETTINGS, JsonStorage, PriceTracker, SqliteStorage, no_timer, open_storage
+
+# The 1M-transaction test takes about half a minute; set OSRS_SCALE_TESTS=1 to run it
+scale = pytest.mark.skipif(not os.environ.get('OSRS_SCALE_TESTS'),
+                           reason="set OSRS_SCALE_TESTS=1 to run the scaling tests")
+
+START = datetime(2020, 1, 1)
+
+
+def make_item(index):
+    return {'name': f'Item {index}', 'url': f'https://example.com/Item/viewitem?obj={index}',
+            'reference_price': 100 + index, 'buy_price': 0, 'sell_price': 0, 'quantity': index,
+            'current_price': 0, 'change_1m': 0, 'change_3m': 0, 'change_6m': 0, 'last_updated': ''}
+
+
+def make_transactions(count, items=100):
+    """count BUY transactions, one minute apart, spread over items names"""
+    return [{'id': index + 1,
+             'date': (START + timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S"),
+             'item_name': f'Item {index % items}', 'type': 'BUY', 'quantity': 1,
+             'price_per_unit': 10, 'total_cost': 10, 'old_quantity': 0, 'new_quantity': 1}
+            for index in range(count)]
+
+
+def write_json(path, items, transactions, **settings):
+    with open(path, 'w') as f:
+        json.dump({'items': items, 'transactions': transactions,
+                   'settings': dict(DEFAULT_SETTINGS, **settings)}, f)
+
+
+def test_json_is_migrated_to_sqlite_once(tmp_path):
+    json_path = str(tmp_path / 'data.json')
+    db_path = str(tmp_path / 'data.db')
+    write_json(json_path, [make_item(0), make_item(1)], make_transactions(5), storage='sqlite',
+               cache_ttl_minutes=5)
+
+    storage = open_storage(json_path, db_path, no_timer)
+    assert isinstance(storage, SqliteStorage)
+    data = storage.load()
+    assert [item['name'] for item in data['items']] == ['Item 0', 'Item 1']
+    assert data['settings']['cache_ttl_minutes'] == 5
+    # Transactions stay on disk until asked for
+    assert data['transactions'] is None
+    assert [trans['id'] for trans in storage.load_transactions()] == [1, 2, 3, 4, 5]
+    storage.close()
+
+    # The JSON file is kept as a backup; later edits to it are ignored
+    write_json(json_path, [], [], storage='sqlite')
+    storage = open_storage(json_path, db_path, no_timer)
+    assert len(storage.load()['items']) == 2
+    storage.close()
+
+
+def test_json_storage_stays_json_without_the_setting(tmp_path):
+    json_path = str(tmp_path / 'data.json')
+    write_json(json_path, [make_item(0)], [])
+    storage = open_storage(json_path, str(tmp_path / 'data.db'), no_timer)
+    assert isinstance(storage, JsonStorage)
+    assert not os.path.exists(tmp_path / 'data.db')
+
+
+def test_sqlite_edits_are_single_rows(tmp_path):
+    db_path = str(tmp_path / 'data.db')
+    storage = SqliteStorage(db_path, no_timer)
+    storage.migrate_from({'items': [make_item(0), make_item(1)], 'transactions': make_transactions(3),
+                          'settings': {}})
+    items = storage.load()['items']
+
+    items[1]['quantity'] = 42
+    storage.save_item(items[1])
+    new_item = make_item(2)
+    storage.save_item(new_item)
+    storage.delete_item(items[0])
+    transaction = make_transactions(1)[0]
+    del transaction['id']
+    storage.add_transaction(transaction)
+    assert transaction['id'] == 4
+    storage.delete_transaction({'id': 2})
+    storage.close()
+
+    storage = SqliteStorage(db_path, no_timer)
+    items = storage.load()['items']
+    assert [(item['name'], item['quantity']) for item in items] == [('Item 1', 42), ('Item 2', 2)]
+    assert [trans['id'] for trans in storage.load_transactions()] == [1, 3, 4]
+    storage.close()
+
+
+def test_sqlite_iter_transactions_filters(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'data.db'), no_timer)
+    storage.migrate_from({'items': [], 'transactions': make_transactions(100, items=4), 'settings': {}})
+
+    rows = list(storage.iter_transactions('2020-01-01 00:10:00', '2020-01-01 00:19:59', {'Item 1'}))
+    assert [trans['id'] for trans in rows] == [14, 18]
+    assert len(list(storage.iter_transactions())) == 100
+    storage.close()
+
+
+def sqlite_tracker(tmp_path, monkeypatch, items, transactions):
+    """A PriceTracker over a database holding items and transactions"""
+    storage = SqliteStorage(str(tmp_path / 'osrs_tracker.db'), no_timer)
+    storage.migrate_from({'items': items, 'transactions': transactions, 'settings': dict(DEFAULT_SETTINGS)})
+    storage.close()
+    monkeypatch.chdir(tmp_path)
+    return PriceTracker()
+
+
+def edit_quantity(tracker, item, quantity):
+    """What the Edit Item dialog does when the quantity changes"""
+    old_quantity = item['quantity']
+    item['quantity'] = quantity
+    tracker.log_transaction(item['name'], quantity, 10, 0, old_quantity, 0, 0)
+    tracker.storage.save_item(item)
+    tracker.flush()
+
+
+def test_logging_a_transaction_does_not_load_the_others(tmp_path, monkeypatch):
+    tracker = sqlite_tracker(tmp_path, monkeypatch, [make_item(0), make_item(1)], make_transactions(3))
+    assert tracker.data['transactions'] is None
+
+    edit_quantity(tracker, tracker.data['items'][1], 5)
+
+    assert tracker.data['transactions'] is None
+    transactions = tracker.get_transactions()
+    assert [trans['id'] for trans in transactions] == [1, 2, 3, 4]
+    assert transactions[-1]['quantity'] == 4
+    # Once loaded, the list is kept in step
+    edit_quantity(tracker, tracker.data['items'][0], 2)
+    assert [trans['id'] for trans in tracker.get_transactions()] == [1, 2, 3, 4, 5]
+    tracker.close()
+
+
+@scale
+def test_one_million_transactions(tmp_path, monkeypatch):
+    count = 1000000
+    items = [make_item(index) for index in range(1000)]
+
+    sqlite_tracker(tmp_path, monkeypatch, items, make_transactions(count, items=1000)).close()
+
+    # Startup reads items and settings only
+    start = time.perf_counter()
+    tracker = PriceTracker()
+    assert time.perf_counter() - start < 0.5
+    assert len(tracker.data['items']) == 1000
+
+    # An edit is one row, not a rewrite (or a read) of the history
+    start = time.perf_counter()
+    edit_quantity(tracker, tracker.data['items'][500], 7)
+    assert time.perf_counter() - start < 0.1
+    assert tracker.data['transactions'] is None
+
+    # A one-day range is served from the date index
+    start = time.perf_counter()
+    day = list(tracker.storage.iter_transactions('2020-06-01 00:00:00', '2020-06-01 23:59:59'))
+    assert time.perf_counter() - start < 0.5
+    assert len(day) == 24 * 60
+
+    start = time.perf_counter()
+    transactions = tracker.get_transactions()
+    assert time.perf_counter() - start < 15
+    assert len(transactions) == count + 1
+    assert transactions[-1]['id'] == count + 1
+    assert transactions[-1]['item_name'] == 'Item 500'
+    tracker.close()
@@ -0,0 +1,52 @@
+import json
+
+from osrs_core import DEFAULT_SETTINGS, PriceTracker, TransactionIndex
+
+
+def transaction(trans_id, date, item_name):
+    return {'id': trans_id, 'date': date, 'item_name': item_name, 'type': 'BUY', 'quantity': 1,
+            'price_per_unit': 10, 'total_cost': 10, 'old_quantity': 0, 'new_quantity': 1}
+
+
+def test_index_orders_newest_first_per_item():
+    index = TransactionIndex([
+        transaction(1, '2026-01-02 00:00:00', 'Whip'),
+        transaction(2, '2026-01-01 00:00:00', 'Bones'),
+        transaction(3, '2026-01-02 00:00:00', 'Bones'),
+        transaction(4, '2026-01-03 00:00:00', 'Whip'),
+    ])
+
+    assert [trans['id'] for trans in index.newest_first()] == [4, 1, 3, 2]
+    assert [trans['id'] for trans in index.newest_first('Bones')] == [3, 2]
+    assert index.item_names() == ['Bones', 'Whip']
+
+    index.add(transaction(5, '2026-01-01 12:00:00', 'Whip'))
+    assert [trans['id'] for trans in index.newest_first('Whip')] == [4, 1, 5]
+
+    assert index.remove(2)['id'] == 2
+    assert index.remove(3)['id'] == 3
+    assert index.remove(3) is None
+    assert index.item_names() == ['Whip']
+    assert [trans['id'] for trans in index.newest_first()] == [4, 1, 5]
+
+
+def test_tracker_delete_transaction(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    transactions = [transaction(trans_id, f'2026-01-{trans_id:02d} 00:00:00', 'Whip') for trans_id in range(1, 11)]
+    with open('osrs_tracker_data.json', 'w') as f:
+        json.dump({'items': [], 'transactions': transactions, 'settings': dict(DEFAULT_SETTINGS)}, f)
+    tracker = PriceTracker()
+
+    assert tracker.delete_transaction(4)['id'] == 4
+    assert tracker.delete_transaction(10)['id'] == 10
+    assert tracker.delete_transaction(4) is None
+    assert [trans['id'] for trans in tracker.get_transactions()] == [1, 2, 3, 5, 6, 7, 8, 9]
+
+    tracker.log_transaction('Whip', 5, 12, 0, 0, 0, 0)
+    assert tracker.get_transactions()[-1]['id'] == 11
+    assert tracker.delete_transaction(11)['id'] == 11
+    assert [trans['id'] for trans in tracker.get_transaction_index().newest_first()] == [9, 8, 7, 6, 5, 3, 2, 1]
+    tracker.close()
+
+    with open('osrs_tracker_data.json') as f:
+        assert [trans['id'] for trans in json.load(f)['transactions']] == [1, 2, 3, 5, 6, 7, 8, 9]